@@ -1,27 +1,42 @@
 import sys
 import os
+import time
+
+# Start of the cold start profile, see `lifespan`
+IMPORT_STARTED = time.perf_counter()
 
 # Add the project root to the Python path
 # This is necessary to ensure that the `core` module can be found
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
+from concurrent.futures import wait
 from contextlib import asynccontextmanager
+from typing import Optional
 from uuid import uuid4
 
 from pydantic import BaseModel
 from core.libri_inference import StyleTTS2Inference
+from core.style_cache import StyleCache
+from core.audio_cache import AudioCache, cache_key
+from core.audio_io import OUTPUT_FORMATS, encode_audio, float_to_pcm16, wav_header
+from core.chunk_cache import ChunkCache
+from core.batch_scheduler import BatchScheduler
+from core.metrics import REGISTRY
+from core.profiling import PhaseTimer
+from core.storage import S3Storage, build_s3_client
+from core.text_chunker import CHUNKER_VERSION, MAX_CHUNK_TOKENS, chunk_text
+from core.text_normalizer import NORMALIZER_VERSION
+from core.worker_pool import QueueFullError, SynthesisPool
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Depends
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware  # ✅ Add this import
 
+import asyncio
 import logging
-import re
 import numpy as np
-import tempfile
-
-import soundfile as sf
-import boto3
 
 # local environment variable 
 from dotenv import load_dotenv
@@ -31,8 +46,11 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)  # Get the actual logger
 
 # Global variables 
+startup_profile = PhaseTimer()
+startup_profile.record("imports", time.perf_counter() - IMPORT_STARTED)
 synthesizer = None
-reference_style = None
+style_cache = None
+batch_scheduler = None
 
 API_KEY = os.getenv("API_KEY")
 
@@ -60,45 +78,152 @@ async def verify_api_key(authorization:str = Header(None)):
         
 
 
-def get_s3_client():
-    client_kwargs = {'region_name': os.getenv("AWS_REGION", "us-east-1")}
-    
-    
-    if os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
-        client_kwargs.update({
-            'aws_access_key_id': os.getenv("AWS_ACCESS_KEY_ID"),
-            'aws_secret_access_key': os.getenv("AWS_SECRET_ACCESS_KEY")
-        })
-        
-    return boto3.client('s3', **client_kwargs)
-
-
-s3_client = get_s3_client()
+s3_client = build_s3_client(
+    max_pool_connections=int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32")),
+    max_attempts=int(os.getenv("S3_MAX_ATTEMPTS", "3")),
+)
 
 S3_PREFIX = os.getenv("S3_PREFIX", "styletts2-outputs")
 S3_BUCKET = os.getenv("S3_BUCKET", "elevenlabs-clone")
 
+storage = S3Storage(
+    S3_BUCKET,
+    client=s3_client,
+    multipart_threshold=int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8")) << 20,
+    max_concurrency=int(os.getenv("S3_UPLOAD_CONCURRENCY", "4")),
+    upload_attempts=int(os.getenv("S3_UPLOAD_ATTEMPTS", "3")),
+)
+
+# Return the presigned URL before the upload has finished. The URL returns 404 until
+# the background upload completes, so clients must be prepared to retry.
+S3_UPLOAD_IN_BACKGROUND = os.getenv("S3_UPLOAD_IN_BACKGROUND", "false").lower() in ("1", "true", "yes")
+
+SAMPLE_RATE = 24000
+CHUNK_SILENCE_SECONDS = 0.3
+
+# Maximum number of text chunks synthesized in one batched forward pass
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+
+# Budget of a text chunk in estimated phoneme tokens, see `core.text_chunker`
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", str(MAX_CHUNK_TOKENS)))
+
+# Most frequent unknown phoneme symbols exported by /metrics, bounding its label count
+UNKNOWN_SYMBOLS_REPORTED = 20
+
+# Long-form style continuity: style diffusion runs on every LONG_FORM_STRIDE-th chunk of a
+# request, the chunks in between are interpolated and blended with the previous chunk's style.
+# 0 samples every chunk independently.
+LONG_FORM_STRIDE = int(os.getenv("LONG_FORM_STRIDE", "0"))
+LONG_FORM_BLEND = float(os.getenv("LONG_FORM_BLEND", "0.7"))
+
+# Batch chunks across concurrent requests
+ENABLE_BATCH_SCHEDULER = os.getenv("ENABLE_BATCH_SCHEDULER", "false").lower() in ("1", "true", "yes")
+
+# Identical requests are served from S3 instead of being synthesized again
+ENABLE_AUDIO_CACHE = os.getenv("ENABLE_AUDIO_CACHE", "true").lower() in ("1", "true", "yes")
+audio_cache = AudioCache(
+    s3_client,
+    S3_BUCKET,
+    os.getenv("AUDIO_CACHE_PREFIX", f"{S3_PREFIX}/cache"),
+    max_entries=int(os.getenv("AUDIO_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("AUDIO_CACHE_TTL", "300")),
+) if ENABLE_AUDIO_CACHE else None
+
+# Repeated sentences are reused across requests instead of being synthesized again
+ENABLE_CHUNK_CACHE = os.getenv("ENABLE_CHUNK_CACHE", "true").lower() in ("1", "true", "yes")
+chunk_cache = ChunkCache(
+    max_memory_bytes=int(os.getenv("CHUNK_CACHE_MEMORY_MB", "256")) << 20,
+    disk_dir=os.getenv("CHUNK_CACHE_DIR") or None,
+    max_disk_bytes=int(os.getenv("CHUNK_CACHE_DISK_MB", "2048")) << 20,
+    dtype=os.getenv("CHUNK_CACHE_DTYPE", "int16"),
+) if ENABLE_CHUNK_CACHE else None
+
+# Synthesis runs on a dedicated pool so the event loop keeps serving /health and /voices
+SYNTHESIS_WORKERS = int(os.getenv("SYNTHESIS_WORKERS", "1"))
+if ENABLE_BATCH_SCHEDULER and SYNTHESIS_WORKERS < MAX_BATCH_SIZE:
+    # Every request holds a worker while its chunks wait on the scheduler, so with fewer
+    # workers than a batch the scheduler never sees enough requests to fill one
+    logger.warning(f"Raising SYNTHESIS_WORKERS from {SYNTHESIS_WORKERS} to MAX_BATCH_SIZE={MAX_BATCH_SIZE} "
+                   f"for the batch scheduler")
+    SYNTHESIS_WORKERS = MAX_BATCH_SIZE
+synthesis_pool = SynthesisPool(
+    max_workers=SYNTHESIS_WORKERS,
+    max_queue=int(os.getenv("SYNTHESIS_QUEUE_SIZE", "16")),
+    timeout=float(os.getenv("SYNTHESIS_TIMEOUT", "300")),
+)
+
+
+def service_overloaded(e: QueueFullError) -> HTTPException:
+    logger.warning(str(e))
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry later.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
 
 @asynccontextmanager
 async def lifespan(app:FastAPI): 
-    global synthesizer, reference_style
+    global synthesizer, style_cache, batch_scheduler
     logger.info("loading StyleTTS2 model...")
     
     try:
-        synthesizer = StyleTTS2Inference(
-            config_path=os.getenv("CONFIG_PATH", "Configs/config.yml"),
-            model_path=os.getenv("MODEL_PATH", "Models/LibriTTS/epochs_2nd_00020.pth"),
-        )
+        with startup_profile.phase("model"):
+            synthesizer = StyleTTS2Inference(
+                config_path=os.getenv("CONFIG_PATH", "Configs/config.yml"),
+                model_path=os.getenv("MODEL_PATH", "Models/LibriTTS/epochs_2nd_00020.pth"),
+            )
         
         logger.info("StyleTTS2 model loaded successfully...")
+        if synthesizer.profiler is not None:
+            synthesizer.profiler.on_request = record_stage_profile
+            logger.info("Per-request stage profiling enabled")
+        
+        # Precompute reference styles so requests never re-encode the voice WAVs
+        with startup_profile.phase("style_cache"):
+            style_cache = StyleCache(synthesizer, cache_dir=os.getenv("STYLE_CACHE_DIR"))
+            style_cache.warm(TARGET_VOICES)
+        
+        if ENABLE_BATCH_SCHEDULER:
+            batch_scheduler = BatchScheduler(
+                synthesizer,
+                max_batch_size=MAX_BATCH_SIZE,
+                max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "10")),
+                max_tokens=int(os.getenv("BATCH_MAX_TOKENS", "4096")),
+            )
+            batch_scheduler.start()
+            logger.info("Cross-request batch scheduler started")
         
     except Exception as e:
         logger.error(f"Failed to load StyleTTS2 model: {e}")
         raise 
     
+    record_startup_profile()
+    
     yield
     
     logger.info("Shutting down StyleTTS2 API...")
+    if batch_scheduler:
+        batch_scheduler.stop()
+    synthesis_pool.shutdown()
+
+def record_startup_profile():
+    """Logs the cold start breakdown and exports it as `startup_phase_seconds{phase}`."""
+    gauge = REGISTRY.gauge("startup_phase_seconds", "Wall time of each cold start phase")
+    for phase, seconds in startup_profile.phases.items():
+        gauge.set(seconds, phase=phase)
+    for phase, seconds in synthesizer.startup_profile.phases.items():
+        gauge.set(seconds, phase=f"model.{phase}")
+    logger.info(f"Startup: {startup_profile.summary()} (model: {synthesizer.startup_profile.summary()})")
+
+
+def record_stage_profile(kind, breakdown, total):
+    """Exports a profiled request as `inference_stage_seconds{kind,stage}` and `inference_request_seconds{kind}`."""
+    stages = REGISTRY.histogram("inference_stage_seconds", "Wall time of each inference stage per profiled request")
+    for stage, seconds in breakdown.items():
+        stages.observe(seconds, kind=kind, stage=stage)
+    REGISTRY.histogram("inference_request_seconds", "Wall time of profiled inference requests").observe(total, kind=kind)
+
 
 app = FastAPI(title="StyleTTS2 API", lifespan=lifespan)
 
@@ -118,55 +243,27 @@ TARGET_VOICES = {
 }
 
 
-def text_chunker(text,max_chunk_size=125):
-    if len(text) <= max_chunk_size:
-        return [text]
-    
-    chunks=[]
-    
-    current_pos =0
-    text_len = len(text)
-    
-    
-    while current_pos < text_len:
-        if current_pos + max_chunk_size >= text_len:
-            chunks.append(text[current_pos:])
-            break
-        chunk_end = current_pos + max_chunk_size
-        
-        search_text = text[current_pos:chunk_end]
-        
-        
-        sentence_ends = [m.end() for m in re.finditer(r'[.!?]+', search_text)]
-        
-        if sentence_ends:
-            last_sentence_end = sentence_ends[-1]
-            chunks.append(text[current_pos:current_pos+ last_sentence_end])
-            current_pos += last_sentence_end
-            
-        else:
-            last_space = search_text.rfind(' ')
-            
-            if last_space >0:
-                chunks.append(text[current_pos:current_pos + last_space])
-                
-                current_pos += last_space +1
-                
-            else:
-                chunks.append(text[current_pos:chunk_end])
-                current_pos = chunk_end
-        while current_pos < text_len and text[current_pos].isspace():
-            current_pos += 1
-            
-    return chunks
-
 class TextOnlyRequest(BaseModel):
     text: str
     target_voice:str
+    alpha: float = 0.3
+    beta: float = 0.7
+    diffusion_steps: int = 5
+    embedding_scale: float = 1.0
+    # Makes the output deterministic, so cached results are reproducible
+    seed: Optional[int] = None
+    # Container of the uploaded file: wav (PCM16), flac, ogg, opus or mp3
+    output_format: str = "wav"
     
 
-@app.post("/generate", dependencies=[Depends(verify_api_key)])
-async def generate_speech(request: TextOnlyRequest, background_tasks: BackgroundTasks):
+class StreamRequest(TextOnlyRequest):
+    # "wav" streams a WAV container, "pcm" raw 16-bit mono PCM at SAMPLE_RATE
+    format: str = "wav"
+    # Upload the complete file to S3 once the stream has finished
+    upload: bool = False
+
+
+def validate_request(request: TextOnlyRequest):
     if len(request.text) >5000:
         raise HTTPException(
             
@@ -188,72 +285,361 @@ async def generate_speech(request: TextOnlyRequest, background_tasks: Background
             detail="Target voice not supported. Choose from {', '.join(TARGET_VOICES.keys())}."
         )
     
+    if not (0.0 <= request.alpha <= 1.0 and 0.0 <= request.beta <= 1.0):
+        raise HTTPException(status_code=400, detail="alpha and beta must be between 0 and 1.")
     
-    try:
-        ref_audio_path = TARGET_VOICES[request.target_voice]
+    if not 1 <= request.diffusion_steps <= 50:
+        raise HTTPException(status_code=400, detail="diffusion_steps must be between 1 and 50.")
+    
+    if not 0.0 <= request.embedding_scale <= 10.0:
+        raise HTTPException(status_code=400, detail="embedding_scale must be between 0 and 10.")
+    
+    if request.output_format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported output format. Choose from {', '.join(OUTPUT_FORMATS)}."
+        )
+
+
+def synthesis_params(request: TextOnlyRequest) -> dict:
+    return {
+        "alpha": request.alpha,
+        "beta": request.beta,
+        "diffusion_steps": request.diffusion_steps,
+        "embedding_scale": request.embedding_scale,
+    }
+
+
+def model_version() -> str:
+    return os.getenv("MODEL_VERSION") or synthesizer.model_id
+
+
+def normalizer_key() -> dict:
+    """Cache key entry for the text normalization applied in `tokenize_batch`, if it is enabled."""
+    return {"normalizer": NORMALIZER_VERSION} if synthesizer.normalizer is not None else {}
+
+
+def request_cache_key(request: TextOnlyRequest) -> str:
+    """Content address of a /generate result; covers everything that changes the audio."""
+    ref_audio_path = TARGET_VOICES[request.target_voice]
+    return cache_key({
+        "text": request.text,
+        "voice": request.target_voice,
+        "voice_sha256": style_cache.fingerprint(request.target_voice, ref_audio_path),
+        **synthesis_params(request),
+        "seed": request.seed,
+        "model": model_version(),
+        "sample_rate": SAMPLE_RATE,
+        "chunk_silence": CHUNK_SILENCE_SECONDS,
+        "chunking": f"v{CHUNKER_VERSION}-{CHUNK_MAX_TOKENS}",
+        **normalizer_key(),
+        **({"long_form_stride": LONG_FORM_STRIDE, "long_form_blend": LONG_FORM_BLEND} if LONG_FORM_STRIDE > 0 else {}),
+    })
+
+
+def presign(s3_key: str) -> str:
+    return storage.presign(s3_key, expires_in=3600)  # URL valid for 1 hour
+
+
+def lookup_cached_audio(request: TextOnlyRequest) -> Optional[dict]:
+    """Returns the /generate response for a cached result, or None on a miss."""
+    extension = OUTPUT_FORMATS[request.output_format][3]
+    s3_key = audio_cache.lookup(request_cache_key(request), extension)
+    if s3_key is None:
+        return None
+    logger.info(f"Serving cached audio {s3_key}")
+    return {
+        "audio_url": presign(s3_key),
+        "s3_key": s3_key,
+        "cached": True,
+    }
+
+
+def chunk_seeds(seed: Optional[int], num_chunks: int, first: int = 0) -> list:
+    """Chunk `i` of a request is seeded with `seed + i`."""
+    if seed is None:
+        return [None] * num_chunks
+    return [seed + first + i for i in range(num_chunks)]
+
+
+def long_form_styles(text_chunks, ref_s, seeds, **params):
+    """Styles of all chunks of a request in long-form mode, or None when it does not apply."""
+    if LONG_FORM_STRIDE <= 0 or len(text_chunks) < 2:
+        return None
+    return synthesizer.long_form_styles(
+        synthesizer.tokenize_batch(text_chunks), ref_s,
+        diffusion_steps=params["diffusion_steps"], embedding_scale=params["embedding_scale"],
+        seeds=seeds, stride=LONG_FORM_STRIDE, blend=LONG_FORM_BLEND,
+    )
+
+
+def synthesize_chunks(text_chunks, ref_s, seeds, styles=None, **params):
+    """Synthesizes text chunks, through the cross-request scheduler when it is enabled."""
+    with synthesizer.profile_request("synthesize"):
+        if batch_scheduler:
+            # The forward passes run on the scheduler thread and are profiled as their own requests
+            futures = batch_scheduler.submit_many(text_chunks, ref_s, seeds=seeds, styles=styles, **params)
+            _, not_done = wait(futures, timeout=synthesis_pool.time_left())
+            if not_done:
+                # The request timed out, so its chunks that have not started are dropped
+                for future in not_done:
+                    future.cancel()
+                raise TimeoutError(f"{len(not_done)}/{len(futures)} chunks unfinished when the request timed out")
+            return [future.result() for future in futures]
         
-        # Compute style for requested voice 
-        current_style = synthesizer.compute_style(ref_audio_path)
-        logger.info(f"Using voice {request.target_voice} from {ref_audio_path}")
+        # Synthesize chunks in padded batches instead of one forward pass each
+        audio_chunks = []
+        for start in range(0, len(text_chunks), MAX_BATCH_SIZE):
+            batch = text_chunks[start:start + MAX_BATCH_SIZE]
+            logger.info(f"Processing chunks {start+1}-{start+len(batch)}/{len(text_chunks)}")
+            audio_chunks.extend(synthesizer.inference_tokens(
+                synthesizer.tokenize_batch(batch), ref_s, seeds=seeds[start:start + MAX_BATCH_SIZE],
+                styles=styles[start:start + MAX_BATCH_SIZE] if styles is not None else None, **params))
+        return audio_chunks
+
+
+def synthesize_chunks_cached(text_chunks, ref_s, voice_sha256, seeds, styles=None, **params):
+    """
+    `synthesize_chunks` that reuses cached audio and only synthesizes the missing chunks.
+    With long-form `styles`, a chunk's audio depends on its neighbours through its style,
+    so the style is part of the key.
+    """
+    if not chunk_cache:
+        return synthesize_chunks(text_chunks, ref_s, seeds, styles, **params)
+    
+    keys = [cache_key({
+        "chunk": chunk,
+        "voice_sha256": voice_sha256,
+        **params,
+        "seed": seed,
+        "model": model_version(),
+        "sample_rate": SAMPLE_RATE,
+        **normalizer_key(),
+        **({"style": [round(v, 5) for v in styles[i].tolist()]} if styles is not None else {}),
+    }) for i, (chunk, seed) in enumerate(zip(text_chunks, seeds))]
+    audio_chunks = [chunk_cache.get(key) for key in keys]
+    
+    missing = [i for i, audio in enumerate(audio_chunks) if audio is None]
+    if len(missing) < len(text_chunks):
+        logger.info(f"Reusing {len(text_chunks) - len(missing)}/{len(text_chunks)} cached chunks")
+    if missing:
+        synthesized = synthesize_chunks([text_chunks[i] for i in missing], ref_s, [seeds[i] for i in missing],
+                                        styles[missing] if styles is not None else None, **params)
+        for i, audio in zip(missing, synthesized):
+            chunk_cache.put(keys[i], audio)
+            audio_chunks[i] = audio
+    return audio_chunks
+
+
+def synthesize_encoded(request: TextOnlyRequest):
+    """
+    Blocking part of /generate, run on the synthesis pool.
+    Returns the destination S3 key, the encoded audio and its content type.
+    """
+    ref_audio_path = TARGET_VOICES[request.target_voice]
+    
+    # Look up the cached style for the requested voice
+    current_style = style_cache.get(request.target_voice, ref_audio_path)
+    logger.info(f"Using voice {request.target_voice} from {ref_audio_path}")
+    
+    
+    _, _, content_type, extension = OUTPUT_FORMATS[request.output_format]
+    
+    # Cached results are stored under their content address, the rest under a unique name
+    if audio_cache:
+        s3_key = audio_cache.s3_key(request_cache_key(request), extension)
+    else:
+        s3_key = f"{S3_PREFIX}/{uuid4()}.{extension}"
+    
+    # Split text into manageable chunks 
+    text_chunks = chunk_text(request.text, CHUNK_MAX_TOKENS)
+    logger.info(f"Text splt into chunks: {len(text_chunks)}")
+    
+    
+    audio_segments=[]
+    
+    voice_sha256 = style_cache.fingerprint(request.target_voice, ref_audio_path)
+    seeds = chunk_seeds(request.seed, len(text_chunks))
+    styles = long_form_styles(text_chunks, current_style, seeds, **synthesis_params(request))
+    audio_chunks = synthesize_chunks_cached(text_chunks, current_style, voice_sha256, seeds, styles,
+                                            **synthesis_params(request))
+    
+    for i, audio_chunk in enumerate(audio_chunks):
+        audio_segments.append(audio_chunk)
         
+        if i < len(text_chunks) - 1:
+            silence = np.zeros(int(SAMPLE_RATE * CHUNK_SILENCE_SECONDS))
+            audio_segments.append(silence)
+            
+    if len(audio_segments) > 0:
+        full_audio = np.concatenate(audio_segments)
         
-        # Generate a unique filename
+        # Encoded in memory, uploaded straight from the buffer
+        return s3_key, encode_audio(full_audio, SAMPLE_RATE, request.output_format), content_type
+    else:
+        raise HTTPException(status_code=500, detail="Audio generation failed, no segments created.")
+
+
+def upload_audio(encoded: bytes, s3_key: str, content_type: str):
+    storage.upload_bytes(encoded, s3_key, content_type)
+    if audio_cache:
+        audio_cache.add(s3_key)
+
+
+def upload_audio_in_background(encoded: bytes, s3_key: str, content_type: str):
+    try:
+        upload_audio(encoded, s3_key, content_type)
+    except Exception as e:
+        logger.error(f"Background upload of {s3_key} failed: {e}")
+
+
+@app.post("/generate", dependencies=[Depends(verify_api_key)])
+async def generate_speech(request: TextOnlyRequest, background_tasks: BackgroundTasks):
+    validate_request(request)
+    
+    try:
+        if audio_cache:
+            # Cache hits never take a synthesis slot
+            cached = await asyncio.to_thread(lookup_cached_audio, request)
+            if cached:
+                return cached
+        s3_key, encoded, content_type = await synthesis_pool.run(synthesize_encoded, request)
         
-        audio_id = str(uuid4())
-        output_filename = f"{audio_id}.wav"
+        # The upload never holds a synthesis worker
+        if S3_UPLOAD_IN_BACKGROUND:
+            background_tasks.add_task(upload_audio_in_background, encoded, s3_key, content_type)
+        else:
+            await asyncio.to_thread(upload_audio, encoded, s3_key, content_type)
         
-        with tempfile.TemporaryDirectory() as temp_dir:
-            local_path= os.path.join(temp_dir, output_filename)
-            
-            # Split text into manageable chunks 
-            text_chunks = text_chunker(request.text)
-            logger.info(f"Text splt into chunks: {len(text_chunks)}")
-            
-            
-            audio_segments=[]
-            
-            for i, chunk in enumerate(text_chunks):
-                logger.info(f"Processing chunk {i+1}/{len(text_chunks)}")
-                
-                audio_chunk=synthesizer.inference(
-                    text=chunk,
-                    ref_s=current_style
-                    
-                )
-                
-                audio_segments.append(audio_chunk)
-                
-                if i < len(text_chunks) - 1:
-                    silence = np.zeros(int(24000 * 0.3))
-                    audio_segments.append(silence)
-                    
-            if len(audio_segments) > 0:
-                full_audio = np.concatenate(audio_segments)
-                sf.write(local_path, full_audio, 24000)
-                
-                # UPload to S3
-                s3_key =f"{S3_PREFIX}/{output_filename}"
-                s3_client.upload_file(local_path,S3_BUCKET, s3_key)
-                
-                
-                presigned_url = s3_client.generate_presigned_url(
-                    'get_object',
-                    Params= {'Bucket': S3_BUCKET, 'Key': s3_key},
-                    ExpiresIn=3600  # URL valid for 1 hour
-                )
-                
-                return {
-                    "audio_url": presigned_url,
-                    "s3_key": s3_key,
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Audio generation failed, no segments created.")
-
+        return {
+            "audio_url": presign(s3_key),
+            "s3_key": s3_key,
+            "cached": False,
+            "upload_pending": S3_UPLOAD_IN_BACKGROUND,
+        }
+    
+    except QueueFullError as e:
+        raise service_overloaded(e)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Speech generation timed out")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to generate speech: {e}")
         raise HTTPException(status_code=500 , detail ="Failed to generate speech")
             
  
+@app.post("/generate/stream", dependencies=[Depends(verify_api_key)])
+async def generate_speech_stream(request: StreamRequest):
+    validate_request(request)
+    if request.format not in ("wav", "pcm"):
+        raise HTTPException(status_code=400, detail="Unsupported stream format. Choose from wav, pcm.")
+
+    # One admission slot is held for the whole stream, so a stream that has sent its
+    # headers is never turned away by a full queue halfway through
+    try:
+        reservation = synthesis_pool.reserve()
+    except QueueFullError as e:
+        raise service_overloaded(e)
+
+    # Everything that can fail with a status code runs before the response starts:
+    # the style lookup, long-form style sampling and the first chunk
+    try:
+        ref_audio_path = TARGET_VOICES[request.target_voice]
+        current_style = await asyncio.to_thread(style_cache.get, request.target_voice, ref_audio_path)
+        voice_sha256 = await asyncio.to_thread(style_cache.fingerprint, request.target_voice, ref_audio_path)
+        text_chunks = chunk_text(request.text, CHUNK_MAX_TOKENS)
+        logger.info(f"Streaming {len(text_chunks)} chunks with voice {request.target_voice}")
+
+        seeds = chunk_seeds(request.seed, len(text_chunks))
+        styles = None
+        if LONG_FORM_STRIDE > 0 and len(text_chunks) > 1:
+            # Long-form styles need the whole text, so they are sampled before the first chunk
+            styles = await reservation.run(long_form_styles, text_chunks, current_style, seeds,
+                                           **synthesis_params(request))
+        first_chunk, = await reservation.run(synthesize_chunks_cached, text_chunks[:1], current_style, voice_sha256,
+                                             seeds[:1], styles[:1] if styles is not None else None,
+                                             **synthesis_params(request))
+    except asyncio.TimeoutError:
+        reservation.release()
+        raise HTTPException(status_code=504, detail="Speech generation timed out")
+    except BaseException:
+        reservation.release()
+        raise
+
+    audio_segments = []
+    _, _, content_type, extension = OUTPUT_FORMATS[request.output_format]
+    s3_key = f"{S3_PREFIX}/{uuid4()}.{extension}"
+
+    # Each chunk goes through the synthesis pool and is sent as soon as it is done
+    async def audio_stream():
+        try:
+            if request.format == "wav":
+                yield wav_header(SAMPLE_RATE)
+            silence = np.zeros(int(SAMPLE_RATE * CHUNK_SILENCE_SECONDS))
+            audio_segments.append(first_chunk)
+            yield float_to_pcm16(first_chunk)
+            for i in range(1, len(text_chunks)):
+                try:
+                    audio_chunk, = await reservation.run(synthesize_chunks_cached, text_chunks[i:i + 1], current_style,
+                                                         voice_sha256, seeds[i:i + 1],
+                                                         styles[i:i + 1] if styles is not None else None,
+                                                         **synthesis_params(request))
+                except asyncio.TimeoutError:
+                    # Raising drops the connection without the final chunk of the chunked body,
+                    # so the client sees a failed transfer instead of a cleanly ended, truncated one
+                    logger.error(f"Aborting stream at chunk {i+1}/{len(text_chunks)}: synthesis timed out")
+                    raise
+                audio_segments.append(silence)
+                yield float_to_pcm16(silence)
+                audio_segments.append(audio_chunk)
+                yield float_to_pcm16(audio_chunk)
+        finally:
+            reservation.release()
+
+    def finish_stream():
+        # Also released here in case the stream never started, e.g. the client left first
+        reservation.release()
+        if request.upload:
+            upload_full_audio()
+
+    def upload_full_audio():
+        if len(audio_segments) != 2 * len(text_chunks) - 1:
+            logger.warning("Stream ended early, skipping S3 upload")
+            return
+        encoded = encode_audio(np.concatenate(audio_segments), SAMPLE_RATE, request.output_format)
+        try:
+            storage.upload_bytes(encoded, s3_key, content_type)
+        except Exception as e:
+            logger.error(f"Upload of streamed audio to {s3_key} failed: {e}")
+            return
+        logger.info(f"Uploaded streamed audio to {s3_key}")
+
+    headers = {"X-S3-Key": s3_key} if request.upload else {}
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/wav" if request.format == "wav" else f"audio/L16; rate={SAMPLE_RATE}; channels=1",
+        headers=headers,
+        background=BackgroundTask(finish_stream),
+    )
+
+
+@app.get("/metrics", dependencies=[Depends(verify_api_key)])
+async def metrics():
+    if synthesizer:
+        REGISTRY.gauge("phoneme_cache_hits", "Phonemization cache hits since start").set(synthesizer.phonemizer.hits)
+        REGISTRY.gauge("phoneme_cache_misses", "Phonemization cache misses since start").set(synthesizer.phonemizer.misses)
+        if synthesizer.normalizer is not None:
+            REGISTRY.gauge("normalizer_cache_hits", "Text normalization cache hits since start").set(
+                synthesizer.normalizer.hits)
+            REGISTRY.gauge("normalizer_cache_misses", "Text normalization cache misses since start").set(
+                synthesizer.normalizer.misses)
+        unknown = REGISTRY.gauge("unknown_symbols", "Phoneme symbols dropped by the text cleaner since start")
+        for symbol, count in synthesizer.textcleaner.unknown_symbols.most_common(UNKNOWN_SYMBOLS_REPORTED):
+            unknown.set(count, symbol=f"U+{ord(symbol):04X}")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/voices" ,dependencies=[Depends(verify_api_key)])
 
 async def list_voices():
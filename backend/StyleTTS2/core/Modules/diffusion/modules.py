@@ -37,6 +37,17 @@ class AdaLayerNorm(nn.Module):
         x = (1 + gamma) * x + beta
         return x.transpose(1, -1).transpose(-1, -2)
 
+def masked_mean(x: Tensor, mask: Optional[Tensor] = None) -> Tensor:
+    """Mean over the sequence axis of [b, n, c], skipping positions where mask [b, n] is True"""
+    if not exists(mask):
+        return x.mean(axis=1)
+    keep = (~mask).unsqueeze(-1).type_as(x)
+    return (x * keep).sum(axis=1) / keep.sum(axis=1).clamp(min=1.0)
+
+def repeat_batch(x: Optional[Tensor]) -> Optional[Tensor]:
+    """Stacks two copies of x along the batch axis, for running both guidance branches at once"""
+    return torch.cat([x, x], dim=0) if exists(x) else None
+
 class StyleTransformer1d(nn.Module):
     def __init__(
         self,
@@ -141,7 +152,7 @@ class StyleTransformer1d(nn.Module):
 
         return mapping
             
-    def run(self, x, time, embedding, features):
+    def run(self, x, time, embedding, features, embedding_mask=None):
         
         mapping = self.get_mapping(time, features)
         x = torch.cat([x.expand(-1, embedding.size(1), -1), embedding], axis=-1)
@@ -149,9 +160,9 @@ class StyleTransformer1d(nn.Module):
         
         for block in self.blocks:
             x = x + mapping
-            x = block(x, features)
+            x = block(x, features, mask=embedding_mask)
         
-        x = x.mean(axis=1).unsqueeze(1)
+        x = masked_mean(x, embedding_mask).unsqueeze(1)
         x = self.to_out(x)
         x = x.transpose(-1, -2)
         
@@ -162,7 +173,8 @@ class StyleTransformer1d(nn.Module):
                 embedding_mask_proba: float = 0.0,
                 embedding: Optional[Tensor] = None, 
                 features: Optional[Tensor] = None,
-               embedding_scale: float = 1.0) -> Tensor:
+               embedding_scale: float = 1.0,
+                embedding_mask: Optional[Tensor] = None) -> Tensor:
         
         b, device = embedding.shape[0], embedding.device
         fixed_embedding = self.fixed_embedding(embedding)
@@ -174,13 +186,18 @@ class StyleTransformer1d(nn.Module):
             embedding = torch.where(batch_mask, fixed_embedding, embedding)
 
         if embedding_scale != 1.0:
-            # Compute both normal and fixed embedding outputs
-            out = self.run(x, time, embedding=embedding, features=features)
-            out_masked = self.run(x, time, embedding=fixed_embedding, features=features)
+            # Compute both normal and fixed embedding outputs in a single batched pass
+            out, out_masked = self.run(
+                repeat_batch(x),
+                repeat_batch(time),
+                embedding=torch.cat([embedding, fixed_embedding], dim=0),
+                features=repeat_batch(features),
+                embedding_mask=repeat_batch(embedding_mask),
+            ).chunk(2, dim=0)
             # Scale conditional output using classifier-free guidance
             return out_masked + (out - out_masked) * embedding_scale
         else:
-            return self.run(x, time, embedding=embedding, features=features)
+            return self.run(x, time, embedding=embedding, features=features, embedding_mask=embedding_mask)
         
         return x
 
@@ -226,8 +243,8 @@ class StyleTransformerBlock(nn.Module):
 
         self.feed_forward = FeedForward(features=features, multiplier=multiplier)
 
-    def forward(self, x: Tensor, s: Tensor, *, context: Optional[Tensor] = None) -> Tensor:
-        x = self.attention(x, s) + x
+    def forward(self, x: Tensor, s: Tensor, *, context: Optional[Tensor] = None, mask: Optional[Tensor] = None) -> Tensor:
+        x = self.attention(x, s, mask=mask) + x
         if self.use_cross_attention:
             x = self.cross_attention(x, s, context=context) + x
         x = self.feed_forward(x) + x
@@ -268,7 +285,7 @@ class StyleAttention(nn.Module):
             rel_pos_max_distance=rel_pos_max_distance,
         )
 
-    def forward(self, x: Tensor, s: Tensor, *, context: Optional[Tensor] = None) -> Tensor:
+    def forward(self, x: Tensor, s: Tensor, *, context: Optional[Tensor] = None, mask: Optional[Tensor] = None) -> Tensor:
         assert_message = "You must provide a context when using context_features"
         assert not self.context_features or exists(context), assert_message
         # Use context if provided
@@ -278,7 +295,7 @@ class StyleAttention(nn.Module):
         
         q, k, v = (self.to_q(x), *torch.chunk(self.to_kv(context), chunks=2, dim=-1))
         # Compute and return attention
-        return self.attention(q, k, v)
+        return self.attention(q, k, v, mask=mask)
         
 class Transformer1d(nn.Module):
     def __init__(
@@ -383,7 +400,7 @@ class Transformer1d(nn.Module):
 
         return mapping
             
-    def run(self, x, time, embedding, features):
+    def run(self, x, time, embedding, features, embedding_mask=None):
         
         mapping = self.get_mapping(time, features)
         x = torch.cat([x.expand(-1, embedding.size(1), -1), embedding], axis=-1)
@@ -391,9 +408,9 @@ class Transformer1d(nn.Module):
         
         for block in self.blocks:
             x = x + mapping
-            x = block(x)
+            x = block(x, mask=embedding_mask)
         
-        x = x.mean(axis=1).unsqueeze(1)
+        x = masked_mean(x, embedding_mask).unsqueeze(1)
         x = self.to_out(x)
         x = x.transpose(-1, -2)
         
@@ -404,7 +421,8 @@ class Transformer1d(nn.Module):
                 embedding_mask_proba: float = 0.0,
                 embedding: Optional[Tensor] = None, 
                 features: Optional[Tensor] = None,
-               embedding_scale: float = 1.0) -> Tensor:
+               embedding_scale: float = 1.0,
+                embedding_mask: Optional[Tensor] = None) -> Tensor:
         
         b, device = embedding.shape[0], embedding.device
         fixed_embedding = self.fixed_embedding(embedding)
@@ -416,13 +434,18 @@ class Transformer1d(nn.Module):
             embedding = torch.where(batch_mask, fixed_embedding, embedding)
 
         if embedding_scale != 1.0:
-            # Compute both normal and fixed embedding outputs
-            out = self.run(x, time, embedding=embedding, features=features)
-            out_masked = self.run(x, time, embedding=fixed_embedding, features=features)
+            # Compute both normal and fixed embedding outputs in a single batched pass
+            out, out_masked = self.run(
+                repeat_batch(x),
+                repeat_batch(time),
+                embedding=torch.cat([embedding, fixed_embedding], dim=0),
+                features=repeat_batch(features),
+                embedding_mask=repeat_batch(embedding_mask),
+            ).chunk(2, dim=0)
             # Scale conditional output using classifier-free guidance
             return out_masked + (out - out_masked) * embedding_scale
         else:
-            return self.run(x, time, embedding=embedding, features=features)
+            return self.run(x, time, embedding=embedding, features=features, embedding_mask=embedding_mask)
         
         return x
 
@@ -520,13 +543,16 @@ class AttentionBase(nn.Module):
             
         self.to_out = nn.Linear(in_features=mid_features, out_features=out_features)
 
-    def forward(self, q: Tensor, k: Tensor, v: Tensor) -> Tensor:
+    def forward(self, q: Tensor, k: Tensor, v: Tensor, mask: Optional[Tensor] = None) -> Tensor:
         # Split heads
         q, k, v = rearrange_many((q, k, v), "b n (h d) -> b h n d", h=self.num_heads)
         # Compute similarity matrix
         sim = einsum("... n d, ... m d -> ... n m", q, k)
         sim = (sim + self.rel_pos(*sim.shape[-2:])) if self.use_rel_pos else sim
         sim = sim * self.scale
+        # Padded keys (mask is True for padding) get no attention weight
+        if exists(mask):
+            sim = sim.masked_fill(rearrange(mask, "b m -> b 1 1 m"), -torch.finfo(sim.dtype).max)
         # Get attention matrix with softmax
         attn = sim.softmax(dim=-1)
         # Compute values
@@ -572,7 +598,7 @@ class Attention(nn.Module):
             rel_pos_max_distance=rel_pos_max_distance,
         )
 
-    def forward(self, x: Tensor, *, context: Optional[Tensor] = None) -> Tensor:
+    def forward(self, x: Tensor, *, context: Optional[Tensor] = None, mask: Optional[Tensor] = None) -> Tensor:
         assert_message = "You must provide a context when using context_features"
         assert not self.context_features or exists(context), assert_message
         # Use context if provided
@@ -581,7 +607,7 @@ class Attention(nn.Module):
         x, context = self.norm(x), self.norm_context(context)
         q, k, v = (self.to_q(x), *torch.chunk(self.to_kv(context), chunks=2, dim=-1))
         # Compute and return attention
-        return self.attention(q, k, v)
+        return self.attention(q, k, v, mask=mask)
 
 
 """
@@ -627,8 +653,8 @@ class TransformerBlock(nn.Module):
 
         self.feed_forward = FeedForward(features=features, multiplier=multiplier)
 
-    def forward(self, x: Tensor, *, context: Optional[Tensor] = None) -> Tensor:
-        x = self.attention(x) + x
+    def forward(self, x: Tensor, *, context: Optional[Tensor] = None, mask: Optional[Tensor] = None) -> Tensor:
+        x = self.attention(x, mask=mask) + x
         if self.use_cross_attention:
             x = self.cross_attention(x, context=context) + x
         x = self.feed_forward(x) + x
@@ -8,6 +8,7 @@ from einops import rearrange, reduce
 from torch import Tensor
 
 from .utils import *
+from ..utils import randn_like
 
 """
 Diffusion Training
@@ -345,7 +346,7 @@ class Sampler(nn.Module):
     diffusion_types: List[Type[Diffusion]] = []
 
     def forward(
-        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int
+        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int, generator=None
     ) -> Tensor:
         raise NotImplementedError()
 
@@ -372,7 +373,7 @@ class VSampler(Sampler):
         return alpha, beta
 
     def forward(
-        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int
+        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int, generator=None
     ) -> Tensor:
         x = sigmas[0] * noise
         alpha, beta = self.get_alpha_beta(sigmas[0].item())
@@ -410,13 +411,13 @@ class KarrasSampler(Sampler):
         self.s_churn = s_churn
 
     def step(
-        self, x: Tensor, fn: Callable, sigma: float, sigma_next: float, gamma: float
+        self, x: Tensor, fn: Callable, sigma: float, sigma_next: float, gamma: float, generator=None
     ) -> Tensor:
         """Algorithm 2 (step)"""
         # Select temporarily increased noise level
         sigma_hat = sigma + gamma * sigma
         # Add noise to move from sigma to sigma_hat
-        epsilon = self.s_noise * torch.randn_like(x)
+        epsilon = self.s_noise * randn_like(x, generator)
         x_hat = x + sqrt(sigma_hat ** 2 - sigma ** 2) * epsilon
         # Evaluate ∂x/∂sigma at sigma_hat
         d = (x_hat - fn(x_hat, sigma=sigma_hat)) / sigma_hat
@@ -430,7 +431,7 @@ class KarrasSampler(Sampler):
         return x_next
 
     def forward(
-        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int
+        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int, generator=None
     ) -> Tensor:
         x = sigmas[0] * noise
         # Compute gammas
@@ -442,7 +443,7 @@ class KarrasSampler(Sampler):
         # Denoise to sample
         for i in range(num_steps - 1):
             x = self.step(
-                x, fn=fn, sigma=sigmas[i], sigma_next=sigmas[i + 1], gamma=gammas[i]  # type: ignore # noqa
+                x, fn=fn, sigma=sigmas[i], sigma_next=sigmas[i + 1], gamma=gammas[i], generator=generator  # type: ignore # noqa
             )
 
         return x
@@ -457,7 +458,7 @@ class AEulerSampler(Sampler):
         sigma_down = sqrt(sigma_next ** 2 - sigma_up ** 2)
         return sigma_up, sigma_down
 
-    def step(self, x: Tensor, fn: Callable, sigma: float, sigma_next: float) -> Tensor:
+    def step(self, x: Tensor, fn: Callable, sigma: float, sigma_next: float, generator=None) -> Tensor:
         # Sigma steps
         sigma_up, sigma_down = self.get_sigmas(sigma, sigma_next)
         # Derivative at sigma (∂x/∂sigma)
@@ -465,16 +466,16 @@ class AEulerSampler(Sampler):
         # Euler method
         x_next = x + d * (sigma_down - sigma)
         # Add randomness
-        x_next = x_next + torch.randn_like(x) * sigma_up
+        x_next = x_next + randn_like(x, generator) * sigma_up
         return x_next
 
     def forward(
-        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int
+        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int, generator=None
     ) -> Tensor:
         x = sigmas[0] * noise
         # Denoise to sample
         for i in range(num_steps - 1):
-            x = self.step(x, fn=fn, sigma=sigmas[i], sigma_next=sigmas[i + 1])  # type: ignore # noqa
+            x = self.step(x, fn=fn, sigma=sigmas[i], sigma_next=sigmas[i + 1], generator=generator)  # type: ignore # noqa
         return x
 
 
@@ -494,7 +495,7 @@ class ADPM2Sampler(Sampler):
         sigma_mid = ((sigma ** (1 / r) + sigma_down ** (1 / r)) / 2) ** r
         return sigma_up, sigma_down, sigma_mid
 
-    def step(self, x: Tensor, fn: Callable, sigma: float, sigma_next: float) -> Tensor:
+    def step(self, x: Tensor, fn: Callable, sigma: float, sigma_next: float, generator=None) -> Tensor:
         # Sigma steps
         sigma_up, sigma_down, sigma_mid = self.get_sigmas(sigma, sigma_next)
         # Derivative at sigma (∂x/∂sigma)
@@ -506,16 +507,16 @@ class ADPM2Sampler(Sampler):
         # Denoise to next
         x = x + d_mid * (sigma_down - sigma)
         # Add randomness
-        x_next = x + torch.randn_like(x) * sigma_up
+        x_next = x + randn_like(x, generator) * sigma_up
         return x_next
 
     def forward(
-        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int
+        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int, generator=None
     ) -> Tensor:
         x = sigmas[0] * noise
         # Denoise to sample
         for i in range(num_steps - 1):
-            x = self.step(x, fn=fn, sigma=sigmas[i], sigma_next=sigmas[i + 1])  # type: ignore # noqa
+            x = self.step(x, fn=fn, sigma=sigmas[i], sigma_next=sigmas[i + 1], generator=generator)  # type: ignore # noqa
         return x
 
     def inpaint(
@@ -544,6 +545,64 @@ class ADPM2Sampler(Sampler):
         return source * mask + x * ~mask
 
 
+class EulerSampler(Sampler):
+    """Deterministic Euler, one network evaluation per step"""
+
+    diffusion_types = [KDiffusion, VKDiffusion]
+
+    def forward(
+        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int, generator=None
+    ) -> Tensor:
+        x = sigmas[0] * noise
+        for i in range(num_steps - 1):
+            d = (x - fn(x, sigma=sigmas[i])) / sigmas[i]
+            x = x + d * (sigmas[i + 1] - sigmas[i])
+        return x
+
+
+class DPMpp2MSampler(Sampler):
+    """DPM-Solver++(2M) https://arxiv.org/abs/2211.01095, one network evaluation per step"""
+
+    diffusion_types = [KDiffusion, VKDiffusion]
+
+    def forward(
+        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int, generator=None
+    ) -> Tensor:
+        x = sigmas[0] * noise
+        old_denoised = None
+        for i in range(num_steps - 1):
+            sigma, sigma_next = sigmas[i], sigmas[i + 1]
+            denoised = fn(x, sigma=sigma)
+            if sigma_next == 0:
+                x = denoised
+                break
+            # Steps are taken in log-sigma time t = -log(sigma)
+            h = torch.log(sigma) - torch.log(sigma_next)
+            denoised_d = denoised
+            if old_denoised is not None:
+                # Second order: extrapolate the denoised estimate from the previous step
+                r = (torch.log(sigmas[i - 1]) - torch.log(sigma)) / h
+                denoised_d = (1 + 1 / (2 * r)) * denoised - (1 / (2 * r)) * old_denoised
+            x = (sigma_next / sigma) * x - torch.expm1(-h) * denoised_d
+            old_denoised = denoised
+        return x
+
+
+class SingleStepSampler(Sampler):
+    """
+    Deterministic one-evaluation style prediction: the denoiser's estimate at the highest
+    noise level from a zero input, i.e. the mean style given only the conditioning.
+    Ignores the noise, so the result depends on the text and reference alone.
+    """
+
+    diffusion_types = [KDiffusion, VKDiffusion]
+
+    def forward(
+        self, noise: Tensor, fn: Callable, sigmas: Tensor, num_steps: int, generator=None
+    ) -> Tensor:
+        return fn(torch.zeros_like(noise), sigma=sigmas[0])
+
+
 """ Main Classes """
 
 
@@ -571,7 +630,7 @@ class DiffusionSampler(nn.Module):
         assert diffusion.alias in [t.alias for t in sampler.diffusion_types], message
 
     def forward(
-        self, noise: Tensor, num_steps: Optional[int] = None, **kwargs
+        self, noise: Tensor, num_steps: Optional[int] = None, generator=None, **kwargs
     ) -> Tensor:
         device = noise.device
         num_steps = default(num_steps, self.num_steps)  # type: ignore
@@ -581,7 +640,8 @@ class DiffusionSampler(nn.Module):
         # Append additional kwargs to denoise function (used e.g. for conditional unet)
         fn = lambda *a, **ka: self.denoise_fn(*a, **{**ka, **kwargs})  # noqa
         # Sample using sampler
-        x = self.sampler(noise, fn=fn, sigmas=sigmas, num_steps=num_steps)
+        # `generator` seeds the per-step noise, see `randn_like`
+        x = self.sampler(noise, fn=fn, sigmas=sigmas, num_steps=num_steps, generator=generator)
         x = x.clamp(-1.0, 1.0) if self.clamp else x
         return x
 
@@ -3,7 +3,7 @@ import torch.nn.functional as F
 import torch.nn as nn
 from torch.nn import Conv1d, ConvTranspose1d, AvgPool1d, Conv2d
 from torch.nn.utils import weight_norm, remove_weight_norm, spectral_norm
-from .utils import init_weights, get_padding
+from .utils import init_weights, get_padding, rand_like, randn_like
 
 import math
 import random
@@ -107,62 +107,64 @@ class SineGen(torch.nn.Module):
         self.sampling_rate = samp_rate
         self.voiced_threshold = voiced_threshold
         self.flag_for_pulse = flag_for_pulse
-        self.upsample_scale = upsample_scale
+        self.upsample_scale = int(upsample_scale)
+        # multiples of F0 of the fundamental and overtones, not part of checkpoints
+        self.register_buffer("harmonics", torch.arange(1, self.dim + 1, dtype=torch.float32), persistent=False)
 
     def _f02uv(self, f0):
         # generate uv signal
         uv = (f0 > self.voiced_threshold).type(torch.float32)
         return uv
 
-    def _f02sine(self, f0_values):
-        """ f0_values: (batchsize, length, dim)
-            where dim indicates fundamental tone and overtones
+    def phase_increments(self, f0):
+        """
+        Phase advance of every harmonic per F0 frame, as `_f02sine` accumulates it.
+        f0: (batchsize, frames) at frame rate, before upsampling
+        output: (batchsize, frames, dim); summing the frames before a window gives the
+            `phase_offset` that continues the source of a longer signal in that window
         """
+        return self._frame_rad(f0) * 2 * np.pi * self.upsample_scale
+
+    def _frame_rad(self, f0):
         # convert to F0 in rad. The interger part n can be ignored
         # because 2 * np.pi * n doesn't affect phase
-        rad_values = (f0_values / self.sampling_rate) % 1
+        return (f0.unsqueeze(-1) * self.harmonics / self.sampling_rate) % 1
+
+    def _f02sine(self, f0, generator=None, phase_offset=None):
+        """ f0: (batchsize, frames) at frame rate
+            output: (batchsize, frames * upsample_scale, dim)
+            where dim indicates fundamental tone and overtones
+            phase_offset: (batchsize, dim) phase added to every harmonic, for windowed
+            decoding; only used without flag_for_pulse
+        """
+        rad_values = self._frame_rad(f0)
 
         # initial phase noise (no noise for fundamental component)
-        rand_ini = torch.rand(f0_values.shape[0], f0_values.shape[2], \
-                              device=f0_values.device)
+        rand_ini = rand_like(rad_values[:, 0, :], generator)
         rand_ini[:, 0] = 0
-        rad_values[:, 0, :] = rad_values[:, 0, :] + rand_ini
 
         # instantanouse phase sine[t] = sin(2*pi \sum_i=1 ^{t} rad)
         if not self.flag_for_pulse:
-#             # for normal case
-
-#             # To prevent torch.cumsum numerical overflow,
-#             # it is necessary to add -1 whenever \sum_k=1^n rad_value_k > 1.
-#             # Buffer tmp_over_one_idx indicates the time step to add -1.
-#             # This will not change F0 of sine because (x-1) * 2*pi = x * 2*pi
-#             tmp_over_one = torch.cumsum(rad_values, 1) % 1
-#             tmp_over_one_idx = (padDiff(tmp_over_one)) < 0
-#             cumsum_shift = torch.zeros_like(rad_values)
-#             cumsum_shift[:, 1:, :] = tmp_over_one_idx * -1.0
-
-#             phase = torch.cumsum(rad_values, dim=1) * 2 * np.pi
-            rad_values = torch.nn.functional.interpolate(rad_values.transpose(1, 2), 
-                                                         scale_factor=1/self.upsample_scale, 
-                                                         mode="linear").transpose(1, 2)
-    
-#             tmp_over_one = torch.cumsum(rad_values, 1) % 1
-#             tmp_over_one_idx = (padDiff(tmp_over_one)) < 0
-#             cumsum_shift = torch.zeros_like(rad_values)
-#             cumsum_shift[:, 1:, :] = tmp_over_one_idx * -1.0
-    
+            # The phase is accumulated at frame rate and interpolated to sample rate. This
+            # used to upsample F0 first and interpolate it back down, which reads exactly the
+            # frame values but never the first sample, so rand_ini has no effect here. It is
+            # still drawn so seeded outputs do not change.
             phase = torch.cumsum(rad_values, dim=1) * 2 * np.pi
             phase = torch.nn.functional.interpolate(phase.transpose(1, 2) * self.upsample_scale, 
                                                     scale_factor=self.upsample_scale, mode="linear").transpose(1, 2)
-            sines = torch.sin(phase)
+            if phase_offset is not None:
+                phase = phase + phase_offset.unsqueeze(1)
+            sines = phase.sin_()
             
         else:
             # If necessary, make sure that the first time step of every
             # voiced segments is sin(pi) or cos(0)
             # This is used for pulse-train generation
+            rad_values = rad_values.repeat_interleave(self.upsample_scale, dim=1)
+            rad_values[:, 0, :] = rad_values[:, 0, :] + rand_ini
 
             # identify the last time step in unvoiced segments
-            uv = self._f02uv(f0_values)
+            uv = self._f02uv(f0.unsqueeze(-1) * self.harmonics).repeat_interleave(self.upsample_scale, dim=1)
             uv_1 = torch.roll(uv, shifts=-1, dims=1)
             uv_1[:, -1, :] = 1
             u_loc = (uv < 1) * (uv_1 > 0)
@@ -170,7 +172,7 @@ class SineGen(torch.nn.Module):
             # get the instantanouse phase
             tmp_cumsum = torch.cumsum(rad_values, dim=1)
             # different batch needs to be processed differently
-            for idx in range(f0_values.shape[0]):
+            for idx in range(rad_values.shape[0]):
                 temp_sum = tmp_cumsum[idx, u_loc[idx, :, 0], :]
                 temp_sum[1:, :] = temp_sum[1:, :] - temp_sum[0:-1, :]
                 # stores the accumulation of i.phase within
@@ -186,35 +188,29 @@ class SineGen(torch.nn.Module):
             sines = torch.cos(i_phase * 2 * np.pi)
         return sines
 
-    def forward(self, f0):
+    def forward(self, f0, generator=None, phase_offset=None):
         """ sine_tensor, uv = forward(f0)
-        input F0: tensor(batchsize=1, length, dim=1)
+        input F0: tensor(batchsize, frames) at frame rate,
+                  upsampled by upsample_scale on the way
                   f0 for unvoiced steps should be 0
-        output sine_tensor: tensor(batchsize=1, length, dim)
-        output uv: tensor(batchsize=1, length, 1)
+        output sine_tensor: tensor(batchsize, length, dim)
+        output uv: tensor(batchsize, length, 1)
         """
-        f0_buf = torch.zeros(f0.shape[0], f0.shape[1], self.dim,
-                             device=f0.device)
-        # fundamental component
-        fn = torch.multiply(f0, torch.FloatTensor([[range(1, self.harmonic_num + 2)]]).to(f0.device))
-
         # generate sine waveforms
-        sine_waves = self._f02sine(fn) * self.sine_amp
+        sine_waves = self._f02sine(f0, generator, phase_offset).mul_(self.sine_amp)
 
-        # generate uv signal
-        # uv = torch.ones(f0.shape)
-        # uv = uv * (f0 > self.voiced_threshold)
-        uv = self._f02uv(f0)
+        # generate uv signal, repeating frames like nearest upsampling
+        uv = self._f02uv(f0).unsqueeze(-1).repeat_interleave(self.upsample_scale, dim=1)
 
         # noise: for unvoiced should be similar to sine_amp
         #        std = self.sine_amp/3 -> max value ~ self.sine_amp
         # .       for voiced regions is self.noise_std
         noise_amp = uv * self.noise_std + (1 - uv) * self.sine_amp / 3
-        noise = noise_amp * torch.randn_like(sine_waves)
+        noise = randn_like(sine_waves, generator).mul_(noise_amp)
 
         # first: set the unvoiced part to 0 by uv
         # then: additive noise
-        sine_waves = sine_waves * uv + noise
+        sine_waves = sine_waves.mul_(uv).add_(noise)
         return sine_waves, uv, noise
 
 
@@ -229,8 +225,8 @@ class SourceModuleHnNSF(torch.nn.Module):
         note that amplitude of noise in unvoiced is decided
         by sine_amp
     voiced_threshold: threhold to set U/V given F0 (default: 0)
-    Sine_source, noise_source = SourceModuleHnNSF(F0_sampled)
-    F0_sampled (batchsize, length, 1)
+    Sine_source, noise_source = SourceModuleHnNSF(F0)
+    F0 (batchsize, frames) at frame rate
     Sine_source (batchsize, length, 1)
     noise_source (batchsize, length 1)
     uv (batchsize, length, 1)
@@ -251,21 +247,23 @@ class SourceModuleHnNSF(torch.nn.Module):
         self.l_linear = torch.nn.Linear(harmonic_num + 1, 1)
         self.l_tanh = torch.nn.Tanh()
 
-    def forward(self, x):
+    def forward(self, x, generator=None, phase_offset=None):
         """
-        Sine_source, noise_source = SourceModuleHnNSF(F0_sampled)
-        F0_sampled (batchsize, length, 1)
+        Sine_source, noise_source = SourceModuleHnNSF(F0)
+        F0 (batchsize, frames) at frame rate
         Sine_source (batchsize, length, 1)
         noise_source (batchsize, length 1)
         """
         # source for harmonic branch
         with torch.no_grad():
-            sine_wavs, uv, _ = self.l_sin_gen(x)
+            sine_wavs, uv, _ = self.l_sin_gen(x, generator, phase_offset)
         sine_merge = self.l_tanh(self.l_linear(sine_wavs))
 
         # source for noise branch, in the same shape as uv
-        noise = torch.randn_like(uv) * self.sine_amp / 3
+        noise = randn_like(uv, generator) * self.sine_amp / 3
         return sine_merge, noise, uv
+
+
 def padDiff(x):
     return F.pad(F.pad(x, (0,0,-1,1), 'constant', 0) - x, (0,0,0,-1), 'constant', 0)
 
@@ -280,8 +278,6 @@ class Generator(torch.nn.Module):
                     sampling_rate=24000,
                     upsample_scale=np.prod(upsample_rates),
                     harmonic_num=8, voiced_threshod=10)
-
-        self.f0_upsamp = torch.nn.Upsample(scale_factor=np.prod(upsample_rates))
         self.noise_convs = nn.ModuleList()
         self.ups = nn.ModuleList()
         self.noise_res = nn.ModuleList()
@@ -318,11 +314,10 @@ class Generator(torch.nn.Module):
         self.ups.apply(init_weights)
         self.conv_post.apply(init_weights)
 
-    def forward(self, x, s, f0):
+    def forward(self, x, s, f0, generator=None, phase_offset=None):
         
-        f0 = self.f0_upsamp(f0[:, None]).transpose(1, 2)  # bs,n,t
-
-        har_source, noi_source, uv = self.m_source(f0)
+        # the source upsamples F0 to the sample rate itself
+        har_source, noi_source, uv = self.m_source(f0, generator, phase_offset)
         har_source = har_source.transpose(1, 2)
         
         for i in range(self.num_upsamples):
@@ -352,7 +347,8 @@ class Generator(torch.nn.Module):
             remove_weight_norm(l)
         for l in self.resblocks:
             l.remove_weight_norm()
-        remove_weight_norm(self.conv_pre)
+        for l in self.noise_res:
+            l.remove_weight_norm()
         remove_weight_norm(self.conv_post)
 
         
@@ -401,6 +397,14 @@ class AdainResBlk1d(nn.Module):
         out = self._residual(x, s)
         out = (out + self._shortcut(x)) / math.sqrt(2)
         return out
+
+    def remove_weight_norm(self):
+        remove_weight_norm(self.conv1)
+        remove_weight_norm(self.conv2)
+        if self.learned_sc:
+            remove_weight_norm(self.conv1x1)
+        if self.upsample_type != 'none':
+            remove_weight_norm(self.pool)
     
 class UpSample1d(nn.Module):
     def __init__(self, layer_type):
@@ -443,7 +447,7 @@ class Decoder(nn.Module):
         self.generator = Generator(style_dim, resblock_kernel_sizes, upsample_rates, upsample_initial_channel, resblock_dilation_sizes, upsample_kernel_sizes)
 
         
-    def forward(self, asr, F0_curve, N, s):
+    def forward(self, asr, F0_curve, N, s, generator=None, phase_offset=None):
         if self.training:
             downlist = [0, 3, 7]
             F0_down = downlist[random.randint(0, 2)]
@@ -471,7 +475,16 @@ class Decoder(nn.Module):
             if block.upsample_type != "none":
                 res = False
                 
-        x = self.generator(x, s, F0_curve)
+        x = self.generator(x, s, F0_curve, generator, phase_offset)
         return x
+
+    def remove_weight_norm(self):
+        self.encode.remove_weight_norm()
+        for block in self.decode:
+            block.remove_weight_norm()
+        remove_weight_norm(self.F0_conv)
+        remove_weight_norm(self.N_conv)
+        remove_weight_norm(self.asr_res[0])
+        self.generator.remove_weight_norm()
     
     
\ No newline at end of file
@@ -0,0 +1,71 @@
+import math
+from typing import Iterator
+
+import torch
+
+# Decoder frames (aligned text encoder frames) of context decoded on each side of a window.
+# The convolutions of the decoder blocks reach about 11 frames, the vocoder a few more.
+STREAM_CONTEXT_FRAMES = 16
+
+
+@torch.no_grad()
+def decode_stream(decoder, asr: torch.Tensor, F0_curve: torch.Tensor, N: torch.Tensor, s: torch.Tensor,
+                  generator=None, window: int = 48, context: int = STREAM_CONTEXT_FRAMES,
+                  overlap: int = 4) -> Iterator[torch.Tensor]:
+    """
+    Runs an iSTFTNet or HiFi-GAN `Decoder` over fixed windows of frames and yields the
+    waveform window by window, so memory stays bounded and the first audio is ready after
+    one window instead of the whole utterance.
+
+    Every window is decoded with `context` frames on either side, which are cut off again.
+    The harmonic source carries its phase from window to window (`SineGen.phase_increments`),
+    and consecutive windows are cross-faded over `overlap` frames with raised-cosine ramps
+    that sum to one. The AdaIN blocks normalize over the decoded span, so the result is
+    close to, not identical with, a whole-utterance decode.
+
+    Args:
+        asr, F0_curve, N, s: Inputs of `Decoder.forward`; F0_curve and N have twice the frames of asr.
+        generator: Seeded generator for the source noise, drawn anew for every window.
+        window (int): Frames emitted per step; a frame is 600 samples at 24 kHz.
+        context (int): Frames of context on each side of a window.
+        overlap (int): Frames cross-faded between consecutive windows, at most `context`.
+
+    Yields:
+        torch.Tensor: Consecutive waveform pieces, [batch, samples].
+    """
+    if not 0 <= overlap <= context or overlap >= window:
+        raise ValueError(f"Need 0 <= overlap <= context and overlap < window, got {overlap}, {context}, {window}")
+
+    sine_gen = decoder.generator.m_source.l_sin_gen
+    # Samples per asr frame: two F0 frames, each upsampled by the source's scale
+    hop = 2 * int(sine_gen.upsample_scale)
+    total = asr.shape[-1]
+    increments = sine_gen.phase_increments(F0_curve)
+
+    fade_length = overlap * hop
+    fade_in = 0.5 - 0.5 * torch.cos(math.pi * (torch.arange(fade_length, device=asr.device) + 0.5) / fade_length)
+    fade_out = 1 - fade_in
+
+    phase = torch.zeros(asr.shape[0], sine_gen.dim, device=asr.device)
+    phase_frame = 0
+    tail = None
+    for start in range(0, total, window):
+        end = min(start + window, total)
+        emit_start = max(start - overlap, 0)
+        lo, hi = max(emit_start - context, 0), min(end + context, total)
+
+        # Advance the source phase to the first F0 frame of this window
+        phase = (phase + increments[:, phase_frame:2 * lo].sum(dim=1)) % (2 * math.pi)
+        phase_frame = 2 * lo
+
+        audio = decoder(asr[..., lo:hi], F0_curve[..., 2 * lo:2 * hi], N[..., 2 * lo:2 * hi], s, generator,
+                        phase_offset=phase)
+        audio = audio.reshape(audio.shape[0], -1)[:, (emit_start - lo) * hop:(end - lo) * hop]
+
+        if tail is not None:
+            audio[:, :fade_length] = tail * fade_out + audio[:, :fade_length] * fade_in
+        if end < total and overlap:
+            # Held back until the next window fades in over it
+            tail = audio[:, -fade_length:]
+            audio = audio[:, :-fade_length]
+        yield audio
@@ -1,3 +1,6 @@
+import torch
+
+
 def init_weights(m, mean=0.0, std=0.01):
     classname = m.__class__.__name__
     if classname.find("Conv") != -1:
@@ -11,4 +14,26 @@ def apply_weight_norm(m):
 
 
 def get_padding(kernel_size, dilation=1):
-    return int((kernel_size*dilation - dilation)/2)
\ No newline at end of file
+    return int((kernel_size*dilation - dilation)/2)
+
+
+def randn_like(x, generator=None):
+    """
+    `torch.randn_like` that can draw from a seeded generator. A list gives one generator
+    per batch item (None entries use the global RNG). Seeded noise is drawn on the CPU
+    so a seed gives the same values on every device.
+    """
+    if generator is None:
+        return torch.randn_like(x)
+    if isinstance(generator, (list, tuple)):
+        return torch.cat([randn_like(x[i:i + 1], g) for i, g in enumerate(generator)], dim=0)
+    return torch.randn(x.shape, generator=generator).to(x)
+
+
+def rand_like(x, generator=None):
+    """Uniform counterpart of `randn_like`."""
+    if generator is None:
+        return torch.rand_like(x)
+    if isinstance(generator, (list, tuple)):
+        return torch.cat([rand_like(x[i:i + 1], g) for i, g in enumerate(generator)], dim=0)
+    return torch.rand(x.shape, generator=generator).to(x)
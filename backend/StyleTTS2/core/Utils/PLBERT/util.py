@@ -12,12 +12,17 @@ class CustomAlbert(AlbertModel):
         return outputs.last_hidden_state
 
 
+def build_plbert(model_params):
+    """Builds PL-BERT from its `model_params` without loading any weights."""
+    albert_base_configuration = AlbertConfig(**model_params)
+    return CustomAlbert(albert_base_configuration)
+
+
 def load_plbert(log_dir):
     config_path = os.path.join(log_dir, "config.yml")
     plbert_config = yaml.safe_load(open(config_path))
     
-    albert_base_configuration = AlbertConfig(**plbert_config['model_params'])
-    bert = CustomAlbert(albert_base_configuration)
+    bert = build_plbert(plbert_config['model_params'])
 
     files = os.listdir(log_dir)
     ckpts = []
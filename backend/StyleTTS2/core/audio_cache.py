@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from core.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(params: Dict[str, Any]) -> str:
+    """
+    Content address of a synthesis request: the sha256 of its parameters serialized as
+    canonical JSON, so key order and int/float spelling (1 vs 1.0) do not matter.
+    """
+    normalized = {k: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+                  for k, v in params.items()}
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Content-addressed index of synthesized utterances stored in S3.
+
+    Each result is uploaded under `<prefix>/<key>.<ext>`, where the key is the
+    `cache_key` of the request parameters. Lookups check a local LRU of known keys
+    first and fall back to `head_object`, so the index survives restarts and is shared
+    by every replica writing to the same bucket. Known keys expire after `ttl_seconds`
+    and are checked with `head_object` again, so objects deleted from the bucket (e.g.
+    by a lifecycle rule) stop being served within that time.
+    """
+    def __init__(self, s3_client, bucket: str, prefix: str, max_entries: int = 10000, ttl_seconds: float = 300,
+                 registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            s3_client: boto3 S3 client.
+            bucket (str): Bucket the cached audio lives in.
+            prefix (str): Key prefix for cached audio.
+            max_entries (int): Number of known keys kept in the local index.
+            ttl_seconds (float): Seconds a known key is trusted before it is checked again.
+            registry (MetricsRegistry): Registry the cache metrics are recorded in.
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # s3 key -> monotonic time it was last confirmed to exist, in least recently used order
+        self._known: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._lookups = registry.counter("audio_cache_lookups_total", "Utterance cache lookups by result")
+
+    def s3_key(self, key: str, extension: str = "wav") -> str:
+        return f"{self.prefix}/{key}.{extension}"
+
+    def lookup(self, key: str, extension: str = "wav") -> Optional[str]:
+        """Returns the S3 key of a cached result, or None if it has not been synthesized yet."""
+        s3_key = self.s3_key(key, extension)
+        with self._lock:
+            confirmed = self._known.get(s3_key)
+            if confirmed is not None:
+                if time.monotonic() - confirmed < self.ttl_seconds:
+                    self._known.move_to_end(s3_key)
+                    self._lookups.inc(result="local_hit")
+                    return s3_key
+                del self._known[s3_key]
+
+        try:
+            self.s3_client.head_object(Bucket=self.bucket, Key=s3_key)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code not in ("404", "NoSuchKey", "NotFound"):
+                logger.warning(f"Audio cache lookup for {s3_key} failed: {e}")
+            self._lookups.inc(result="miss")
+            return None
+        except BotoCoreError as e:
+            # S3 being unreachable only costs a re-synthesis
+            logger.warning(f"Audio cache lookup for {s3_key} failed: {e}")
+            self._lookups.inc(result="miss")
+            return None
+
+        self._lookups.inc(result="s3_hit")
+        self.add(s3_key)
+        return s3_key
+
+    def add(self, s3_key: str):
+        """Records that `s3_key` has been uploaded."""
+        with self._lock:
+            self._known[s3_key] = time.monotonic()
+            self._known.move_to_end(s3_key)
+            while len(self._known) > self.max_entries:
+                self._known.popitem(last=False)
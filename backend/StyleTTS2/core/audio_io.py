@@ -0,0 +1,63 @@
+import io
+import struct
+
+import numpy as np
+import soundfile as sf
+
+# Data size used in streamed WAV headers whose final length is not known yet.
+# Most players treat it as "read until end of stream".
+STREAMING_DATA_SIZE = 0xFFFFFFFF - 36
+
+
+def float_to_pcm16(audio: np.ndarray) -> bytes:
+    """Converts float audio in [-1, 1] to little-endian 16-bit PCM bytes."""
+    audio = np.clip(audio, -1.0, 1.0)
+    return (audio * 32767.0).astype('<i2').tobytes()
+
+
+def wav_header(sample_rate: int, num_channels: int = 1, bits_per_sample: int = 16, data_size: int = STREAMING_DATA_SIZE) -> bytes:
+    """
+    Builds a 44-byte PCM WAV header.
+
+    Args:
+        sample_rate (int): Sampling rate in Hz.
+        num_channels (int): Number of interleaved channels.
+        bits_per_sample (int): Bits per sample.
+        data_size (int): Size of the data chunk in bytes. Defaults to the streaming
+                         placeholder for when the length is not known up front.
+    """
+    block_align = num_channels * bits_per_sample // 8
+    byte_rate = sample_rate * block_align
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', data_size + 36, b'WAVE',
+        b'fmt ', 16, 1, num_channels, sample_rate, byte_rate, block_align, bits_per_sample,
+        b'data', data_size,
+    )
+
+
+# format name -> (soundfile container, subtype, content type, file extension)
+OUTPUT_FORMATS = {
+    "wav": ("WAV", "PCM_16", "audio/wav", "wav"),
+    "flac": ("FLAC", "PCM_16", "audio/flac", "flac"),
+    "ogg": ("OGG", "VORBIS", "audio/ogg", "ogg"),
+    "opus": ("OGG", "OPUS", "audio/ogg", "opus"),
+    "mp3": ("MP3", "MPEG_LAYER_III", "audio/mpeg", "mp3"),
+}
+
+
+def encode_audio(audio: np.ndarray, sample_rate: int, output_format: str = "wav") -> bytes:
+    """
+    Encodes float audio in [-1, 1] into an in-memory file of the given format.
+
+    Opus only supports 8/12/16/24/48 kHz and MP3 needs libsndfile >= 1.1.0.
+
+    Args:
+        audio (np.ndarray): Mono waveform.
+        sample_rate (int): Sampling rate in Hz.
+        output_format (str): One of `OUTPUT_FORMATS`.
+    """
+    container, subtype, _, _ = OUTPUT_FORMATS[output_format]
+    buffer = io.BytesIO()
+    sf.write(buffer, np.clip(audio, -1.0, 1.0), sample_rate, format=container, subtype=subtype)
+    return buffer.getvalue()
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import List, Optional
+
+import torch
+
+from core.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class _Item:
+    __slots__ = ("tokens", "ref_s", "params", "seed", "style", "future", "enqueued")
+
+    def __init__(self, tokens: List[int], ref_s: torch.Tensor, params: tuple, seed: Optional[int],
+                 style: Optional[torch.Tensor] = None):
+        self.tokens = tokens
+        self.ref_s = ref_s
+        self.params = params
+        self.seed = seed
+        self.style = style
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class BatchScheduler:
+    """
+    Micro-batching front end for `StyleTTS2Inference`.
+
+    Chunks submitted by concurrent requests are collected for up to `max_wait_ms`
+    (or until `max_batch_size` are waiting), grouped by sampling parameters, sorted
+    by token length so similar lengths share a batch, and run through
+    `inference_tokens` as padded batches. Each result is delivered on the future
+    returned by `submit`; cancelling a future before its batch starts drops the chunk.
+    """
+    def __init__(self, synthesizer, max_batch_size: int = 8, max_wait_ms: float = 10.0, max_tokens: int = 4096, registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            synthesizer (StyleTTS2Inference): Model the batches are run on.
+            max_batch_size (int): Maximum number of chunks per forward pass.
+            max_wait_ms (float): How long the first chunk of a batch waits for company.
+            max_tokens (int): Budget for `batch size * longest token sequence`, which
+                              bounds both padding waste and activation memory.
+            registry (MetricsRegistry): Registry the scheduler metrics are recorded in.
+        """
+        self.synthesizer = synthesizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_tokens = max_tokens
+
+        self._pending: List[_Item] = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._batch_size = registry.histogram("scheduler_batch_size", "Chunks per scheduled forward pass",
+                                              buckets=(1, 2, 4, 8, 16, 32, 64))
+        self._padding = registry.histogram("scheduler_padding_ratio", "Fraction of padded tokens per batch",
+                                           buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75))
+        self._wait_time = registry.histogram("scheduler_wait_seconds", "Time chunks waited to be batched")
+        self._batches = registry.counter("scheduler_batches_total", "Forward passes run by the scheduler")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            for item in self._pending:
+                if item.future.set_running_or_notify_cancel():
+                    item.future.set_exception(RuntimeError("BatchScheduler stopped"))
+            self._pending = []
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def submit(self, text: str, ref_s: torch.Tensor, alpha: float = 0.3, beta: float = 0.7, diffusion_steps: int = 5, embedding_scale: float = 1, seed: Optional[int] = None) -> Future:
+        """Queues one chunk and returns a future resolving to its waveform."""
+        return self.submit_many([text], ref_s, alpha, beta, diffusion_steps, embedding_scale, seeds=[seed])[0]
+
+    def submit_many(self, texts: List[str], ref_s: torch.Tensor, alpha: float = 0.3, beta: float = 0.7, diffusion_steps: int = 5, embedding_scale: float = 1, seeds: Optional[List[Optional[int]]] = None, styles: Optional[torch.Tensor] = None) -> List[Future]:
+        """
+        Queues several chunks of one request; they are tokenized in the caller's thread.
+        `seeds` holds an optional seed per chunk and `styles` optional precomputed styles,
+        see `inference_tokens`.
+        """
+        params = (alpha, beta, diffusion_steps, embedding_scale)
+        seeds = seeds if seeds is not None else [None] * len(texts)
+        styles = list(styles) if styles is not None else [None] * len(texts)
+        items = [_Item(tokens, ref_s, params, seed, style)
+                 for tokens, seed, style in zip(self.synthesizer.tokenize_batch(texts), seeds, styles)]
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("BatchScheduler is stopped")
+            self._pending.extend(items)
+            self._cond.notify_all()
+        return [item.future for item in items]
+
+    def _collect(self) -> List[_Item]:
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return []
+            deadline = self._pending[0].enqueued + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            items, self._pending = self._pending, []
+            # Cancelled by callers that gave up, e.g. on a timeout
+            return [item for item in items if not item.future.cancelled()]
+
+    def _make_batches(self, items: List[_Item]) -> List[List[_Item]]:
+        groups = defaultdict(list)
+        for item in items:
+            # Chunks with precomputed styles skip style sampling, so they are batched apart
+            groups[item.params, item.style is not None].append(item)
+
+        batches = []
+        for group in groups.values():
+            # Length buckets: neighbours after sorting have similar lengths
+            group.sort(key=lambda item: len(item.tokens))
+            batch = []
+            for item in group:
+                longest = len(item.tokens)
+                if batch and (len(batch) >= self.max_batch_size or longest * (len(batch) + 1) > self.max_tokens):
+                    batches.append(batch)
+                    batch = []
+                batch.append(item)
+            if batch:
+                batches.append(batch)
+        return batches
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if not items:
+                if self._stopped:
+                    return
+                continue
+            now = time.perf_counter()
+            for item in items:
+                self._wait_time.observe(now - item.enqueued)
+            for batch in self._make_batches(items):
+                self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_Item]):
+        # Futures cancelled since collection are dropped; the rest can no longer be cancelled
+        batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        lengths = [len(item.tokens) for item in batch]
+        self._batches.inc()
+        self._batch_size.observe(len(batch))
+        self._padding.observe(1.0 - sum(lengths) / (max(lengths) * len(batch)))
+
+        alpha, beta, diffusion_steps, embedding_scale = batch[0].params
+        try:
+            outputs = self.synthesizer.inference_tokens(
+                [item.tokens for item in batch],
+                torch.cat([item.ref_s for item in batch], dim=0),
+                alpha=alpha, beta=beta, diffusion_steps=diffusion_steps, embedding_scale=embedding_scale,
+                seeds=[item.seed for item in batch],
+                styles=torch.stack([item.style for item in batch]) if batch[0].style is not None else None,
+            )
+        except Exception as e:
+            logger.error(f"Batched inference failed for {len(batch)} chunks: {e}")
+            for item in batch:
+                item.future.set_exception(e)
+            return
+        for item, output in zip(batch, outputs):
+            item.future.set_result(output)
@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from core.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+DTYPES = {"int16": np.int16, "float32": np.float32}
+
+
+class ChunkCache:
+    """
+    Size-bounded LRU cache of synthesized chunk audio, in memory and optionally on disk.
+
+    Keys are opaque strings, e.g. `cache_key` of the chunk text, voice style hash,
+    sampling parameters, seed and model version. Audio is stored as int16 by default,
+    which halves the footprint of float32 and is what the outputs are encoded to anyway.
+    Memory misses fall through to `<disk_dir>/<key>.npy`; hits on disk are promoted to
+    memory. Both tiers evict least recently used entries once over their byte budget.
+    """
+    def __init__(self, max_memory_bytes: int = 256 << 20, disk_dir: Optional[str] = None, max_disk_bytes: int = 2 << 30,
+                 dtype: str = "int16", registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            max_memory_bytes (int): Byte budget of the in-memory tier.
+            disk_dir (Optional[str]): Directory of the on-disk tier. Memory only if not set.
+            max_disk_bytes (int): Byte budget of the on-disk tier.
+            dtype (str): Storage type, "int16" or "float32".
+            registry (MetricsRegistry): Registry the cache metrics are recorded in.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported chunk cache dtype {dtype}, choose from {', '.join(DTYPES)}")
+        self.dtype = DTYPES[dtype]
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes = 0
+        # key -> file size, in least recently used order
+        self._disk: OrderedDict = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self._lookups = registry.counter("chunk_cache_lookups_total", "Chunk audio cache lookups by result")
+        self._size = registry.gauge("chunk_cache_bytes", "Bytes held by the chunk audio cache per tier")
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Returns the cached float32 audio for `key`, or None."""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self._lookups.inc(result="memory_hit")
+                return self._to_float(audio)
+            on_disk = key in self._disk
+
+        if on_disk:
+            path = self._path(key)
+            try:
+                audio = np.load(path, allow_pickle=False)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable cached chunk {path}: {e}")
+                with self._lock:
+                    self._drop_disk(key)
+            else:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self._put_memory(key, audio)
+                self._lookups.inc(result="disk_hit")
+                return self._to_float(audio)
+
+        self._lookups.inc(result="miss")
+        return None
+
+    def put(self, key: str, audio: np.ndarray):
+        """Stores float audio in [-1, 1] under `key`."""
+        if self.dtype == np.int16:
+            stored = (np.clip(audio, -1.0, 1.0) * 32767.0).astype(np.int16)
+        else:
+            stored = audio.astype(np.float32)
+
+        with self._lock:
+            self._put_memory(key, stored)
+        if self.disk_dir:
+            self._put_disk(key, stored)
+
+    def _to_float(self, audio: np.ndarray) -> np.ndarray:
+        if audio.dtype == np.int16:
+            return audio.astype(np.float32) / 32767.0
+        return audio.astype(np.float32, copy=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def _put_memory(self, key: str, audio: np.ndarray):
+        if audio.nbytes > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        self._memory[key] = audio
+        self._memory_bytes += audio.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+        self._size.set(self._memory_bytes, tier="memory")
+
+    def _put_disk(self, key: str, audio: np.ndarray):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, audio, allow_pickle=False)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logger.warning(f"Could not write cached chunk {path}: {e}")
+            return
+
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._disk_bytes += size
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                evicted = next(iter(self._disk))
+                self._drop_disk(evicted)
+            self._size.set(self._disk_bytes, tier="disk")
+
+    def _drop_disk(self, key: str):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        self._size.set(self._disk_bytes, tier="disk")
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".npy"):
+                continue
+            stat = os.stat(os.path.join(self.disk_dir, name))
+            entries.append((stat.st_mtime, name[:-len(".npy")], stat.st_size))
+        # mtime is bumped on every hit, so it orders entries by recency
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._size.set(self._disk_bytes, tier="disk")
+        logger.info(f"Chunk cache found {len(self._disk)} chunk(s) on disk ({self._disk_bytes} bytes)")
@@ -0,0 +1,174 @@
+import json
+import logging
+from typing import Dict, Optional
+
+import torch
+from torch import nn
+from torch.nn.utils import remove_spectral_norm, remove_weight_norm
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_CHECKPOINT_FORMAT = "styletts2-inference"
+INFERENCE_CHECKPOINT_VERSION = 1
+
+# Modules `StyleTTS2Inference` runs; the aligner, pitch extractor and discriminators are training only
+INFERENCE_MODULES = ["bert", "bert_encoder", "predictor", "decoder", "text_encoder",
+                     "predictor_encoder", "style_encoder", "diffusion"]
+
+EXPORT_DTYPES = {"fp32": torch.float32, "fp16": torch.float16, "bf16": torch.bfloat16}
+
+
+def _has_weight_norm(module: nn.Module) -> bool:
+    return hasattr(module, "weight_g") and hasattr(module, "weight_v")
+
+
+def _has_spectral_norm(module: nn.Module) -> bool:
+    return hasattr(module, "weight_orig") and hasattr(module, "weight_u")
+
+
+def fold_weight_norm(model: Dict[str, nn.Module]) -> int:
+    """
+    Folds the weight_norm and spectral_norm reparametrizations of inference modules
+    into plain weights, so they are not recomputed on every forward pass.
+
+    Uses the modules' own `remove_weight_norm` methods, then folds anything they do
+    not cover (spectral norm in the style encoders). The result is numerically the
+    same in eval mode, where spectral norm does no power iteration.
+
+    Returns:
+        int: Number of reparametrizations left over after the module methods, for logging.
+    """
+    for key in ("text_encoder", "predictor", "decoder"):
+        # Idempotent: skip modules that were folded already
+        if key in model and any(_has_weight_norm(m) for m in model[key].modules()):
+            model[key].remove_weight_norm()
+
+    leftover = 0
+    for key in INFERENCE_MODULES:
+        if key not in model:
+            continue
+        for module in model[key].modules():
+            if _has_weight_norm(module):
+                remove_weight_norm(module)
+                leftover += 1
+            elif _has_spectral_norm(module):
+                remove_spectral_norm(module)
+                leftover += 1
+    return leftover
+
+
+def inference_state_dict(model: Dict[str, nn.Module], dtype: Optional[torch.dtype] = None) -> Dict[str, Dict[str, torch.Tensor]]:
+    """State dicts of the inference modules, with floating point tensors cast to `dtype`."""
+    net = {}
+    for key in INFERENCE_MODULES:
+        state = {}
+        for name, tensor in model[key].state_dict().items():
+            tensor = tensor.detach().cpu()
+            if dtype is not None and tensor.is_floating_point():
+                tensor = tensor.to(dtype)
+            state[name] = tensor.contiguous()
+        net[key] = state
+    return net
+
+
+def export_inference_checkpoint(synthesizer, output_path: str, dtype: str = "fp32"):
+    """
+    Writes a slim checkpoint of a loaded `StyleTTS2Inference` with only the inference
+    modules, weight norm folded, and weights optionally stored in half precision.
+    The checkpoint loads with `weights_only=True` and needs neither the ASR, F0 nor
+    PL-BERT checkpoints, since the PL-BERT config is embedded.
+
+    A `.safetensors` output path writes the same checkpoint in safetensors format,
+    which loads memory-mapped without any unpickling.
+    """
+    if dtype not in EXPORT_DTYPES:
+        raise ValueError(f"Unsupported export dtype {dtype}, choose from {', '.join(EXPORT_DTYPES)}")
+
+    folded = fold_weight_norm(synthesizer.model)
+    logger.info(f"Folded weight norm ({folded} reparametrizations outside the module methods)")
+
+    checkpoint = {
+        "format": INFERENCE_CHECKPOINT_FORMAT,
+        "version": INFERENCE_CHECKPOINT_VERSION,
+        "dtype": dtype,
+        "model_params": synthesizer.config["model_params"],
+        "plbert_params": synthesizer.model.bert.config.to_dict(),
+        "net": inference_state_dict(synthesizer.model, EXPORT_DTYPES[dtype]),
+    }
+    if output_path.endswith(".safetensors"):
+        write_safetensors_checkpoint(checkpoint, output_path)
+    else:
+        torch.save(checkpoint, output_path)
+    return checkpoint
+
+
+def write_safetensors_checkpoint(checkpoint: dict, output_path: str):
+    """
+    Writes a slim checkpoint as safetensors. Tensors are keyed `<module>.<parameter>`,
+    everything else goes into the string metadata, with the configs as JSON.
+    """
+    from safetensors.torch import save_file
+
+    tensors = {f"{key}.{name}": tensor for key, state in checkpoint["net"].items() for name, tensor in state.items()}
+    metadata = {
+        "format": checkpoint["format"],
+        "version": str(checkpoint["version"]),
+        "dtype": checkpoint["dtype"],
+        "model_params": json.dumps(checkpoint["model_params"]),
+        "plbert_params": json.dumps(checkpoint["plbert_params"]),
+    }
+    save_file(tensors, output_path, metadata=metadata)
+
+
+def read_safetensors_checkpoint(path: str) -> dict:
+    """
+    Reads a checkpoint written by `write_safetensors_checkpoint` back into the layout of
+    `export_inference_checkpoint`. The tensors are memory-mapped from the file rather
+    than copied, so every process loading the same file shares its pages.
+    """
+    from safetensors import safe_open
+
+    net: Dict[str, Dict[str, torch.Tensor]] = {}
+    with safe_open(path, framework="pt", device="cpu") as f:
+        metadata = f.metadata() or {}
+        if metadata.get("format") != INFERENCE_CHECKPOINT_FORMAT:
+            raise ValueError(f"{path} is not a {INFERENCE_CHECKPOINT_FORMAT} checkpoint")
+        for name in f.keys():
+            key, param = name.split(".", 1)
+            net.setdefault(key, {})[param] = f.get_tensor(name)
+
+    return {
+        "format": metadata["format"],
+        "version": int(metadata["version"]),
+        "dtype": metadata["dtype"],
+        "model_params": json.loads(metadata["model_params"]),
+        "plbert_params": json.loads(metadata["plbert_params"]),
+        "net": net,
+    }
+
+
+def is_inference_checkpoint(checkpoint: dict) -> bool:
+    return isinstance(checkpoint, dict) and checkpoint.get("format") == INFERENCE_CHECKPOINT_FORMAT
+
+
+def random_inference_checkpoint(model_params: dict, plbert_params: dict, seed: int = 0) -> dict:
+    """
+    A slim fp32 checkpoint of randomly initialized inference modules, in the layout of
+    `export_inference_checkpoint`. The audio is noise, but every stage runs with its real
+    shapes and cost, so benchmarks work without the trained checkpoints.
+    """
+    from models import build_inference_model
+    from utils import recursive_munch
+    from Utils.PLBERT.util import build_plbert
+
+    torch.manual_seed(seed)
+    model = build_inference_model(recursive_munch(model_params), build_plbert(plbert_params))
+    fold_weight_norm(model)
+    return {
+        "format": INFERENCE_CHECKPOINT_FORMAT,
+        "version": INFERENCE_CHECKPOINT_VERSION,
+        "dtype": "fp32",
+        "model_params": model_params,
+        "plbert_params": plbert_params,
+        "net": inference_state_dict(model),
+    }
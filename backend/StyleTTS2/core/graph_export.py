@@ -0,0 +1,333 @@
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+
+import torch
+from torch import nn
+
+from models import AdaLayerNorm
+from Modules.istftnet import TorchSTFT
+
+logger = logging.getLogger(__name__)
+
+GRAPH_FORMAT = "styletts2-graphs"
+GRAPH_BACKENDS = ("torchscript", "onnx")
+ONNX_OPSET = 17
+
+# Stages run per item by `StyleTTS2Inference`, with their input and output names and the
+# dynamic axes of each. Style diffusion stays eager: it is small and seeded per request.
+STAGES = {
+    "text_encoder": (["tokens"], ["t_en"],
+                     {"tokens": {1: "tokens"}, "t_en": {2: "tokens"}}),
+    "bert": (["tokens"], ["bert_dur", "d_en"],
+             {"tokens": {1: "tokens"}, "bert_dur": {1: "tokens"}, "d_en": {2: "tokens"}}),
+    "duration": (["d_en", "s"], ["d", "duration"],
+                 {"d_en": {2: "tokens"}, "d": {1: "tokens"}, "duration": {1: "tokens"}}),
+    "prosody": (["en", "s"], ["F0", "N"],
+                {"en": {2: "frames"}, "F0": {1: "f0_frames"}, "N": {1: "f0_frames"}}),
+    "decoder": (["asr", "F0", "N", "ref"], ["audio"],
+                {"asr": {2: "frames"}, "F0": {1: "f0_frames"}, "N": {1: "f0_frames"}, "audio": {2: "samples"}}),
+}
+
+
+class TextEncoderStage(nn.Module):
+    """`TextEncoder.forward` for one unpadded sequence, so the LSTM needs no packing."""
+    def __init__(self, text_encoder: nn.Module):
+        super().__init__()
+        self.text_encoder = text_encoder
+
+    def forward(self, tokens: torch.Tensor) -> torch.Tensor:
+        x = self.text_encoder.embedding(tokens).transpose(1, 2)
+        for block in self.text_encoder.cnn:
+            x = block(x)
+        x, _ = self.text_encoder.lstm(x.transpose(1, 2))
+        return x.transpose(-1, -2)
+
+
+class BertStage(nn.Module):
+    """PL-BERT and its projection for one unpadded sequence."""
+    def __init__(self, bert: nn.Module, bert_encoder: nn.Module):
+        super().__init__()
+        self.bert = bert
+        self.bert_encoder = bert_encoder
+
+    def forward(self, tokens: torch.Tensor):
+        bert_dur = self.bert(tokens, attention_mask=torch.ones_like(tokens))
+        d_en = self.bert_encoder(bert_dur).transpose(-1, -2)
+        return bert_dur, d_en
+
+
+class DurationStage(nn.Module):
+    """`DurationEncoder.forward` plus the duration head for one unpadded sequence."""
+    def __init__(self, predictor: nn.Module):
+        super().__init__()
+        self.predictor = predictor
+
+    def forward(self, d_en: torch.Tensor, s: torch.Tensor):
+        style = s.unsqueeze(-1).expand(-1, -1, d_en.shape[-1])
+        x = torch.cat([d_en, style], dim=1)
+        for block in self.predictor.text_encoder.lstms:
+            if isinstance(block, AdaLayerNorm):
+                x = block(x.transpose(-1, -2), s).transpose(-1, -2)
+                x = torch.cat([x, style], dim=1)
+            else:
+                x, _ = block(x.transpose(-1, -2))
+                x = x.transpose(-1, -2)
+        d = x.transpose(-1, -2)
+
+        x, _ = self.predictor.lstm(d)
+        duration = torch.sigmoid(self.predictor.duration_proj(x)).sum(dim=-1)
+        return d, duration
+
+
+class ProsodyStage(nn.Module):
+    """F0 and energy prediction from frame-level features."""
+    def __init__(self, predictor: nn.Module):
+        super().__init__()
+        self.predictor = predictor
+
+    def forward(self, en: torch.Tensor, s: torch.Tensor):
+        return self.predictor.F0Ntrain(en, s)
+
+
+class DecoderStage(nn.Module):
+    """The vocoder; its source noise comes from the global RNG, not a per-request generator."""
+    def __init__(self, decoder: nn.Module):
+        super().__init__()
+        self.decoder = decoder
+
+    def forward(self, asr: torch.Tensor, F0: torch.Tensor, N: torch.Tensor, ref: torch.Tensor) -> torch.Tensor:
+        return self.decoder(asr, F0, N, ref)
+
+
+def build_stages(model: Dict[str, nn.Module]) -> Dict[str, nn.Module]:
+    """Graph-friendly wrappers of the loaded inference modules, sharing their weights."""
+    return {
+        "text_encoder": TextEncoderStage(model["text_encoder"]).eval(),
+        "bert": BertStage(model["bert"], model["bert_encoder"]).eval(),
+        "duration": DurationStage(model["predictor"]).eval(),
+        "prosody": ProsodyStage(model["predictor"]).eval(),
+        "decoder": DecoderStage(model["decoder"]).eval(),
+    }
+
+
+def stage_inputs(synthesizer, stages: Dict[str, Callable], text: str, ref_s: torch.Tensor) -> Dict[str, tuple]:
+    """
+    Inputs of every stage for one text, obtained by running `stages` in order. The reference
+    style stands in for a diffusion sample, which does not change any shapes.
+    """
+    tokens = torch.LongTensor(synthesizer.tokenize(text)).unsqueeze(0).to(synthesizer.device)
+    ref, s = ref_s[:, :128], ref_s[:, 128:]
+    with torch.no_grad():
+        t_en = stages["text_encoder"](tokens)
+        _, d_en = stages["bert"](tokens)
+        d, duration = stages["duration"](d_en, s)
+        durations = torch.round(duration).clamp(min=1).long()
+        en = synthesizer.length_regulate(d.transpose(-1, -2), durations)
+        F0, N = stages["prosody"](en, s)
+        asr = synthesizer.length_regulate(t_en, durations)
+    return {
+        "text_encoder": (tokens,),
+        "bert": (tokens,),
+        "duration": (d_en, s),
+        "prosody": (en, s),
+        "decoder": (asr, F0, N, ref),
+    }
+
+
+def _export_torchscript(stage: nn.Module, inputs: tuple, path: str, name: str):
+    with torch.no_grad():
+        # The decoder draws source noise, so re-running it cannot match the trace; its graph
+        # is checked by `check_parity` under a shared seed instead
+        traced = torch.jit.trace(stage, inputs, check_trace=name != "decoder")
+    torch.jit.save(torch.jit.freeze(traced), path)
+
+
+def _export_onnx(stage: nn.Module, inputs: tuple, path: str, name: str):
+    input_names, output_names, dynamic_axes = STAGES[name]
+    with torch.no_grad():
+        torch.onnx.export(stage, inputs, path, input_names=input_names, output_names=output_names,
+                          dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET)
+
+
+def export_graphs(synthesizer, output_dir: str, ref_s: torch.Tensor, backend: str = "torchscript",
+                  text: str = "This sentence is only used to trace the model.") -> dict:
+    """
+    Exports the per-item inference stages of a loaded `StyleTTS2Inference` to `output_dir`,
+    traced on `text`, with dynamic token and frame axes.
+
+    With the "onnx" backend, the iSTFTNet decoder is exported with its convolution STFT,
+    since `torch.istft` has no ONNX equivalent. Stages ONNX still cannot express fall back
+    to TorchScript; the manifest records the backend of each stage.
+
+    Returns:
+        dict: The manifest written to `<output_dir>/manifest.json`.
+    """
+    if backend not in GRAPH_BACKENDS:
+        raise ValueError(f"Unsupported graph backend {backend}, choose from {', '.join(GRAPH_BACKENDS)}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    stages = build_stages(synthesizer.model)
+    inputs = stage_inputs(synthesizer, stages, text, ref_s)
+    manifest = {"format": GRAPH_FORMAT, "model_id": synthesizer.weights_id, "stages": {}}
+    for name, stage in stages.items():
+        stage_backend = backend
+        if backend == "onnx":
+            path = os.path.join(output_dir, f"{name}.onnx")
+            stfts = [m for m in stage.modules() if isinstance(m, TorchSTFT)]
+            previous = [m.use_conv for m in stfts]
+            try:
+                for m in stfts:
+                    m.use_conv = True
+                _export_onnx(stage, inputs[name], path, name)
+            except Exception as e:
+                logger.warning(f"ONNX export of {name} failed, falling back to TorchScript: {e}")
+                stage_backend = "torchscript"
+            finally:
+                for m, use_conv in zip(stfts, previous):
+                    m.use_conv = use_conv
+        if stage_backend == "torchscript":
+            path = os.path.join(output_dir, f"{name}.pt")
+            _export_torchscript(stage, inputs[name], path, name)
+        manifest["stages"][name] = {"backend": stage_backend, "file": os.path.basename(path)}
+        logger.info(f"Exported {name} ({stage_backend}) to {path}")
+
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class _OnnxStage:
+    """Calls an ONNX Runtime session with torch tensors in and out."""
+    def __init__(self, path: str, device: torch.device, providers: Sequence[str]):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, sess_options=options, providers=list(providers))
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.device = device
+
+    def __call__(self, *inputs: torch.Tensor):
+        feeds = {name: x.detach().cpu().numpy() for name, x in zip(self.input_names, inputs)}
+        outputs = [torch.from_numpy(y).to(self.device) for y in self.session.run(None, feeds)]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+
+class _TorchStage:
+    """Calls a TorchScript or compiled module without autograd."""
+    def __init__(self, module: Callable):
+        self.module = module
+
+    def __call__(self, *inputs: torch.Tensor):
+        with torch.no_grad():
+            return self.module(*inputs)
+
+
+class GraphRuntime:
+    """
+    The per-item inference stages as traced graphs or compiled modules. Every stage takes and
+    returns torch tensors, with the signatures of the wrappers in `build_stages`.
+    """
+    def __init__(self, stages: Dict[str, Callable], description: str):
+        missing = [name for name in STAGES if name not in stages]
+        if missing:
+            raise ValueError(f"Graph runtime is missing stages {missing}")
+        self.stages = stages
+        self.description = description
+        self.text_encoder = stages["text_encoder"]
+        self.bert = stages["bert"]
+        self.duration = stages["duration"]
+        self.prosody = stages["prosody"]
+        self.decoder = stages["decoder"]
+
+    @classmethod
+    def load(cls, graph_dir: str, device: torch.device, providers: Sequence[str] = ("CPUExecutionProvider",),
+             model_id: Optional[str] = None) -> "GraphRuntime":
+        """Loads graphs written by `export_graphs`, running ONNX stages on `providers`."""
+        with open(os.path.join(graph_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != GRAPH_FORMAT:
+            raise ValueError(f"{graph_dir} does not hold {GRAPH_FORMAT} graphs")
+        if model_id is not None and manifest.get("model_id") != model_id:
+            logger.warning(f"Graphs in {graph_dir} were exported from other weights "
+                           f"({manifest.get('model_id')}, loaded {model_id})")
+
+        stages = {}
+        for name, entry in manifest["stages"].items():
+            path = os.path.join(graph_dir, entry["file"])
+            if entry["backend"] == "onnx":
+                stages[name] = _OnnxStage(path, device, providers)
+            else:
+                stages[name] = _TorchStage(torch.jit.load(path, map_location=device))
+        backends = sorted({entry["backend"] for entry in manifest["stages"].values()})
+        return cls(stages, f"exported ({', '.join(backends)}) from {graph_dir}")
+
+    @classmethod
+    def compile(cls, model: Dict[str, nn.Module]) -> "GraphRuntime":
+        """`torch.compile`d stages with dynamic shapes; compiled lazily on the first calls."""
+        stages = {name: _TorchStage(torch.compile(stage, dynamic=True)) for name, stage in build_stages(model).items()}
+        return cls(stages, "torch.compile")
+
+
+def reference_stages(model: Dict[str, nn.Module]) -> Dict[str, Callable]:
+    """The stages as `StyleTTS2Inference` runs them eagerly, masks and LSTM packing included."""
+    def no_padding(x: torch.Tensor):
+        lengths = torch.LongTensor([x.shape[-1]]).to(x.device)
+        return lengths, torch.zeros(1, x.shape[-1], dtype=torch.bool, device=x.device)
+
+    def text_encoder(tokens):
+        lengths, mask = no_padding(tokens)
+        return model["text_encoder"](tokens, lengths, mask)
+
+    def bert(tokens):
+        _, mask = no_padding(tokens)
+        bert_dur = model["bert"](tokens, attention_mask=(~mask).int())
+        return bert_dur, model["bert_encoder"](bert_dur).transpose(-1, -2)
+
+    def duration(d_en, s):
+        lengths, mask = no_padding(d_en)
+        predictor = model["predictor"]
+        d = predictor.text_encoder(d_en, s, lengths, mask)
+        x, _ = predictor.lstm(d)
+        return d, torch.sigmoid(predictor.duration_proj(x)).sum(dim=-1)
+
+    return {
+        "text_encoder": text_encoder,
+        "bert": bert,
+        "duration": duration,
+        "prosody": model["predictor"].F0Ntrain,
+        "decoder": model["decoder"],
+    }
+
+
+def check_parity(synthesizer, runtime: GraphRuntime, ref_s: torch.Tensor, texts: List[str]) -> Dict[str, float]:
+    """
+    Largest absolute difference of every stage output between the eager modules and `runtime`,
+    over `texts`. Each stage gets the eager inputs, so errors do not compound.
+
+    The decoder adds random source noise; both sides run from the same global seed, which
+    makes TorchScript bit-comparable. ONNX Runtime draws its own noise, so `decoder_rel_l2`,
+    the relative L2 error of the waveform, is the more useful number there.
+    """
+    eager = reference_stages(synthesizer.model)
+    worst: Dict[str, float] = {}
+    for text in texts:
+        inputs = stage_inputs(synthesizer, eager, text, ref_s)
+        for name, args in inputs.items():
+            with torch.no_grad():
+                torch.manual_seed(0)
+                expected = eager[name](*args)
+                torch.manual_seed(0)
+                actual = runtime.stages[name](*args)
+            expected = expected if isinstance(expected, tuple) else (expected,)
+            actual = actual if isinstance(actual, tuple) else (actual,)
+            for output, a, b in zip(STAGES[name][1], expected, actual):
+                key = f"{name}.{output}"
+                worst[key] = max(worst.get(key, 0.0), (a - b.to(a.device)).abs().max().item())
+            if name == "decoder":
+                a, b = expected[0], actual[0].to(expected[0].device)
+                rel = ((a - b).norm() / a.norm().clamp(min=1e-8)).item()
+                worst["decoder_rel_l2"] = max(worst.get("decoder_rel_l2", 0.0), rel)
+    return worst
@@ -8,33 +8,47 @@ from munch import Munch
 from torch import nn
 import torch.nn.functional as F
 import torchaudio
-import librosa
-from nltk.tokenize import word_tokenize
 import soundfile as sf
-import nltk
 import logging
-from typing import Dict, Any, Optional
+import hashlib
+import pickle
+import zipfile
+from contextlib import nullcontext
+from typing import Dict, Any, Iterator, List, Optional
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    logger.info("Downloading required NLTK data...")
-    nltk.download('punkt_tab')
-    nltk.download('punkt')
-
 from models import *
 from utils import *
 from text_utils import TextCleaner
-
-import phonemizer
-from Utils.PLBERT.util import load_plbert
+from text_normalizer import TextNormalizer
+from phoneme_cache import CachedPhonemizer
+from profiling import PhaseTimer, StageProfiler, StageTimer
+
+from Utils.PLBERT.util import build_plbert, load_plbert
+from export import INFERENCE_MODULES, fold_weight_norm, is_inference_checkpoint, read_safetensors_checkpoint
+from graph_export import GraphRuntime
+from quantization import quantize_model
 from collections import OrderedDict
-from Modules.diffusion.sampler import DiffusionSampler, ADPM2Sampler, KarrasSchedule
+from Modules.diffusion.sampler import (DiffusionSampler, ADPM2Sampler, DPMpp2MSampler, EulerSampler, KarrasSchedule,
+                                      SingleStepSampler)
+from Modules.utils import randn_like
+from Modules.streaming import STREAM_CONTEXT_FRAMES, decode_stream
+from Modules.istftnet import use_conv_stft
+
+# Style diffusion samplers by mode. Network evaluations for `diffusion_steps=n`:
+# adpm2 2(n-1), euler and dpmpp_2m n-1, single_step 1, each doubled by classifier-free
+# guidance when `embedding_scale != 1`. "reference" skips diffusion and uses the reference style.
+STYLE_SAMPLERS = {
+    "adpm2": ADPM2Sampler,
+    "euler": EulerSampler,
+    "dpmpp_2m": DPMpp2MSampler,
+    "single_step": SingleStepSampler,
+}
+STYLE_SAMPLER_MODES = list(STYLE_SAMPLERS) + ["reference"]
+
 
 class StyleTTS2Inference:
     """
@@ -57,7 +71,19 @@ class StyleTTS2Inference:
         
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         
-        self.config = yaml.safe_load(open(config_path))
+        # Default style sampler; the few-step modes trade some style fidelity for latency
+        self.style_sampler = os.getenv("STYLE_SAMPLER", "adpm2")
+        if self.style_sampler not in STYLE_SAMPLER_MODES:
+            raise ValueError(f"Unknown STYLE_SAMPLER {self.style_sampler}, choose from {', '.join(STYLE_SAMPLER_MODES)}")
+        # Per-phase wall time of the constructor, logged once loading is done
+        self.startup_profile = PhaseTimer()
+        # Per-stage inference timings, collected while a `StageTimer` is attached (benchmarks)
+        self.stage_timer: Optional[StageTimer] = None
+        # Per-request stage breakdowns for serving, enabled by PROFILE_STAGES
+        self.profiler = StageProfiler.from_env(torch.cuda.synchronize if self.device.type == "cuda" else None)
+        
+        with self.startup_profile.phase("config"):
+            self.config = yaml.safe_load(open(config_path))
         logger.info(f"Loaded config from: {config_path}")
 
         # Set phonemizer library path
@@ -68,17 +94,70 @@ class StyleTTS2Inference:
         else:
             logger.warning("Phonemizer library path not specified in config or arguments. Phonemizer may fail.")
 
-        # Check if ASR_path exists in config
-        if 'ASR_path' not in self.config:
-            raise KeyError("ASR_path not found in config")
+        with self.startup_profile.phase("read_checkpoint"):
+            checkpoint = self.read_checkpoint(model_path)
+        if is_inference_checkpoint(checkpoint):
+            # Slim checkpoint from tools/export_inference_model.py, self-contained
+            self.model_params = recursive_munch(checkpoint['model_params'])
+            self.load_inference_checkpoint(checkpoint)
+        else:
+            # Check if ASR_path exists in config
+            if 'ASR_path' not in self.config:
+                raise KeyError("ASR_path not found in config")
+            
+            asr_path = self.config['ASR_path']
+            if not os.path.exists(asr_path):
+                raise FileNotFoundError(f"ASR model file not found: {asr_path}")
+            
+            self.model_params = recursive_munch(self.config['model_params'])
+            self.load_models(model_path, checkpoint)
+        del checkpoint
+        
+        # Opt-in int8 inference on CPU: "dynamic" for the LSTM/Linear layers, "static" also
+        # for the decoder convolutions, calibrated by `tools/quantize_model.py calibrate`
+        self.quantization = os.getenv("QUANTIZE", self.config.get('quantize', "none"))
+        if self.quantization != "none" and self.device.type != "cpu":
+            logger.warning(f"Quantization is CPU only, ignoring QUANTIZE={self.quantization} on {self.device}")
+            self.quantization = "none"
+        with self.startup_profile.phase("quantize"):
+            quantize_model(self.model, self.quantization,
+                           os.getenv("QUANTIZE_DECODER_PATH", self.config.get('quantize_decoder_path')))
+        
+        self.weights_id = self.checkpoint_id(config_path, model_path)
+        self.model_id = self.weights_id
+        if self.style_sampler != "adpm2":
+            # Other samplers produce different audio, keep their cached outputs apart
+            self.model_id = f"{self.model_id}-{self.style_sampler}"
+        if self.quantization != "none":
+            self.model_id = f"{self.model_id}-int8-{self.quantization}"
         
-        asr_path = self.config['ASR_path']
-        if not os.path.exists(asr_path):
-            raise FileNotFoundError(f"ASR model file not found: {asr_path}")
+        # "conv" runs the iSTFTNet vocoder's STFT and iSTFT as convolutions, faster on CPU
+        # for its 20-point FFT; numerically the same up to float rounding
+        stft_backend = os.getenv("STFT_BACKEND", "torch")
+        if stft_backend not in ("torch", "conv"):
+            raise ValueError(f"Unknown STFT_BACKEND {stft_backend}, choose from torch, conv")
+        use_conv_stft(self.model.decoder, stft_backend == "conv")
         
-        self.model_params = recursive_munch(self.config['model_params'])
-        self.load_models(model_path)
+        # Optional graph runtime for the per-item stages: "exported" loads the graphs that
+        # tools/export_graphs.py wrote to GRAPH_DIR, "compile" uses torch.compile
+        graph_backend = os.getenv("GRAPH_BACKEND", "eager")
+        self.graphs: Optional[GraphRuntime] = None
+        with self.startup_profile.phase("graphs"):
+            if graph_backend == "exported":
+                providers = os.getenv("ONNX_PROVIDERS", "CPUExecutionProvider").split(",")
+                self.graphs = GraphRuntime.load(os.getenv("GRAPH_DIR", "Models/graphs"), self.device,
+                                                providers=providers, model_id=self.weights_id)
+            elif graph_backend == "compile":
+                self.graphs = GraphRuntime.compile(self.model)
+            elif graph_backend != "eager":
+                raise ValueError(f"Unknown GRAPH_BACKEND {graph_backend}, choose from eager, exported, compile")
+        if self.graphs is not None:
+            logger.info(f"Using {self.graphs.description} graphs")
         
+        # Reference dense-matmul alignment instead of `length_regulate`, for parity checks
+        self.use_dense_alignment = os.getenv("DENSE_ALIGNMENT", "false").lower() in ("1", "true", "yes")
+        
+        start = time.perf_counter()
         self.to_mel = torchaudio.transforms.MelSpectrogram(
             n_mels=80, n_fft=2048, win_length=1200, hop_length=300)
         self.mean, self.std = -4, 4
@@ -86,62 +165,214 @@ class StyleTTS2Inference:
         # Initialize text cleaner
         self.textcleaner = TextCleaner()
         
+        # Numbers, currencies, dates and abbreviations to words ahead of espeak
+        self.normalizer = None
+        if os.getenv("TEXT_NORMALIZATION", "true").lower() in ("1", "true", "yes"):
+            self.normalizer = TextNormalizer(
+                language='en-us',
+                max_entries=int(os.getenv("NORMALIZER_CACHE_SIZE", "10000")),
+            )
+        
+        self.phonemizer = CachedPhonemizer(
+            language='en-us',
+            max_entries=int(os.getenv("PHONEME_CACHE_SIZE", "10000")),
+            db_path=os.getenv("PHONEME_CACHE_DB") or None,
+        )
+        
         # Test espeak-ng
         try:
-            test_phonemes = phonemizer.phonemize("hello world", language='en-us', backend='espeak')
+            test_phonemes = self.phonemizer.phonemize(["hello world"])
             logger.info("✅ espeak-ng is working correctly!")
             logger.info(f"Test phonemes: {test_phonemes}")
         except Exception as e:
             logger.error(f"❌ espeak-ng error: {e}")
+        self.startup_profile.record("text_frontend", time.perf_counter() - start)
         
         logger.info(f"StyleTTS2 Inference initialized on device: {self.device}")
+        logger.info(f"StyleTTS2 startup: {self.startup_profile.summary()}")
+        
+    @staticmethod
+    def read_checkpoint(model_path: str) -> dict:
+        """
+        Reads a checkpoint, memory-mapping its weights where possible.
+
+        `.safetensors` slim exports and zipfile `.pth` checkpoints are memory-mapped. Slim
+        fp32 weights are then used in place on CPU by `load_inference_checkpoint`, so their
+        pages come from the page cache and are shared by all workers on a host. Full
+        training checkpoints are copied into the model by `load_state_dict`; mapping them
+        only avoids holding a second copy while loading. Legacy (non-zipfile) checkpoints
+        cannot be mapped and are read into memory.
+
+        Loads with `weights_only=True` first; full training checkpoints may hold pickled
+        objects and are then fully unpickled.
+        """
+        if model_path.endswith(".safetensors"):
+            return read_safetensors_checkpoint(model_path)
+        mmap = zipfile.is_zipfile(model_path)
+        try:
+            return torch.load(model_path, map_location='cpu', weights_only=True, mmap=mmap)
+        except pickle.UnpicklingError as e:
+            # The weights-only unpickler refuses anything but tensors and plain containers
+            logger.info(f"Checkpoint needs full unpickling, loading with weights_only=False: {e}")
+            return torch.load(model_path, map_location='cpu', weights_only=False, mmap=mmap)
+
+    def load_inference_checkpoint(self, checkpoint: dict):
+        """
+        Loads a slim checkpoint written by `export.export_inference_checkpoint`: only the
+        inference modules are built, weight norm is folded before loading, and half
+        precision weights are cast back to float32 by `load_state_dict`.
+        """
+        with self.startup_profile.phase("build_model"):
+            bert = build_plbert(checkpoint['plbert_params'])
+            self.model = build_inference_model(self.model_params, bert)
+            # The exported weights are already folded, so the module layout must match
+            fold_weight_norm(self.model)
+        
+        # fp32 weights on CPU are used in place, keeping the memory-mapped pages shared
+        # across workers. Anything else is copied and cast by `load_state_dict`.
+        assign = checkpoint.get('dtype', 'fp32') == 'fp32' and self.device.type == 'cpu'
+        with self.startup_profile.phase("load_weights"):
+            for key, state_dict in checkpoint['net'].items():
+                self.model[key].load_state_dict(state_dict, assign=assign)
+        logger.info(f"Loaded slim {checkpoint.get('dtype', 'fp32')} inference checkpoint")
         
-    def load_models(self, model_path: str):
+        self._finish_loading()
+
+    def load_models(self, model_path: str, params_whole: Optional[dict] = None):
         """
         Loads the necessary models for inference.
 
         Args:
             model_path (str): Path to the model weights file.
+            params_whole (Optional[dict]): The already read checkpoint, if available.
         """
-        # Use the correct key names from your config
-        text_aligner = load_ASR_models(self.config['ASR_path'], self.config['ASR_config'])
-        
-        # Use F0_path instead of F0_config
-        pitch_extractor = load_F0_models(self.config['F0_path'])
-        
-        # Use PLBERT_dir instead of PLBERT_config
-        plbert = load_plbert(self.config['PLBERT_dir'])
-        
-        # Build model shell 
-        self.model: Dict[str, nn.Module] = build_model(self.model_params, text_aligner, pitch_extractor, plbert)
+        with self.startup_profile.phase("build_model"):
+            # Use the correct key names from your config
+            text_aligner = load_ASR_models(self.config['ASR_path'], self.config['ASR_config'])
+            
+            # Use F0_path instead of F0_config
+            pitch_extractor = load_F0_models(self.config['F0_path'])
+            
+            # Use PLBERT_dir instead of PLBERT_config
+            plbert = load_plbert(self.config['PLBERT_dir'])
+            
+            # Build model shell 
+            self.model: Dict[str, nn.Module] = build_model(self.model_params, text_aligner, pitch_extractor, plbert)
         
         # load weights
-        params_whole = torch.load(model_path, map_location='cpu', weights_only=False)
+        if params_whole is None:
+            params_whole = self.read_checkpoint(model_path)
         params = params_whole['net']
         
-        for key in self.model: 
-            if key in params:
-                logger.info('%s loaded' % key)
-                try:
-                    self.model[key].load_state_dict(params[key])
-                except RuntimeError:
-                    state_dict = params[key]
-                    new_state_dict = OrderedDict()
-                    for k, v in state_dict.items():
-                        name = k[7:] if k.startswith('module.') else k
-                        new_state_dict[name] = v
-                    self.model[key].load_state_dict(new_state_dict, strict=False)
+        with self.startup_profile.phase("load_weights"):
+            for key in self.model: 
+                if key in params:
+                    logger.info('%s loaded' % key)
+                    try:
+                        self.model[key].load_state_dict(params[key])
+                    except RuntimeError:
+                        state_dict = params[key]
+                        new_state_dict = OrderedDict()
+                        for k, v in state_dict.items():
+                            name = k[7:] if k.startswith('module.') else k
+                            new_state_dict[name] = v
+                        self.model[key].load_state_dict(new_state_dict, strict=False)
         
-        for key in self.model:
-            self.model[key].eval()
-            self.model[key].to(self.device)
+        self._finish_loading()
+
+    def _finish_loading(self):
+        # Drop training-only modules and fold weight norm out of the forward passes
+        for key in list(self.model):
+            if key not in INFERENCE_MODULES:
+                del self.model[key]
+        
+        with self.startup_profile.phase("prepare_model"):
+            fold_weight_norm(self.model)
+            for key in self.model:
+                self.model[key].eval()
+                self.model[key].to(self.device)
             
-        self.sampler = DiffusionSampler(
-            self.model.diffusion.diffusion,
-            sampler=ADPM2Sampler(),
-            sigma_schedule=KarrasSchedule(sigma_min=0.0001, sigma_max=3.0, rho=9.0), # empirical parameters
-            clamp=False
-        )
+        self.samplers = {
+            mode: DiffusionSampler(
+                self.model.diffusion.diffusion,
+                sampler=sampler_class(),
+                sigma_schedule=KarrasSchedule(sigma_min=0.0001, sigma_max=3.0, rho=9.0), # empirical parameters
+                clamp=False
+            )
+            for mode, sampler_class in STYLE_SAMPLERS.items()
+        }
+
+    @staticmethod
+    def checkpoint_id(config_path: str, model_path: str) -> str:
+        """
+        Cheap identifier of the loaded weights and config, used to key cached audio.
+        Built from the checkpoint's name, size and mtime instead of hashing the whole file.
+        """
+        stat = os.stat(model_path)
+        digest = hashlib.sha256()
+        digest.update(f"{os.path.basename(model_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        with open(config_path, "rb") as f:
+            digest.update(f.read())
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def make_generators(seeds: Optional[List[Optional[int]]], batch_size: int):
+        """Per-item CPU generators for `seeds`, or None when nothing is seeded."""
+        if seeds is None or all(seed is None for seed in seeds):
+            return None
+        assert len(seeds) == batch_size, "Need one seed (or None) per batch item"
+        return [torch.Generator().manual_seed(seed) if seed is not None else None for seed in seeds]
+
+    def _stage(self, name: str):
+        """Times an inference stage on the attached `stage_timer`, or else on the `profiler`."""
+        timer = self.stage_timer if self.stage_timer is not None else self.profiler
+        return timer.stage(name) if timer is not None else nullcontext()
+
+    def profile_request(self, kind: str):
+        """Collects the stages run inside into one breakdown when profiling is enabled."""
+        return self.profiler.request(kind) if self.profiler is not None else nullcontext()
+
+    def pad_tokens(self, token_batch: List[List[int]]):
+        """Zero-padded [B, T] token tensor on the model device, and the unpadded lengths."""
+        lengths = [len(tokens) for tokens in token_batch]
+        tokens = torch.zeros(len(token_batch), max(lengths), dtype=torch.long)
+        for i, item in enumerate(token_batch):
+            tokens[i, :len(item)] = torch.LongTensor(item)
+        return tokens.to(self.device), lengths
+
+    @staticmethod
+    def length_regulate(x: torch.Tensor, durations: torch.Tensor) -> torch.Tensor:
+        """
+        Expands token features to frames, repeating token `t` of item `b` `durations[b, t]` times.
+
+        Equivalent to `x @ alignment` with the dense one-hot alignment, but done as an
+        on-device gather: the token of each frame is found with `searchsorted` on the
+        cumulative durations. Padding tokens should have a duration of 0.
+
+        Args:
+            x (torch.Tensor): Token features of shape [B, C, T].
+            durations (torch.Tensor): Integer frames per token of shape [B, T].
+
+        Returns:
+            torch.Tensor: Frame features of shape [B, C, max total frames], zero past the
+                          end of shorter items.
+        """
+        ends = durations.cumsum(dim=-1)
+        totals = ends[:, -1]
+        frames = torch.arange(int(totals.max()), device=x.device).unsqueeze(0)
+        index = torch.searchsorted(ends, frames.expand(ends.shape[0], -1).contiguous(), right=True)
+        index = index.clamp(max=x.shape[-1] - 1)
+        out = x.gather(2, index.unsqueeze(1).expand(-1, x.shape[1], -1))
+        return out.masked_fill((frames >= totals.unsqueeze(1)).unsqueeze(1), 0)
+
+    def dense_alignment(self, pred_dur: torch.Tensor) -> torch.Tensor:
+        """Dense [tokens, frames] one-hot alignment, the reference for `length_regulate`."""
+        pred_aln_trg = torch.zeros(pred_dur.shape[0], int(pred_dur.sum().data))
+        c_frame = 0
+        for i in range(pred_aln_trg.size(0)):
+            pred_aln_trg[i, c_frame:c_frame + int(pred_dur[i].data)] = 1
+            c_frame += int(pred_dur[i].data)
+        return pred_aln_trg.unsqueeze(0).to(self.device)
 
     def length_to_mask(self, lengths: torch.Tensor) -> torch.Tensor:
         mask = torch.arange(lengths.max()).unsqueeze(0).expand(lengths.shape[0], -1).type_as(lengths)
@@ -155,20 +386,29 @@ class StyleTTS2Inference:
         return mel_tensor
 
     def compute_style(self, path: str) -> torch.Tensor:
-        wave, sr = librosa.load(path, sr=24000)
-        audio, index = librosa.effects.trim(wave, top_db=30)
-        if sr != 24000:
-            audio = librosa.resample(audio, orig_sr=sr, target_sr=24000)
-        mel_tensor = self.preprocess(audio).to(self.device)
-
-        with torch.no_grad():
-            ref_s = self.model.style_encoder(mel_tensor.unsqueeze(1))
-            ref_p = self.model.predictor_encoder(mel_tensor.unsqueeze(1))
+        # Only needed to encode reference voices, which are usually served from the style cache
+        import librosa
+        
+        with self.profile_request("compute_style"):
+            with self._stage("load_audio"):
+                wave, sr = librosa.load(path, sr=24000)
+                audio, index = librosa.effects.trim(wave, top_db=30)
+                if sr != 24000:
+                    audio = librosa.resample(audio, orig_sr=sr, target_sr=24000)
+            with self._stage("mel"):
+                mel_tensor = self.preprocess(audio).to(self.device)
+
+            with torch.no_grad():
+                with self._stage("style_encoder"):
+                    ref_s = self.model.style_encoder(mel_tensor.unsqueeze(1))
+                    ref_p = self.model.predictor_encoder(mel_tensor.unsqueeze(1))
 
         return torch.cat([ref_s, ref_p], dim=1)
     
     def text_to_phonemes(self, text: str) -> str:
         """Convert text to phonemes using espeak-ng"""
+        import phonemizer
+        
         return phonemizer.phonemize(
             text, 
             language='en-us', 
@@ -184,30 +424,172 @@ class StyleTTS2Inference:
         # Add your StyleTTS2 synthesis logic here
         return phonemes
     
-    def inference(self, text: str, ref_s: torch.Tensor, alpha: float = 0.3, beta: float = 0.7, diffusion_steps: int = 5, embedding_scale: float = 1) -> np.ndarray:
-        """Main inference method for StyleTTS2"""
-        text = text.strip()
-        # Change backend here too:
-        ps = phonemizer.phonemize([text], language='en-us', backend='espeak')  # Change from 'espeak-ng'
-        ps = word_tokenize(ps[0])
-        ps = ' '.join(ps)
-        tokens = self.textcleaner(ps)
-        tokens.insert(0, 0)
-        tokens = torch.LongTensor(tokens).to(self.device).unsqueeze(0)
-        
-        with torch.no_grad():
-            input_lengths = torch.LongTensor([tokens.shape[-1]]).to(self.device)
-            text_mask = self.length_to_mask(input_lengths).to(self.device)
+    def tokenize_batch(self, texts: List[str]) -> List[List[int]]:
+        """
+        Converts texts to model token ids, phonemizing all uncached texts in a single call.
 
-            t_en = self.model.text_encoder(tokens, input_lengths, text_mask)
-            bert_dur = self.model.bert(tokens, attention_mask=(~text_mask).int())
-            d_en = self.model.bert_encoder(bert_dur).transpose(-1, -2) 
+        Args:
+            texts (List[str]): Texts to tokenize.
+
+        Returns:
+            List[List[int]]: Token ids per text, each starting with the pad token.
+        """
+        texts = [text.strip() for text in texts]
+        if self.normalizer is not None:
+            with self._stage("normalize"):
+                texts = [self.normalizer(text) for text in texts]
+        with self._stage("phonemize"):
+            phonemes = self.phonemizer.phonemize(texts)
+        batch = []
+        with self._stage("tokenize"):
+            for ps in phonemes:
+                tokens = self.textcleaner(ps)
+                tokens.insert(0, 0)
+                batch.append(tokens)
+        return batch
+
+    def tokenize(self, text: str) -> List[int]:
+        return self.tokenize_batch([text])[0]
+
+    def sample_style(self, bert_dur: torch.Tensor, ref_s: torch.Tensor, text_mask: Optional[torch.Tensor] = None,
+                     diffusion_steps: int = 5, embedding_scale: float = 1, generators=None,
+                     sampler: Optional[str] = None) -> torch.Tensor:
+        """
+        Samples [B, 256] style vectors (acoustic then prosodic halves) conditioned on the
+        PL-BERT features and the reference style.
+
+        Args:
+            bert_dur (torch.Tensor): PL-BERT features of shape [B, T, 768].
+            ref_s (torch.Tensor): Reference styles of shape [B, 256].
+            text_mask (Optional[torch.Tensor]): Padding mask of the tokens, for batches.
+            generators: Generator or per-item generators seeding the noise, see `randn_like`.
+            sampler (Optional[str]): One of `STYLE_SAMPLER_MODES`, defaults to `self.style_sampler`.
+        """
+        sampler = sampler or self.style_sampler
+        if sampler == "reference":
+            return ref_s.clone()
+        if sampler not in self.samplers:
+            raise ValueError(f"Unknown style sampler {sampler}, choose from {', '.join(STYLE_SAMPLER_MODES)}")
+
+        kwargs = {"embedding_mask": text_mask} if text_mask is not None else {}
+        noise = randn_like(torch.empty(bert_dur.shape[0], 1, 256, device=self.device), generators)
+        return self.samplers[sampler](noise=noise,
+                                      embedding=bert_dur,
+                                      embedding_scale=embedding_scale,
+                                      features=ref_s, # reference from the same speaker as the embedding
+                                      # the Karras schedule needs two sigmas even for one step
+                                      num_steps=max(diffusion_steps, 2),
+                                      generator=generators,
+                                      **kwargs).squeeze(1)
+
+    def long_form_styles(self, token_batch: List[List[int]], ref_s: torch.Tensor, diffusion_steps: int = 5, embedding_scale: float = 1,
+                         seeds: Optional[List[Optional[int]]] = None, sampler: Optional[str] = None, stride: int = 4,
+                         blend: float = 0.7, prev_style: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Styles for the consecutive chunks of one document, to pass to `inference_tokens(styles=...)`.
 
-            s_pred = self.sampler(noise=torch.randn((1, 256)).unsqueeze(1).to(self.device), 
-                                embedding=bert_dur,
-                                embedding_scale=embedding_scale,
-                                features=ref_s, # reference from the same speaker as the embedding
-                                num_steps=diffusion_steps).squeeze(1)
+        Diffusion only runs on every `stride`-th chunk and on the last one. The chunks between
+        two of these anchors get styles interpolated linearly between them. Each style is then
+        blended with the previous chunk's, `s_i = blend * s_{i-1} + (1 - blend) * s_i`, as in
+        upstream StyleTTS2's long-form inference, so prosody carries over between chunks.
+
+        Args:
+            token_batch (List[List[int]]): Token ids of the chunks, in reading order.
+            seeds (Optional[List[Optional[int]]]): Seed per chunk; anchors use their own.
+            stride (int): Chunks per diffusion call; 1 samples every chunk.
+            blend (float): Weight of the previous chunk's style, 0 disables blending.
+            prev_style (Optional[torch.Tensor]): [1, 256] style of the chunk before the first,
+                                                 to continue a document across calls.
+
+        Returns:
+            torch.Tensor: Styles of shape [len(token_batch), 256].
+        """
+        num_chunks = len(token_batch)
+        anchors = list(range(0, num_chunks, max(stride, 1)))
+        if anchors[-1] != num_chunks - 1:
+            anchors.append(num_chunks - 1)
+
+        with torch.no_grad():
+            tokens, lengths = self.pad_tokens([token_batch[i] for i in anchors])
+            text_mask = self.length_to_mask(torch.LongTensor(lengths)).to(self.device)
+            bert_dur = self.model.bert(tokens, attention_mask=(~text_mask).int())
+            anchor_seeds = [seeds[i] for i in anchors] if seeds is not None else None
+            anchor_styles = self.sample_style(bert_dur, ref_s.expand(len(anchors), -1), text_mask,
+                                              diffusion_steps=diffusion_steps, embedding_scale=embedding_scale,
+                                              generators=self.make_generators(anchor_seeds, len(anchors)),
+                                              sampler=sampler)
+
+            styles = anchor_styles.new_empty(num_chunks, anchor_styles.shape[-1])
+            styles[anchors[0]] = anchor_styles[0]
+            for k in range(len(anchors) - 1):
+                start, end = anchors[k], anchors[k + 1]
+                weights = torch.linspace(0, 1, end - start + 1, device=styles.device).unsqueeze(1)
+                styles[start:end + 1] = (1 - weights) * anchor_styles[k] + weights * anchor_styles[k + 1]
+
+            if blend > 0:
+                previous = prev_style.to(styles.device).squeeze(0) if prev_style is not None else None
+                for i in range(num_chunks):
+                    if previous is not None:
+                        styles[i] = blend * previous + (1 - blend) * styles[i]
+                    previous = styles[i]
+        return styles
+
+    def inference(self, text: str, ref_s: torch.Tensor, alpha: float = 0.3, beta: float = 0.7, diffusion_steps: int = 5, embedding_scale: float = 1, seed: Optional[int] = None, sampler: Optional[str] = None) -> np.ndarray:
+        """
+        Main inference method for StyleTTS2. A `seed` makes the output deterministic.
+        `sampler` overrides the style sampler mode, see `STYLE_SAMPLER_MODES`.
+        """
+        generator = torch.Generator().manual_seed(seed) if seed is not None else None
+        with self.profile_request("inference"), torch.no_grad():
+            d, t_en, pred_dur, s, ref = self._encode(text, ref_s, alpha, beta, diffusion_steps, embedding_scale,
+                                                     generator, sampler)
+            return self._decode(d, t_en, pred_dur, s, ref, generator)
+
+    @torch.no_grad()
+    def inference_stream(self, text: str, ref_s: torch.Tensor, alpha: float = 0.3, beta: float = 0.7, diffusion_steps: int = 5, embedding_scale: float = 1, seed: Optional[int] = None, sampler: Optional[str] = None,
+                         window: int = 48, context: int = STREAM_CONTEXT_FRAMES, overlap: int = 4) -> Iterator[np.ndarray]:
+        """
+        `inference` that yields the waveform in pieces while the decoder runs over windows of
+        `window` frames (600 samples each), see `Modules.streaming.decode_stream`. Memory is
+        bounded by the window instead of the text length, and the first piece is ready after
+        one window. The pieces concatenate to a waveform close to that of `inference`.
+        The decoder always runs eagerly, also with a graph runtime.
+        """
+        generator = torch.Generator().manual_seed(seed) if seed is not None else None
+        with self.profile_request("inference_stream"):
+            d, t_en, pred_dur, s, ref = self._encode(text, ref_s, alpha, beta, diffusion_steps, embedding_scale,
+                                                     generator, sampler)
+            asr, F0_pred, N_pred = self._prosody(d, t_en, pred_dur, s)
+
+        pieces = decode_stream(self.model.decoder, asr, F0_pred, N_pred, ref, generator,
+                               window=window, context=context, overlap=overlap)
+        previous = None
+        for piece in pieces:
+            if previous is not None:
+                yield previous.squeeze(0).cpu().numpy()
+            previous = piece
+        # Same trim as `_decode`, only the very end has the pulse
+        yield previous.squeeze(0).cpu().numpy()[..., :-50]
+
+    def _encode(self, text: str, ref_s: torch.Tensor, alpha: float, beta: float, diffusion_steps: int,
+                embedding_scale: float, generator: Optional[torch.Generator], sampler: Optional[str]):
+        """Token-level stages of `inference`, up to the predicted durations."""
+        with torch.no_grad():
+            tokens = self.tokenize(text)
+            with self._stage("tokenize"):
+                tokens = torch.LongTensor(tokens).to(self.device).unsqueeze(0)
+                input_lengths = torch.LongTensor([tokens.shape[-1]]).to(self.device)
+                text_mask = self.length_to_mask(input_lengths).to(self.device)
+
+            with self._stage("text_encoder"):
+                t_en = self.model.text_encoder(tokens, input_lengths, text_mask)
+            with self._stage("bert"):
+                bert_dur = self.model.bert(tokens, attention_mask=(~text_mask).int())
+                d_en = self.model.bert_encoder(bert_dur).transpose(-1, -2) 
+
+            with self._stage("diffusion"):
+                s_pred = self.sample_style(bert_dur, ref_s, diffusion_steps=diffusion_steps, embedding_scale=embedding_scale,
+                                           generators=generator, sampler=sampler)
 
             s = s_pred[:, 128:]
             ref = s_pred[:, :128]
@@ -215,40 +597,185 @@ class StyleTTS2Inference:
             ref = alpha * ref + (1 - alpha) * ref_s[:, :128]
             s = beta * s + (1 - beta) * ref_s[:, 128:]
 
-            d = self.model.predictor.text_encoder(d_en, s, input_lengths, text_mask)
+            with self._stage("predictor"):
+                d = self.model.predictor.text_encoder(d_en, s, input_lengths, text_mask)
+
+                x, _ = self.model.predictor.lstm(d)
+                duration = self.model.predictor.duration_proj(x)
 
-            x, _ = self.model.predictor.lstm(d)
-            duration = self.model.predictor.duration_proj(x)
+                duration = torch.sigmoid(duration).sum(axis=-1)
+                pred_dur = torch.round(duration.squeeze(0)).clamp(min=1)
 
-            duration = torch.sigmoid(duration).sum(axis=-1)
-            pred_dur = torch.round(duration.squeeze()).clamp(min=1)
+        return d, t_en, pred_dur, s, ref.squeeze().unsqueeze(0)
 
-            pred_aln_trg = torch.zeros(input_lengths, int(pred_dur.sum().data))
-            c_frame = 0
-            for i in range(pred_aln_trg.size(0)):
-                pred_aln_trg[i, c_frame:c_frame + int(pred_dur[i].data)] = 1
-                c_frame += int(pred_dur[i].data)
+    def inference_batch(self, texts: List[str], ref_s: torch.Tensor, alpha: float = 0.3, beta: float = 0.7, diffusion_steps: int = 5, embedding_scale: float = 1, seed: Optional[int] = None, sampler: Optional[str] = None) -> List[np.ndarray]:
+        """
+        Synthesizes several texts at once.
+
+        The token-level stages (text encoder, PL-BERT, style diffusion and duration
+        prediction) run once on the padded batch, masked with `length_to_mask` so padding
+        does not leak into the results. The frame-level stages (F0/energy prediction and
+        the decoder) run per item: their AdaIN blocks normalize over the whole time axis,
+        so decoding a padded batch would not match the serial path.
+
+        Args:
+            texts (List[str]): Texts to synthesize, e.g. the output of a text chunker.
+            ref_s (torch.Tensor): Reference style of shape [1, 256], or [len(texts), 256]
+                                  to use a different voice per text.
+            seed (Optional[int]): Makes the output deterministic; text `i` is seeded with
+                                  `seed + i`, so results do not depend on batch composition.
+            sampler (Optional[str]): Style sampler mode, defaults to `STYLE_SAMPLER`.
+
+        Returns:
+            List[np.ndarray]: One waveform per text, in input order.
+        """
+        if not texts:
+            return []
+        seeds = [seed + i for i in range(len(texts))] if seed is not None else None
+        with self.profile_request("inference_batch"):
+            return self.inference_tokens(self.tokenize_batch(texts), ref_s, alpha=alpha, beta=beta,
+                                         diffusion_steps=diffusion_steps, embedding_scale=embedding_scale, seeds=seeds,
+                                         sampler=sampler)
+
+    def inference_tokens(self, token_batch: List[List[int]], ref_s: torch.Tensor, alpha: float = 0.3, beta: float = 0.7, diffusion_steps: int = 5, embedding_scale: float = 1, seeds: Optional[List[Optional[int]]] = None, sampler: Optional[str] = None, styles: Optional[torch.Tensor] = None) -> List[np.ndarray]:
+        """
+        Batched inference from token ids produced by `tokenize_batch`, with an optional seed per item.
+        `styles` holds precomputed [B, 256] style samples, e.g. from `long_form_styles`, in which
+        case style sampling is skipped.
+        """
+        with self.profile_request("inference_tokens"):
+            return self._inference_tokens(token_batch, ref_s, alpha, beta, diffusion_steps, embedding_scale, seeds,
+                                          sampler, styles)
+
+    def _inference_tokens(self, token_batch: List[List[int]], ref_s: torch.Tensor, alpha: float, beta: float,
+                          diffusion_steps: int, embedding_scale: float, seeds: Optional[List[Optional[int]]],
+                          sampler: Optional[str], styles: Optional[torch.Tensor]) -> List[np.ndarray]:
+        batch_size = len(token_batch)
+        generators = self.make_generators(seeds, batch_size)
+        ref_s = ref_s.expand(batch_size, -1)
+        if self.graphs is not None:
+            return self._inference_tokens_graph(token_batch, ref_s, alpha, beta, diffusion_steps, embedding_scale,
+                                                generators, sampler, styles)
+        with self._stage("tokenize"):
+            tokens, lengths = self.pad_tokens(token_batch)
+
+        with torch.no_grad():
+            input_lengths = torch.LongTensor(lengths).to(self.device)
+            text_mask = self.length_to_mask(input_lengths).to(self.device)
+
+            with self._stage("text_encoder"):
+                t_en = self.model.text_encoder(tokens, input_lengths, text_mask)
+            with self._stage("bert"):
+                bert_dur = self.model.bert(tokens, attention_mask=(~text_mask).int())
+                d_en = self.model.bert_encoder(bert_dur).transpose(-1, -2)
+
+            with self._stage("diffusion"):
+                if styles is not None:
+                    s_pred = styles.to(self.device)
+                else:
+                    s_pred = self.sample_style(bert_dur, ref_s, text_mask, diffusion_steps=diffusion_steps,
+                                               embedding_scale=embedding_scale, generators=generators, sampler=sampler)
 
+            s = s_pred[:, 128:]
+            ref = s_pred[:, :128]
+
+            ref = alpha * ref + (1 - alpha) * ref_s[:, :128]
+            s = beta * s + (1 - beta) * ref_s[:, 128:]
+
+            with self._stage("predictor"):
+                d = self.model.predictor.text_encoder(d_en, s, input_lengths, text_mask)
+
+                # pack so the backward direction of the LSTM does not start on padding
+                x = nn.utils.rnn.pack_padded_sequence(d, input_lengths.cpu(), batch_first=True, enforce_sorted=False)
+                x, _ = self.model.predictor.lstm(x)
+                x, _ = nn.utils.rnn.pad_packed_sequence(x, batch_first=True, total_length=d.shape[1])
+                duration = self.model.predictor.duration_proj(x)
+                duration = torch.sigmoid(duration).sum(axis=-1)
+
+            outputs = []
+            for i, length in enumerate(lengths):
+                pred_dur = torch.round(duration[i, :length]).clamp(min=1)
+                outputs.append(self._decode(d[i:i + 1, :length], t_en[i:i + 1, :, :length],
+                                            pred_dur, s[i:i + 1], ref[i:i + 1],
+                                            generators[i] if generators else None))
+        return outputs
+
+    def _inference_tokens_graph(self, token_batch: List[List[int]], ref_s: torch.Tensor, alpha: float, beta: float,
+                                diffusion_steps: int, embedding_scale: float, generators, sampler: Optional[str],
+                                styles: Optional[torch.Tensor]) -> List[np.ndarray]:
+        """`inference_tokens` on the graph runtime, which runs one unpadded item at a time."""
+        outputs = []
+        with torch.no_grad():
+            for i, item in enumerate(token_batch):
+                tokens = torch.LongTensor(item).unsqueeze(0).to(self.device)
+                generator = generators[i] if generators else None
+
+                with self._stage("text_encoder"):
+                    t_en = self.graphs.text_encoder(tokens)
+                with self._stage("bert"):
+                    bert_dur, d_en = self.graphs.bert(tokens)
+                with self._stage("diffusion"):
+                    if styles is not None:
+                        s_pred = styles[i:i + 1].to(self.device)
+                    else:
+                        s_pred = self.sample_style(bert_dur, ref_s[i:i + 1], diffusion_steps=diffusion_steps,
+                                                   embedding_scale=embedding_scale, generators=generator, sampler=sampler)
+
+                ref = alpha * s_pred[:, :128] + (1 - alpha) * ref_s[i:i + 1, :128]
+                s = beta * s_pred[:, 128:] + (1 - beta) * ref_s[i:i + 1, 128:]
+
+                with self._stage("predictor"):
+                    d, duration = self.graphs.duration(d_en, s)
+                pred_dur = torch.round(duration.squeeze(0)).clamp(min=1)
+                outputs.append(self._decode(d, t_en, pred_dur, s, ref, generator))
+        return outputs
+
+    def _decode(self, d: torch.Tensor, t_en: torch.Tensor, pred_dur: torch.Tensor, s: torch.Tensor, ref: torch.Tensor, generator: Optional[torch.Generator] = None) -> np.ndarray:
+        """Expands one item to frames with its predicted durations and runs the decoder."""
+        asr, F0_pred, N_pred = self._prosody(d, t_en, pred_dur, s)
+
+        with self._stage("decoder"):
+            if self.graphs is not None and generator is None:
+                out = self.graphs.decoder(asr, F0_pred, N_pred, ref)
+            else:
+                # Graphs draw the source noise from the global RNG, so seeded items decode eagerly
+                out = self.model.decoder(asr, F0_pred, N_pred, ref, generator)
+
+        with self._stage("postprocess"):
+            return out.squeeze().cpu().numpy()[..., :-50] # weird pulse at the end of the model, need to be fixed later
+
+    def _prosody(self, d: torch.Tensor, t_en: torch.Tensor, pred_dur: torch.Tensor, s: torch.Tensor):
+        """Decoder inputs of one item: aligned text features, F0 and energy curves."""
+        if self.use_dense_alignment:
+            pred_aln_trg = self.dense_alignment(pred_dur)
+            expand = lambda x: x @ pred_aln_trg
+        else:
+            durations = pred_dur.long().unsqueeze(0)
+            expand = lambda x: self.length_regulate(x, durations)
+
+        with self._stage("alignment"):
             # encode prosody
-            en = (d.transpose(-1, -2) @ pred_aln_trg.unsqueeze(0).to(self.device))
+            en = expand(d.transpose(-1, -2))
             if self.model_params.decoder.type == "hifigan":
                 asr_new = torch.zeros_like(en)
                 asr_new[:, :, 0] = en[:, :, 0]
                 asr_new[:, :, 1:] = en[:, :, 0:-1]
                 en = asr_new
 
-            F0_pred, N_pred = self.model.predictor.F0Ntrain(en, s)
+        with self._stage("predictor"):
+            if self.graphs is not None:
+                F0_pred, N_pred = self.graphs.prosody(en, s)
+            else:
+                F0_pred, N_pred = self.model.predictor.F0Ntrain(en, s)
 
-            asr = (t_en @ pred_aln_trg.unsqueeze(0).to(self.device))
+        with self._stage("alignment"):
+            asr = expand(t_en)
             if self.model_params.decoder.type == "hifigan":
                 asr_new = torch.zeros_like(asr)
                 asr_new[:, :, 0] = asr[:, :, 0]
                 asr_new[:, :, 1:] = asr[:, :, 0:-1]
                 asr = asr_new
-
-            out = self.model.decoder(asr, F0_pred, N_pred, ref.squeeze().unsqueeze(0))
-        
-        return out.squeeze().cpu().numpy()[..., :-50] # weird pulse at the end of the model, need to be fixed later
+        return asr, F0_pred, N_pred
 
 # Test the class
 
@@ -24,6 +24,11 @@ from Modules.discriminators import MultiPeriodDiscriminator, MultiResSpecDiscrim
 from munch import Munch
 import yaml
 
+def flatten_lstm(lstm):
+    """`flatten_parameters`, which dynamically quantized LSTMs do not have."""
+    if hasattr(lstm, "flatten_parameters"):
+        lstm.flatten_parameters()
+
 class LearnedDownSample(nn.Module):
     def __init__(self, layer_type, dim_in):
         super().__init__()
@@ -315,7 +320,7 @@ class TextEncoder(nn.Module):
         x = nn.utils.rnn.pack_padded_sequence(
             x, input_lengths, batch_first=True, enforce_sorted=False)
 
-        self.lstm.flatten_parameters()
+        flatten_lstm(self.lstm)
         x, _ = self.lstm(x)
         x, _ = nn.utils.rnn.pad_packed_sequence(
             x, batch_first=True)
@@ -330,12 +335,16 @@ class TextEncoder(nn.Module):
         
         return x
 
+    def remove_weight_norm(self):
+        for block in self.cnn:
+            remove_weight_norm(block[0])
+
     def inference(self, x):
         x = self.embedding(x)
         x = x.transpose(1, 2)
         x = self.cnn(x)
         x = x.transpose(1, 2)
-        self.lstm.flatten_parameters()
+        flatten_lstm(self.lstm)
         x, _ = self.lstm(x)
         return x
     
@@ -414,6 +423,14 @@ class AdainResBlk1d(nn.Module):
         out = self._residual(x, s)
         out = (out + self._shortcut(x)) / math.sqrt(2)
         return out
+
+    def remove_weight_norm(self):
+        remove_weight_norm(self.conv1)
+        remove_weight_norm(self.conv2)
+        if self.learned_sc:
+            remove_weight_norm(self.conv1x1)
+        if self.upsample_type != 'none':
+            remove_weight_norm(self.pool)
     
 class AdaLayerNorm(nn.Module):
     def __init__(self, style_dim, channels, eps=1e-5):
@@ -478,7 +495,7 @@ class ProsodyPredictor(nn.Module):
         
         m = m.to(text_lengths.device).unsqueeze(1)
         
-        self.lstm.flatten_parameters()
+        flatten_lstm(self.lstm)
         x, _ = self.lstm(x)
         x, _ = nn.utils.rnn.pad_packed_sequence(
             x, batch_first=True)
@@ -508,6 +525,10 @@ class ProsodyPredictor(nn.Module):
         N = self.N_proj(N)
         
         return F0.squeeze(1), N.squeeze(1)
+
+    def remove_weight_norm(self):
+        for block in list(self.F0) + list(self.N):
+            block.remove_weight_norm()
     
     def length_to_mask(self, lengths):
         mask = torch.arange(lengths.max()).unsqueeze(0).expand(lengths.shape[0], -1).type_as(lengths)
@@ -554,7 +575,7 @@ class DurationEncoder(nn.Module):
                 x = x.transpose(-1, -2)
                 x = nn.utils.rnn.pack_padded_sequence(
                     x, input_lengths, batch_first=True, enforce_sorted=False)
-                block.flatten_parameters()
+                flatten_lstm(block)
                 x, _ = block(x)
                 x, _ = nn.utils.rnn.pad_packed_sequence(
                     x, batch_first=True)
@@ -613,6 +634,22 @@ def load_ASR_models(ASR_MODEL_PATH, ASR_MODEL_CONFIG):
     return asr_model
 
 def build_model(args, text_aligner, pitch_extractor, bert):
+    nets = build_inference_model(args, bert)
+    nets.update(
+            text_aligner = text_aligner,
+            pitch_extractor=pitch_extractor,
+
+            mpd = MultiPeriodDiscriminator(),
+            msd = MultiResSpecDiscriminator(),
+        
+            # slm discriminator head
+            wd = WavLMDiscriminator(args.slm.hidden, args.slm.nlayers, args.slm.initial_channel),
+       )
+    
+    return nets
+
+def build_inference_model(args, bert):
+    """Builds only the modules used at inference time, without aligner, pitch extractor or discriminators."""
     assert args.decoder.type in ['istftnet', 'hifigan'], 'Decoder type unknown'
     
     if args.decoder.type == "istftnet":
@@ -681,15 +718,6 @@ def build_model(args, text_aligner, pitch_extractor, bert):
             predictor_encoder=predictor_encoder,
             style_encoder=style_encoder,
             diffusion=diffusion,
-
-            text_aligner = text_aligner,
-            pitch_extractor=pitch_extractor,
-
-            mpd = MultiPeriodDiscriminator(),
-            msd = MultiResSpecDiscriminator(),
-        
-            # slm discriminator head
-            wd = WavLMDiscriminator(args.slm.hidden, args.slm.nlayers, args.slm.initial_channel),
        )
     
     return nets
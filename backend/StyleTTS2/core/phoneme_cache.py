@@ -0,0 +1,143 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_word_tokenize: Optional[Callable[[str], List[str]]] = None
+
+
+def word_tokenize(text: str) -> List[str]:
+    """
+    nltk's `word_tokenize`, imported on first use. NLTK data is never downloaded at runtime
+    (the image ships it); without the punkt models this falls back to nltk's word
+    tokenizer on the whole string, skipping the sentence split.
+    """
+    global _word_tokenize
+    if _word_tokenize is None:
+        import nltk
+        from nltk.tokenize import NLTKWordTokenizer
+        try:
+            nltk.data.find('tokenizers/punkt_tab')
+            _word_tokenize = nltk.tokenize.word_tokenize
+        except LookupError:
+            logger.warning("NLTK punkt_tab data not found, tokenizing phonemes without sentence splitting")
+            _word_tokenize = NLTKWordTokenizer().tokenize
+    return _word_tokenize(text)
+
+
+class CachedPhonemizer:
+    """
+    Text to phoneme conversion with a persistent espeak backend and an LRU cache.
+
+    The espeak backend is built once and reused, instead of being rebuilt by every
+    `phonemizer.phonemize` call. Cache misses of a batch are phonemized together in
+    a single backend call. Results are stored after `word_tokenize`, keyed by
+    (text, language), in memory and optionally in a SQLite file shared across restarts.
+    """
+    def __init__(self, language: str = 'en-us', max_entries: int = 10000, db_path: Optional[str] = None):
+        """
+        Args:
+            language (str): espeak language code.
+            max_entries (int): Maximum number of entries kept in memory.
+            db_path (Optional[str]): SQLite file backing the cache. Memory only if not set.
+        """
+        self.language = language
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._backend = None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # espeak is not thread safe, so backend calls are serialized separately
+        self._backend_lock = threading.Lock()
+
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS phonemes ("
+                "text TEXT NOT NULL, language TEXT NOT NULL, phonemes TEXT NOT NULL, "
+                "PRIMARY KEY (text, language))"
+            )
+            self._db.commit()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            # Imported lazily so PHONEMIZER_ESPEAK_LIBRARY can be set first
+            from phonemizer.backend import EspeakBackend
+            self._backend = EspeakBackend(self.language)
+        return self._backend
+
+    def phonemize(self, texts: List[str]) -> List[str]:
+        """
+        Phonemizes texts, calling espeak once for all of those not cached yet.
+
+        Returns:
+            List[str]: Word-tokenized phoneme strings, one per text.
+        """
+        results: List[Optional[str]] = [None] * len(texts)
+        missing = OrderedDict()
+        with self._lock:
+            for i, text in enumerate(texts):
+                phonemes = self._entries.get(text)
+                if phonemes is not None:
+                    self._entries.move_to_end(text)
+                    results[i] = phonemes
+                    self.hits += 1
+                else:
+                    missing.setdefault(text, []).append(i)
+
+        if missing:
+            found = self._db_lookup(list(missing))
+            to_phonemize = [text for text in missing if text not in found]
+            if to_phonemize:
+                with self._backend_lock:
+                    raw = self.backend.phonemize(to_phonemize)
+                computed = {text: ' '.join(word_tokenize(ps)) for text, ps in zip(to_phonemize, raw)}
+                self._db_store(computed)
+                found.update(computed)
+
+            with self._lock:
+                self.misses += len(to_phonemize)
+                self.hits += len(missing) - len(to_phonemize)
+                for text, indices in missing.items():
+                    for i in indices:
+                        results[i] = found[text]
+                    self._entries[text] = found[text]
+                    self._entries.move_to_end(text)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return results
+
+    def _db_lookup(self, texts: List[str]) -> dict:
+        if self._db is None:
+            return {}
+        found = {}
+        with self._lock:
+            for text in texts:
+                row = self._db.execute(
+                    "SELECT phonemes FROM phonemes WHERE text = ? AND language = ?", (text, self.language)
+                ).fetchone()
+                if row is not None:
+                    found[text] = row[0]
+        return found
+
+    def _db_store(self, entries: dict):
+        if self._db is None or not entries:
+            return
+        with self._lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO phonemes (text, language, phonemes) VALUES (?, ?, ?)",
+                    [(text, self.language, ps) for text, ps in entries.items()],
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist phonemes: {e}")
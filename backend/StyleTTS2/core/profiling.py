@@ -0,0 +1,187 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    """
+    Records the wall time of named, sequential phases, e.g. the steps of a cold start.
+    Re-entering a phase adds to its total.
+    """
+    def __init__(self):
+        self.phases: Dict[str, float] = OrderedDict()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def summary(self) -> str:
+        parts = [f"{name}={seconds:.2f}s" for name, seconds in self.phases.items()]
+        return ", ".join(parts + [f"total={self.total:.2f}s"])
+
+
+class StageTimer:
+    """
+    Accumulates the wall time of named inference stages over many calls, for benchmarks.
+    Not thread safe: attach one to a synthesizer that a single thread drives.
+    """
+    def __init__(self, synchronize: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            synchronize (Optional[Callable[[], None]]): Called around every stage, e.g.
+                `torch.cuda.synchronize`, so asynchronous kernels count towards their stage.
+        """
+        self.synchronize = synchronize
+        self.totals: Dict[str, float] = OrderedDict()
+        self.counts: Dict[str, int] = OrderedDict()
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.synchronize is not None:
+            self.synchronize()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.synchronize is not None:
+                self.synchronize()
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset(self):
+        self.totals.clear()
+        self.counts.clear()
+
+    def snapshot(self) -> Dict[str, float]:
+        """Seconds per stage since the last `reset`."""
+        return dict(self.totals)
+
+
+class StageProfiler:
+    """
+    Per-request stage breakdowns for serving. Stages run inside a `request` add their wall
+    time to a breakdown of the calling thread, which is logged and handed to `on_request`
+    when the outermost request ends. Nested requests (e.g. `inference_tokens` called from
+    `inference`) fold into the outer one.
+
+    Stages are optionally wrapped in `torch.profiler.record_function` ranges, and a sampled
+    fraction of requests runs under `torch.profiler` and dumps a Chrome trace.
+    """
+    def __init__(self, record_functions: bool = False, synchronize: Optional[Callable[[], None]] = None,
+                 trace_sample_rate: float = 0.0, trace_dir: str = "profiles",
+                 on_request: Optional[Callable[[str, Dict[str, float], float], None]] = None):
+        """
+        Args:
+            record_functions (bool): Wrap every stage in a `record_function` range, for
+                external profilers. Traced requests always get them.
+            synchronize (Optional[Callable[[], None]]): Called around every stage, e.g.
+                `torch.cuda.synchronize`, so asynchronous kernels count towards their stage.
+            trace_sample_rate (float): Fraction of requests that dump a profiler trace.
+            trace_dir (str): Directory the traces are written to.
+            on_request (Optional[Callable]): Called with the request kind, the seconds per
+                stage and the total seconds of every finished request.
+        """
+        self.record_functions = record_functions
+        self.synchronize = synchronize
+        self.trace_sample_rate = trace_sample_rate
+        self.trace_dir = trace_dir
+        self.on_request = on_request
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls, synchronize: Optional[Callable[[], None]] = None) -> Optional["StageProfiler"]:
+        """A profiler configured by the PROFILE_* variables, or None unless PROFILE_STAGES is set."""
+        if os.getenv("PROFILE_STAGES", "false").lower() not in ("1", "true", "yes"):
+            return None
+        sync = os.getenv("PROFILE_SYNC", "false").lower() in ("1", "true", "yes")
+        return cls(
+            record_functions=os.getenv("PROFILE_RECORD_FUNCTIONS", "false").lower() in ("1", "true", "yes"),
+            synchronize=synchronize if sync else None,
+            trace_sample_rate=float(os.getenv("PROFILE_TRACE_SAMPLE_RATE", "0")),
+            trace_dir=os.getenv("PROFILE_TRACE_DIR", "profiles"),
+        )
+
+    @contextmanager
+    def stage(self, name: str):
+        breakdown = getattr(self._local, "breakdown", None)
+        if self.record_functions or getattr(self._local, "tracing", False):
+            from torch.profiler import record_function
+            scope = record_function(f"styletts2::{name}")
+        else:
+            scope = nullcontext()
+
+        if self.synchronize is not None:
+            self.synchronize()
+        start = time.perf_counter()
+        try:
+            with scope:
+                yield
+        finally:
+            if self.synchronize is not None:
+                self.synchronize()
+            if breakdown is not None:
+                breakdown[name] = breakdown.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def request(self, kind: str):
+        if getattr(self._local, "breakdown", None) is not None:
+            yield
+            return
+
+        breakdown: Dict[str, float] = OrderedDict()
+        tracing = self.trace_sample_rate > 0 and random.random() < self.trace_sample_rate
+        self._local.breakdown = breakdown
+        self._local.tracing = tracing
+        profiler = self._trace_profiler() if tracing else nullcontext()
+        start = time.perf_counter()
+        try:
+            with profiler:
+                yield
+        finally:
+            total = time.perf_counter() - start
+            self._local.breakdown = None
+            self._local.tracing = False
+            logger.info(f"{kind} took {total * 1000:.1f}ms: "
+                        + ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in breakdown.items()))
+            if tracing:
+                self._export_trace(profiler, kind)
+            if self.on_request is not None:
+                self.on_request(kind, breakdown, total)
+
+    @staticmethod
+    def _trace_profiler():
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        return profile(activities=activities, record_shapes=True)
+
+    def _export_trace(self, profiler, kind: str):
+        try:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            path = os.path.join(self.trace_dir, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{threading.get_ident()}.json")
+            profiler.export_chrome_trace(path)
+            logger.info(f"Wrote profiler trace {path}")
+        except Exception as e:
+            # A failed dump must not fail the request it profiled
+            logger.warning(f"Could not write profiler trace: {e}")
@@ -0,0 +1,114 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from torch import nn
+from torch.ao.quantization import QuantWrapper, convert, get_default_qconfig, prepare, quantize_dynamic
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "dynamic", "static")
+STATIC_DECODER_FORMAT = "styletts2-static-decoder"
+
+# Modules whose LSTM and Linear layers dominate CPU time
+DYNAMIC_MODULES = ["text_encoder", "predictor", "bert", "bert_encoder", "diffusion"]
+
+# Decoder convolutions narrower than this gain little from int8 and cost accuracy
+MIN_STATIC_CHANNELS = 64
+
+
+def quantize_dynamic_modules(model: Dict[str, nn.Module], keys: List[str] = DYNAMIC_MODULES) -> int:
+    """
+    Swaps the LSTM and Linear layers of `keys` for dynamically quantized int8 versions, in
+    place, so references to the modules (e.g. the diffusion sampler's) stay valid. Weights
+    are quantized once; activations are quantized on the fly per batch.
+
+    Returns:
+        int: Number of layers quantized.
+    """
+    count = 0
+    for key in keys:
+        if key not in model:
+            continue
+        count += sum(isinstance(m, (nn.LSTM, nn.Linear)) for m in model[key].modules())
+        quantize_dynamic(model[key], {nn.LSTM, nn.Linear}, dtype=torch.qint8, inplace=True)
+    return count
+
+
+def _static_decoder_convs(decoder: nn.Module) -> List[Tuple[nn.Module, str, nn.Conv1d]]:
+    # conv_post feeds exp() and sin() of the iSTFT, where int8 error is audible
+    skip = {id(getattr(decoder.generator, "conv_post", None))}
+    convs = []
+    for parent in decoder.modules():
+        for name, child in parent.named_children():
+            if type(child) is nn.Conv1d and child.in_channels >= MIN_STATIC_CHANNELS and id(child) not in skip:
+                convs.append((parent, name, child))
+    return convs
+
+
+def prepare_static_decoder(decoder: nn.Module) -> int:
+    """
+    Wraps the decoder's wide Conv1d layers in quant/dequant stubs and inserts observers, so
+    running the decoder collects activation ranges. Everything else stays float.
+
+    Returns:
+        int: Number of convolutions prepared.
+    """
+    qconfig = get_default_qconfig(torch.backends.quantized.engine)
+    convs = _static_decoder_convs(decoder)
+    for parent, name, conv in convs:
+        wrapper = QuantWrapper(conv)
+        wrapper.qconfig = qconfig
+        setattr(parent, name, wrapper)
+    prepare(decoder, inplace=True)
+    return len(convs)
+
+
+def convert_static_decoder(decoder: nn.Module):
+    """Replaces the observed convolutions with int8 ones, using the collected ranges."""
+    convert(decoder, inplace=True)
+
+
+def save_static_decoder(decoder: nn.Module, path: str):
+    torch.save({
+        "format": STATIC_DECODER_FORMAT,
+        "engine": torch.backends.quantized.engine,
+        "state_dict": decoder.state_dict(),
+    }, path)
+
+
+def load_static_decoder(decoder: nn.Module, path: str):
+    """Quantizes `decoder` with the calibration written by `save_static_decoder`."""
+    # Quantized packed weights are not plain tensors, so this needs full unpickling
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    if checkpoint.get("format") != STATIC_DECODER_FORMAT:
+        raise ValueError(f"{path} is not a {STATIC_DECODER_FORMAT} checkpoint")
+    if checkpoint["engine"] != torch.backends.quantized.engine:
+        logger.warning(f"Decoder was calibrated for the {checkpoint['engine']} engine, "
+                       f"running on {torch.backends.quantized.engine}")
+    prepare_static_decoder(decoder)
+    convert_static_decoder(decoder)
+    decoder.load_state_dict(checkpoint["state_dict"])
+
+
+def quantize_model(model: Dict[str, nn.Module], mode: str, decoder_path: Optional[str] = None):
+    """
+    Applies a quantization mode to loaded, weight-norm-folded inference modules on CPU.
+
+    "dynamic" quantizes the LSTM and Linear layers of the text encoder, prosody predictor,
+    PL-BERT and diffusion transformer to int8. "static" additionally runs the decoder's wide
+    convolutions in int8, with activation ranges from `decoder_path`, written by
+    `tools/quantize_model.py calibrate`.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode {mode}, choose from {', '.join(QUANTIZATION_MODES)}")
+    if mode == "none":
+        return
+
+    count = quantize_dynamic_modules(model)
+    logger.info(f"Dynamically quantized {count} LSTM/Linear layers to int8")
+    if mode == "static":
+        if not decoder_path:
+            raise ValueError("Static quantization needs a calibrated decoder, see `tools/quantize_model.py calibrate`")
+        load_static_decoder(model["decoder"], decoder_path)
+        logger.info(f"Loaded int8 decoder convolutions from {decoder_path}")
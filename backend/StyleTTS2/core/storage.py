@@ -0,0 +1,109 @@
+import io
+import logging
+import os
+import random
+import time
+from typing import Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from core.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def build_s3_client(max_pool_connections: int = 32, max_attempts: int = 3):
+    """
+    Creates a boto3 S3 client with a connection pool sized for concurrent uploads.
+
+    Credentials and region come from the usual AWS_* environment variables.
+    `S3_ENDPOINT_URL` points the client at an S3 stand-in such as MinIO or a moto
+    server, e.g. `http://localhost:9000`.
+    """
+    client_kwargs = {'region_name': os.getenv("AWS_REGION", "us-east-1")}
+
+    if os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
+        client_kwargs.update({
+            'aws_access_key_id': os.getenv("AWS_ACCESS_KEY_ID"),
+            'aws_secret_access_key': os.getenv("AWS_SECRET_ACCESS_KEY")
+        })
+
+    if os.getenv("S3_ENDPOINT_URL"):
+        client_kwargs['endpoint_url'] = os.getenv("S3_ENDPOINT_URL")
+
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={'max_attempts': max_attempts, 'mode': 'adaptive'},
+        # MinIO and moto expect path-style addressing
+        s3={'addressing_style': 'path'} if os.getenv("S3_ENDPOINT_URL") else None,
+    )
+    return boto3.client('s3', config=config, **client_kwargs)
+
+
+class S3Storage:
+    """
+    Uploads synthesized audio to S3 and presigns download URLs.
+
+    Uploads go through the boto3 transfer manager, which switches to concurrent
+    multipart uploads above `multipart_threshold`. Failed uploads are retried with
+    exponential backoff on top of botocore's own per-request retries. Upload latency
+    and outcomes are recorded in the metrics registry.
+    """
+    def __init__(self, bucket: str, client=None, multipart_threshold: int = 8 << 20, multipart_chunksize: int = 8 << 20,
+                 max_concurrency: int = 4, upload_attempts: int = 3, registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            bucket (str): Destination bucket.
+            client: boto3 S3 client. Defaults to `build_s3_client()`.
+            multipart_threshold (int): Size in bytes above which uploads are multipart.
+            multipart_chunksize (int): Size in bytes of each multipart part.
+            max_concurrency (int): Parts uploaded in parallel per file.
+            upload_attempts (int): Attempts per upload before giving up.
+            registry (MetricsRegistry): Registry the upload metrics are recorded in.
+        """
+        self.bucket = bucket
+        self.client = client if client is not None else build_s3_client()
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+        )
+        self.upload_attempts = upload_attempts
+
+        self._upload_time = registry.histogram("s3_upload_seconds", "Time spent uploading audio to S3, retries included")
+        self._uploads = registry.counter("s3_uploads_total", "S3 uploads by result")
+        self._upload_bytes = registry.counter("s3_upload_bytes_total", "Bytes uploaded to S3")
+
+    def upload_bytes(self, data: bytes, key: str, content_type: Optional[str] = None):
+        """Uploads `data` to `key`, retrying transient failures. Raises once out of attempts."""
+        extra_args = {"ContentType": content_type} if content_type else None
+        started = time.perf_counter()
+        for attempt in range(1, self.upload_attempts + 1):
+            try:
+                self.client.upload_fileobj(io.BytesIO(data), self.bucket, key,
+                                           ExtraArgs=extra_args, Config=self.transfer_config)
+                break
+            except (BotoCoreError, ClientError) as e:
+                if attempt == self.upload_attempts:
+                    self._uploads.inc(result="failure")
+                    self._upload_time.observe(time.perf_counter() - started, result="failure")
+                    logger.error(f"Upload of {key} failed after {attempt} attempts: {e}")
+                    raise
+                delay = 0.5 * 2 ** (attempt - 1) * (1 + random.random())
+                logger.warning(f"Upload of {key} failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+        self._uploads.inc(result="success")
+        self._upload_bytes.inc(len(data))
+        self._upload_time.observe(time.perf_counter() - started, result="success")
+
+    def presign(self, key: str, expires_in: int = 3600) -> str:
+        """Presigned GET URL. Signing is local, it does not call S3."""
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': key},
+            ExpiresIn=expires_in,
+        )
@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_SUFFIX = ".style.pt"
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Returns the hex sha256 digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StyleCache:
+    """
+    Caches reference-voice style vectors computed by `StyleTTS2Inference.compute_style`.
+
+    Entries are keyed by voice id and the sha256 of the reference WAV. Each vector is
+    also written to a small `.style.pt` sidecar file so a restart does not recompute it;
+    a sidecar is only reused for the same WAV and the same model weights.
+    The file's mtime and size are checked on every lookup; the content hash is only
+    recomputed when they change, and the style only when the hash changes.
+    """
+    def __init__(self, synthesizer, cache_dir: Optional[str] = None):
+        """
+        Args:
+            synthesizer (StyleTTS2Inference): Model used to compute missing styles.
+            cache_dir (Optional[str]): Directory for the sidecar files. Defaults to
+                                       writing them next to each reference WAV.
+        """
+        self.synthesizer = synthesizer
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # voice_id -> (mtime_ns, size, sha256, style)
+        self._entries: Dict[str, Tuple[int, int, str, torch.Tensor]] = {}
+        self._lock = threading.Lock()
+
+    def sidecar_path(self, voice_id: str, ref_audio_path: str) -> str:
+        if self.cache_dir:
+            return os.path.join(self.cache_dir, f"{voice_id}{SIDECAR_SUFFIX}")
+        return os.path.splitext(ref_audio_path)[0] + SIDECAR_SUFFIX
+
+    def get(self, voice_id: str, ref_audio_path: str) -> torch.Tensor:
+        """Returns the style vector for a voice, recomputing it only if the WAV changed."""
+        stat = os.stat(ref_audio_path)
+        with self._lock:
+            entry = self._entries.get(voice_id)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                return entry[3]
+
+            sha = file_sha256(ref_audio_path)
+            if entry is not None and entry[2] == sha:
+                # Touched but unchanged, keep the vector and remember the new mtime
+                style = entry[3]
+            else:
+                style = self._load_sidecar(voice_id, ref_audio_path, sha)
+                if style is None:
+                    style = self._compute(voice_id, ref_audio_path, sha)
+
+            self._entries[voice_id] = (stat.st_mtime_ns, stat.st_size, sha, style)
+            return style
+
+    def fingerprint(self, voice_id: str, ref_audio_path: str) -> str:
+        """Returns the content hash of the reference WAV the cached style was built from."""
+        self.get(voice_id, ref_audio_path)
+        return self._entries[voice_id][2]
+
+    def warm(self, voices: Dict[str, str]):
+        """Fills the cache for every `voice_id -> reference WAV` entry."""
+        for voice_id, ref_audio_path in voices.items():
+            if not os.path.exists(ref_audio_path):
+                logger.warning(f"Reference audio for voice {voice_id} not found: {ref_audio_path}")
+                continue
+            self.get(voice_id, ref_audio_path)
+        logger.info(f"Style cache ready for {len(self._entries)} voice(s)")
+
+    def _load_sidecar(self, voice_id: str, ref_audio_path: str, sha: str) -> Optional[torch.Tensor]:
+        path = self.sidecar_path(voice_id, ref_audio_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            payload = torch.load(path, map_location="cpu", weights_only=True)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable style sidecar {path}: {e}")
+            return None
+        if payload.get("sha256") != sha:
+            logger.info(f"Reference audio for voice {voice_id} changed, recomputing style")
+            return None
+        if payload.get("weights_id") != self.synthesizer.weights_id:
+            logger.info(f"Style sidecar for voice {voice_id} was computed with other weights, recomputing style")
+            return None
+        logger.info(f"Loaded cached style for voice {voice_id} from {path}")
+        return payload["style"].to(self.synthesizer.device)
+
+    def _compute(self, voice_id: str, ref_audio_path: str, sha: str) -> torch.Tensor:
+        logger.info(f"Computing style for voice {voice_id} from {ref_audio_path}")
+        style = self.synthesizer.compute_style(ref_audio_path)
+
+        path = self.sidecar_path(voice_id, ref_audio_path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            torch.save({"sha256": sha, "weights_id": self.synthesizer.weights_id, "style": style.detach().cpu()},
+                       tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write style sidecar {path}: {e}")
+        return style
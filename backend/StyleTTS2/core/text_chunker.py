@@ -0,0 +1,195 @@
+import math
+import re
+from typing import Iterator, List, Tuple
+
+# Bumped whenever the same text may be chunked differently, e.g. for cache keys
+CHUNKER_VERSION = 3
+
+# Default budget in estimated phoneme tokens per chunk. Style diffusion and the duration
+# predictor see the whole chunk, and quality drops well before PL-BERT's 512 positions;
+# 160 tokens is a little above the old 125 character limit.
+MAX_CHUNK_TOKENS = 160
+
+# Abbreviations whose trailing period does not end a sentence, lowercase and without it
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "mx", "dr", "prof", "sr", "jr", "capt", "lt", "sgt", "cpt", "vs", "etc", "e.g", "i.e",
+    "cf", "al", "approx", "dept", "figs", "nos", "vols", "pp", "inc", "ltd", "corp", "jan", "feb", "apr", "jun",
+    "jul", "aug", "sept", "oct", "nov", "dec", "a.m", "p.m", "u.s", "u.k",
+})
+# Abbreviations that are also words ("no", "sec", "est"), only taken as such before a number
+NUMBER_ABBREVIATIONS = frozenset({"no", "vol", "fig", "p", "ch", "sec", "est", "mar"})
+# Titles and names that are also words ("gen", "sun", "co"), only taken as such when
+# capitalized and followed by a capitalized word or a number, as in "Gen. Lee" or "Sun. 5"
+TITLE_ABBREVIATIONS = frozenset({
+    "st", "mt", "ft", "rev", "gen", "gov", "sen", "rep", "col", "hon", "co", "mon", "tue", "wed", "thu", "fri",
+    "sat", "sun",
+})
+# Capitalized words that usually open a sentence rather than continue a name, so a single
+# capital before them is not an initial: "Plan B. Next" splits, "John F. Kennedy" does not
+SENTENCE_STARTERS = frozenset({
+    "a", "an", "the", "this", "that", "these", "those", "there", "then", "next", "now", "so", "but", "and", "or",
+    "yet", "if", "when", "while", "after", "before", "because", "since", "although", "however", "finally", "first",
+    "also", "still", "in", "on", "at", "for", "from", "with", "by", "to", "of", "as", "it", "its", "i", "we", "you",
+    "he", "she", "they", "my", "our", "your", "his", "her", "their", "what", "why", "how", "who", "where", "which",
+    "is", "are", "was", "were", "do", "does", "did", "no", "not", "yes", "all", "some", "each", "every", "let",
+})
+
+# Terminal punctuation with any closing quotes or brackets, followed by whitespace or the
+# end of the text; or a line break. Decimals like "3.5" never match, nor does "U.S.A" inside a word.
+_BOUNDARY = re.compile(r'[.!?…]+[")\]\'’”]*(?=\s|$)|\n')
+_CLAUSE_END = re.compile(r'[,;:–—]["\'’”]*$')
+_WHITESPACE = re.compile(r'\s*')
+_WORD = re.compile(r'[^\W\d_]+')
+
+# Extra tokens for characters that are spelled out as words, e.g. "7" -> "seven"
+DIGIT_TOKENS = 4
+SYMBOL_TOKENS = 6
+# Maps every spelled out character to as many characters as it costs tokens, so the
+# estimate is a single `str.translate` in C
+_TOKEN_COSTS = str.maketrans({
+    **{digit: "0" * (1 + DIGIT_TOKENS) for digit in "0123456789"},
+    **{symbol: "%" * (1 + SYMBOL_TOKENS) for symbol in "%$&@+=#/€£"},
+})
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimated phoneme token count of `text`, without phonemizing it. English IPA from
+    espeak-ng has about one token per character, punctuation and spaces included; digits
+    and symbols are spelled out as words and cost more.
+    """
+    return len(text.translate(_TOKEN_COSTS))
+
+
+def _starts_name(text: str, following: int) -> bool:
+    """Whether a capitalized name or another initial ("R.") starts at `text[following]`."""
+    match = _WORD.match(text, following)
+    if match is None or not text[following].isupper():
+        return False
+    if match.end() - following == 1:
+        return text[following] != "I" and text.startswith(".", match.end())
+    return match.group().lower() not in SENTENCE_STARTERS
+
+
+def _ends_with_abbreviation(text: str, end: int, following: int) -> bool:
+    """
+    Whether the period at `text[end]` closes an abbreviation or an initial; `following` is
+    the index of the next non-space character. A single capital other than "I" is an
+    initial only when a name or another initial follows it.
+    """
+    start = end
+    # Abbreviations are short, so this looks back a bounded distance
+    while start > 0 and end - start < 8 and (text[start - 1].isalpha() or text[start - 1] == "."):
+        start -= 1
+    word = text[start:end].lower()
+    if not word or (start > 0 and not text[start - 1].isspace() and text[start - 1] not in "(\"'“‘"):
+        return False
+    if word in ABBREVIATIONS:
+        return True
+    if len(word) == 1 and text[start].isupper():
+        return word != "i" and _starts_name(text, following)
+    next_char = text[following] if following < len(text) else ""
+    if word in NUMBER_ABBREVIATIONS:
+        return next_char.isdigit()
+    if word in TITLE_ABBREVIATIONS:
+        return text[start].isupper() and (next_char.isupper() or next_char.isdigit())
+    return False
+
+
+def split_sentences(text: str) -> Iterator[Tuple[str, bool]]:
+    """
+    Splits `text` into sentences in one pass, with whitespace runs collapsed to single
+    spaces. Yields `(sentence, paragraph_end)`, where `paragraph_end` marks sentences
+    followed by a blank line or the end of the text.
+
+    A sentence ends at terminal punctuation (with trailing quotes or brackets) followed by
+    whitespace, unless the period belongs to an abbreviation or an initial, or the next
+    word starts in lowercase; and at every line break.
+    """
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        end = match.end()
+        following = _WHITESPACE.match(text, end).end()
+        if match.group() != "\n":
+            punctuation = match.group().rstrip(")]\"'’”")
+            if punctuation == "." and _ends_with_abbreviation(text, match.start(), following):
+                continue
+            if following < len(text) and text[following].islower():
+                continue
+        sentence = " ".join(text[start:end].split())
+        start = end
+        if sentence:
+            yield sentence, following == len(text) or text.count("\n", match.start(), following) >= 2
+    sentence = " ".join(text[start:].split())
+    if sentence:
+        yield sentence, True
+
+
+def _split_words(text: str, max_chars: int) -> List[str]:
+    """Words of `text`, with words longer than `max_chars` (e.g. URLs) cut into pieces."""
+    words = text.split()
+    if all(len(word) <= max_chars for word in words):
+        return words
+    return [word[i:i + max_chars] for word in words for i in range(0, len(word), max_chars)]
+
+
+def split_long_sentence(sentence: str, tokens: int, max_tokens: int) -> List[str]:
+    """
+    Splits a sentence over the budget into pieces of about `tokens / ceil(tokens / max_tokens)`
+    tokens, so they batch with little padding, preferring to cut after clause punctuation.
+    """
+    pieces_needed = math.ceil(tokens / max_tokens)
+    target = tokens / pieces_needed
+    # Words of the current piece, with the tokens of each word plus its separating space
+    pieces, piece, costs, clause_end = [], [], [], 0
+    piece_tokens = clause_tokens = 0
+    for word in _split_words(sentence, max_tokens):
+        word_tokens = estimate_tokens(word) + 1
+        if piece and piece_tokens + word_tokens > target:
+            # Cut after the last clause in the piece if that keeps at least half of it
+            cut = clause_end if clause_end and clause_tokens >= target / 2 else len(piece)
+            pieces.append(" ".join(piece[:cut]))
+            piece, costs = piece[cut:], costs[cut:]
+            piece_tokens = sum(costs)
+            clause_end = clause_tokens = 0
+        piece.append(word)
+        costs.append(word_tokens)
+        piece_tokens += word_tokens
+        if _CLAUSE_END.search(word):
+            clause_end, clause_tokens = len(piece), piece_tokens
+    if piece:
+        pieces.append(" ".join(piece))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int = MAX_CHUNK_TOKENS) -> List[str]:
+    """
+    Splits text into chunks for synthesis in linear time. Whole sentences are packed into
+    chunks of up to `max_tokens` estimated phoneme tokens, so a chunk's cost, not its
+    character count, is bounded; paragraph breaks always end a chunk. Sentences over the
+    budget are split into about equally long pieces at clause or word boundaries.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append(" ".join(current))
+        current, current_tokens = [], 0
+
+    for sentence, paragraph_end in split_sentences(text):
+        tokens = estimate_tokens(sentence)
+        if tokens > max_tokens:
+            flush()
+            chunks.extend(split_long_sentence(sentence, tokens, max_tokens))
+            continue
+        if current and current_tokens + 1 + tokens > max_tokens:
+            flush()
+        current.append(sentence)
+        current_tokens += tokens + (1 if len(current) > 1 else 0)
+        if paragraph_end:
+            flush()
+    flush()
+    return chunks
@@ -0,0 +1,260 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple, Union
+
+from text_chunker import split_sentences
+
+# Bumped whenever a rule changes the normalized text, e.g. for cache keys
+NORMALIZER_VERSION = 2
+
+# A rule is a compiled pattern and its replacement, a template or a function of the match
+Rule = Tuple[re.Pattern, Union[str, Callable[[re.Match], str]]]
+
+# Rule tables per language, applied in order; see `register_rules`
+RULES: Dict[str, List[Rule]] = {}
+
+
+def register_rules(language: str, rules: List[Tuple[str, Union[str, Callable[[re.Match], str]]]], flags: int = 0):
+    """
+    Compiles `rules` (pattern, replacement) and appends them to the table of `language`.
+    Tables are looked up by the espeak language code, then by its base language, so
+    rules registered for "en" also apply to "en-us" and "en-gb".
+    """
+    RULES.setdefault(language, []).extend((re.compile(pattern, flags), replacement) for pattern, replacement in rules)
+
+
+def rules_for(language: str) -> List[Rule]:
+    return RULES.get(language) or RULES.get(language.split("-")[0], [])
+
+
+_ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven",
+         "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_SCALES = [(10 ** 12, "trillion"), (10 ** 9, "billion"), (10 ** 6, "million"), (1000, "thousand")]
+_ORDINALS = {"one": "first", "two": "second", "three": "third", "five": "fifth", "eight": "eighth",
+             "nine": "ninth", "twelve": "twelfth"}
+_MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+           "November", "December"]
+_DIGITS = {str(i): word for i, word in enumerate(_ONES[:10])}
+
+
+def number_to_words(number: int) -> str:
+    """English cardinal of `number`; digit by digit from a quadrillion on."""
+    if number < 0:
+        return "minus " + number_to_words(-number)
+    if number >= 10 ** 15:
+        return " ".join(_DIGITS[d] for d in str(number))
+    if number < 20:
+        return _ONES[number]
+    if number < 100:
+        return _TENS[number // 10] + ("-" + _ONES[number % 10] if number % 10 else "")
+    if number < 1000:
+        return _ONES[number // 100] + " hundred" + (" " + number_to_words(number % 100) if number % 100 else "")
+    for scale, name in _SCALES:
+        if number >= scale:
+            rest = number % scale
+            return number_to_words(number // scale) + " " + name + (" " + number_to_words(rest) if rest else "")
+
+
+def ordinal_to_words(number: int) -> str:
+    words = number_to_words(number)
+    head, _, last = words.rpartition(" ")
+    prefix, hyphen, last = last.rpartition("-")
+    if last in _ORDINALS:
+        last = _ORDINALS[last]
+    elif last.endswith("y"):
+        last = last[:-1] + "ieth"
+    else:
+        last += "th"
+    return (head + " " if head else "") + prefix + hyphen + last
+
+
+def year_to_words(year: int) -> str:
+    """Years read in pairs, "nineteen eighty-four", except 2000 to 2009."""
+    if 2000 <= year < 2010 or year % 1000 < 10 or year >= 10000:
+        return number_to_words(year)
+    high, low = divmod(year, 100)
+    return number_to_words(high) + " " + ("hundred" if low == 0 else
+                                          "oh " + _ONES[low] if low < 10 else number_to_words(low))
+
+
+def _decimal(integer: str, fraction: str, sign: str = "") -> str:
+    words = number_to_words(int(integer.replace(",", "") or 0))
+    words += " point " + " ".join(_DIGITS[d] for d in fraction) if fraction else ""
+    return {"-": "minus ", "−": "minus ", "+": "plus "}.get(sign, "") + words
+
+
+def _digit_groups(match: re.Match) -> str:
+    """Hyphenated digit groups, like phone numbers, read digit by digit with a pause between groups."""
+    return ", ".join(" ".join(_DIGITS[d] for d in group) for group in match.group().split("-"))
+
+
+def _spell_address(match: re.Match) -> str:
+    """URLs and e-mail addresses read out symbol by symbol, "example dot com slash docs"."""
+    address = re.sub(r'^(https?://)?(www\.)?', '', match.group()).rstrip("/")
+    address = re.sub(r'[./@:_\-?=&#]', lambda m: f" {_ADDRESS_SYMBOLS[m.group()]} ", address)
+    return " ".join(address.split())
+
+
+_ADDRESS_SYMBOLS = {".": "dot", "/": "slash", "@": "at", ":": "colon", "_": "underscore", "-": "dash",
+                    "?": "question mark", "=": "equals", "&": "and", "#": "hash"}
+_CURRENCIES = {"$": ("dollar", "dollars", "cent", "cents"), "€": ("euro", "euros", "cent", "cents"),
+               "£": ("pound", "pounds", "penny", "pence")}
+_SCALE_SUFFIXES = {"k": "thousand", "m": "million", "mn": "million", "b": "billion", "bn": "billion"}
+
+
+def _currency(match: re.Match) -> str:
+    symbol, integer, fraction, scale = match.group(1), match.group(2), match.group(3), match.group(4)
+    one, many, sub_one, sub_many = _CURRENCIES[symbol]
+    if scale:
+        scale = _SCALE_SUFFIXES.get(scale.lower(), scale.lower())
+        return f"{_decimal(integer, fraction or '')} {scale} {many}"
+    if fraction and len(fraction) > 2:
+        return f"{_decimal(integer, fraction)} {many}"
+    amount = int(integer.replace(",", ""))
+    words = f"{number_to_words(amount)} {one if amount == 1 else many}"
+    cents = int(fraction.ljust(2, "0")) if fraction else 0
+    if cents:
+        words += f" {number_to_words(cents)} {sub_one if cents == 1 else sub_many}"
+    return words
+
+
+# Units read out after a number, singular and plural. Single letter units only count when
+# attached to the number ("5m"), the others may follow a space.
+_UNITS = {
+    "kg": ("kilogram", "kilograms"), "mg": ("milligram", "milligrams"), "km": ("kilometer", "kilometers"),
+    "cm": ("centimeter", "centimeters"), "mm": ("millimeter", "millimeters"), "lb": ("pound", "pounds"),
+    "lbs": ("pound", "pounds"), "oz": ("ounce", "ounces"), "ft": ("foot", "feet"), "mi": ("mile", "miles"),
+    "mph": ("mile per hour", "miles per hour"), "km/h": ("kilometer per hour", "kilometers per hour"),
+    "kph": ("kilometer per hour", "kilometers per hour"), "hr": ("hour", "hours"), "hrs": ("hour", "hours"),
+    "min": ("minute", "minutes"), "ms": ("millisecond", "milliseconds"), "KB": ("kilobyte", "kilobytes"),
+    "MB": ("megabyte", "megabytes"), "GB": ("gigabyte", "gigabytes"), "TB": ("terabyte", "terabytes"),
+    "Hz": ("hertz", "hertz"), "kHz": ("kilohertz", "kilohertz"), "MHz": ("megahertz", "megahertz"),
+    "GHz": ("gigahertz", "gigahertz"), "°C": ("degree Celsius", "degrees Celsius"),
+    "°F": ("degree Fahrenheit", "degrees Fahrenheit"), "°": ("degree", "degrees"),
+    "m": ("meter", "meters"), "g": ("gram", "grams"), "s": ("second", "seconds"), "h": ("hour", "hours"),
+}
+_SPACED_UNITS = "|".join(re.escape(unit) for unit in sorted(_UNITS, key=len, reverse=True) if len(unit) > 1)
+_ATTACHED_UNITS = "|".join(re.escape(unit) for unit in _UNITS if len(unit) == 1)
+
+# A number standing on its own: not inside a word, a version string or a hyphenated group,
+# with an optional sign where it starts a token
+_NUMBER_START = r'(?<![\w.,\-−+])([-−+]?)'
+_NUMBER = r'(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+))?'
+_NUMBER_END = r'(?!\w|-\d|[.,]\d)'
+# "a.m." keeps its final period where it also ends the sentence
+_PERIOD = r'([aApP]\.?[mM])(?:\.(?!\s+[A-Z]|\s*$))?'
+
+
+def _unit(match: re.Match) -> str:
+    sign, integer, fraction, unit = match.group(1), match.group(2), match.group(3), match.group(4) or match.group(5)
+    one, many = _UNITS[unit]
+    return f"{_decimal(integer, fraction or '', sign)} {one if integer == '1' and not fraction else many}"
+
+
+def _time(match: re.Match) -> str:
+    hour, minute, period = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    words = number_to_words(hour) + (" o'clock" if minute == 0 and not period else
+                                     "" if minute == 0 else
+                                     " oh " + _ONES[minute] if minute < 10 else " " + number_to_words(minute))
+    return words + (" " + " ".join(period.replace(".", "").upper()) if period else "")
+
+
+def _date(match: re.Match) -> str:
+    year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    if not 1 <= month <= 12 or not 1 <= day <= 31:
+        return match.group()
+    return f"{_MONTHS[month - 1]} {ordinal_to_words(day)}, {year_to_words(year)}"
+
+
+register_rules("en", [
+    # Addresses first, before their dots and digits are read as sentences and numbers
+    (r'\b[\w.+-]+@[\w-]+(\.[\w-]+)+\b', _spell_address),
+    (r'\b(https?://|www\.)[^\s<>"]+[^\s<>".,;:!?)\]\'’”]', _spell_address),
+    # Titles and Latin abbreviations whose reading espeak gets wrong or inconsistent
+    (r'\bDr\.(?=\s+[A-Z])', 'Doctor'),
+    (r'\bMr\.', 'Mister'),
+    (r'\bMrs\.', 'Missus'),
+    (r'\bMs\.', 'Miz'),
+    (r'\bProf\.(?=\s+[A-Z])', 'Professor'),
+    (r'\bSt\.(?=\s+[A-Z])', 'Saint'),
+    (r'\bvs\.?(?=\s)', 'versus'),
+    # "etc." keeps its period where it also ends the sentence
+    (r'\betc\.(?=\s+[A-Z]|\s*$)', 'et cetera.'),
+    (r'\betc\.', 'et cetera'),
+    (r'\be\.g\.', 'for example'),
+    (r'\bi\.e\.', 'that is'),
+    (r'\bapprox\.', 'approximately'),
+    (r'\bNo\.(?=\s*\d)', 'number'),
+    (r'([$€£])\s?(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+))?(?:\s?(thousand|million|billion|trillion|[kKmMbB]n?)\b)?',
+     _currency),
+    (r'\b(\d{4})-(\d{2})-(\d{2})\b', _date),
+    # Phone numbers, invalid dates and other runs of three or more hyphenated digit groups
+    (r'(?<![\w.,\-])\d+(?:-\d+){2,}(?![\w\-])', _digit_groups),
+    (r'\b(\d{1,2}):(\d{2})\b(?:\s?' + _PERIOD + ')?', _time),
+    (r'(?<![\w.,\-])(\d{1,2})()\s?' + _PERIOD + r'(?!\w)', _time),
+    (_NUMBER_START + _NUMBER + r'\s?%', lambda m: _decimal(m.group(2), m.group(3) or "", m.group(1)) + " percent"),
+    (_NUMBER_START + _NUMBER + r'(?:\s?(' + _SPACED_UNITS + r')|(' + _ATTACHED_UNITS + r'))(?![\w/])', _unit),
+    (r'(?<![\w.,\-])(\d+)(st|nd|rd|th)\b', lambda m: ordinal_to_words(int(m.group(1)))),
+    (r'(?<![\w.,\-])(1[1-9]\d\d|20[1-9]\d)' + _NUMBER_END, lambda m: year_to_words(int(m.group()))),
+    # Anything mixing letters and digits ("mp3", "4K", "COVID19") is left to espeak
+    (_NUMBER_START + _NUMBER + _NUMBER_END, lambda m: _decimal(m.group(2), m.group(3) or "", m.group(1))),
+    (r'\s&\s', ' and '),
+    (r'\s@\s', ' at '),
+    (r'\s\+\s', ' plus '),
+    (r'\s=\s', ' equals '),
+    (r'[‘’]', "'"),
+    (r'[–]', '—'),
+])
+
+
+class TextNormalizer:
+    """
+    Rewrites numbers, currencies, dates, times, addresses and abbreviations into words
+    before phonemization, so espeak reads them the same way every time.
+
+    Text is normalized sentence by sentence through the rule table of the language, and
+    normalized sentences are kept in an LRU cache, since the same sentences recur across
+    requests and chunks.
+    """
+    def __init__(self, language: str = 'en-us', max_entries: int = 10000):
+        """
+        Args:
+            language (str): espeak language code selecting the rule table.
+            max_entries (int): Maximum number of normalized sentences kept in memory.
+        """
+        self.language = language
+        self.rules = rules_for(language)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def normalize_sentence(self, sentence: str) -> str:
+        with self._lock:
+            normalized = self._entries.get(sentence)
+            if normalized is not None:
+                self._entries.move_to_end(sentence)
+                self.hits += 1
+                return normalized
+
+        normalized = sentence
+        for pattern, replacement in self.rules:
+            normalized = pattern.sub(replacement, normalized)
+        normalized = " ".join(normalized.split())
+
+        with self._lock:
+            self.misses += 1
+            self._entries[sentence] = normalized
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return normalized
+
+    def __call__(self, text: str) -> str:
+        """Normalizes `text`; line breaks and runs of whitespace become single spaces."""
+        if not self.rules:
+            return text
+        return " ".join(self.normalize_sentence(sentence) for sentence, _ in split_sentences(text))
@@ -1,4 +1,9 @@
 # IPA Phonemizer: https://github.com/bootphon/phonemizer
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
 
 _pad = "$"
 _punctuation = ';:,.!?¡¿—…"«»“” '
@@ -13,14 +18,26 @@ for i in range(len((symbols))):
     dicts[symbols[i]] = i
 
 class TextCleaner:
+    """
+    Maps phoneme strings to token ids. Symbols missing from the table are dropped and
+    counted in `unknown_symbols`; each is logged once when first seen.
+    """
     def __init__(self, dummy=None):
         self.word_index_dictionary = dicts
-        print(len(dicts))
+        self.unknown_symbols = Counter()
+        self._lock = threading.Lock()
     def __call__(self, text):
         indexes = []
+        unknown = []
         for char in text:
             try:
                 indexes.append(self.word_index_dictionary[char])
             except KeyError:
-                print(text)
+                unknown.append(char)
+        if unknown:
+            with self._lock:
+                new = {char for char in unknown if char not in self.unknown_symbols}
+                self.unknown_symbols.update(unknown)
+            for char in new:
+                logger.warning(f"Dropping unknown symbol {char!r} (U+{ord(char):04X}) in {text!r}")
         return indexes
@@ -7,8 +7,6 @@ import copy
 from torch import nn
 import torch.nn.functional as F
 import torchaudio
-import librosa
-import matplotlib.pyplot as plt
 from munch import Munch
 
 def maximum_path(neg_cent, mask):
@@ -53,6 +51,8 @@ def log_norm(x, mean=-4, std=4, dim=2):
     return x
 
 def get_image(arrs):
+    # Training-time plotting only, keep matplotlib out of the inference imports
+    import matplotlib.pyplot as plt
     plt.switch_backend('agg')
     fig = plt.figure()
     ax = plt.gca()
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from core.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue is full. `retry_after` is a hint in seconds."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Synthesis queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """
+    One admission slot of a `SynthesisPool` held across several jobs, e.g. all chunks of a
+    stream, so a request admitted once is never rejected halfway. While one of its jobs
+    waits or runs, the job takes the slot's place; in between, the slot stays taken.
+    """
+    def __init__(self, pool: "SynthesisPool"):
+        self.pool = pool
+        self.released = False
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Runs `fn(*args, **kwargs)` on the pool in this slot, without an admission check."""
+        if self.released:
+            raise RuntimeError("Reservation was already released")
+        self.pool._release_reserved()
+        try:
+            return await self.pool._submit(fn, args, kwargs)
+        finally:
+            with self.pool._lock:
+                self.pool._reserved += 1
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.pool._release_reserved()
+
+
+class SynthesisPool:
+    """
+    Runs blocking synthesis work on a dedicated thread pool so it never blocks the
+    asyncio event loop.
+
+    At most `max_workers` jobs run at once and at most `max_queue` more wait for a
+    worker; further submissions fail fast with `QueueFullError`. A job counts against
+    the limits until its thread actually finishes, even if the caller timed out,
+    because a running forward pass cannot be interrupted.
+    """
+    def __init__(self, max_workers: int = 1, max_queue: int = 16, timeout: Optional[float] = 300.0, registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            max_workers (int): Number of jobs synthesized concurrently.
+            max_queue (int): Number of jobs allowed to wait for a worker.
+            timeout (Optional[float]): Seconds a caller waits for its job, queueing included.
+            registry (MetricsRegistry): Registry the pool metrics are recorded in.
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="synthesis")
+
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        # slots held by reservations between their jobs
+        self._reserved = 0
+        # exponential moving average of job run time, used for Retry-After
+        self._avg_run_time = 1.0
+        # per worker thread: when the caller of the running job times out
+        self._deadline = threading.local()
+
+        self._queue_depth = registry.gauge("synthesis_queue_depth", "Jobs waiting for a synthesis worker")
+        self._in_flight = registry.gauge("synthesis_in_flight", "Jobs currently being synthesized")
+        self._wait_time = registry.histogram("synthesis_queue_wait_seconds", "Time jobs spent waiting for a worker")
+        self._run_time = registry.histogram("synthesis_run_seconds", "Time jobs spent running on a worker")
+        self._rejected = registry.counter("synthesis_rejected_total", "Jobs rejected because the queue was full")
+        self._timeouts = registry.counter("synthesis_timeouts_total", "Jobs whose caller timed out")
+
+    @property
+    def pending(self) -> int:
+        return self._waiting + self._running + self._reserved
+
+    def time_left(self) -> Optional[float]:
+        """
+        Seconds until the caller of the job running on this thread stops waiting for it, so
+        the job can give up on work of its own that is still waiting; None without a timeout
+        or outside the pool.
+        """
+        deadline = getattr(self._deadline, "value", None)
+        return None if deadline is None else max(0.0, deadline - time.perf_counter())
+
+    def retry_after(self) -> int:
+        """Rough number of seconds until a slot frees up."""
+        backlog = self.pending / max(self.max_workers, 1)
+        return max(1, math.ceil(self._avg_run_time * backlog))
+
+    def check_capacity(self):
+        """Raises `QueueFullError` if a new job would be rejected."""
+        if self.pending >= self.max_workers + self.max_queue:
+            self._rejected.inc()
+            raise QueueFullError(self.retry_after())
+
+    def reserve(self) -> Reservation:
+        """Takes one admission slot until `Reservation.release`; raises `QueueFullError` if there is none."""
+        self.check_capacity()
+        with self._lock:
+            self._reserved += 1
+        return Reservation(self)
+
+    def _release_reserved(self):
+        with self._lock:
+            self._reserved -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Runs `fn(*args, **kwargs)` on the pool and returns its result."""
+        self.check_capacity()
+        return await self._submit(fn, args, kwargs)
+
+    async def _submit(self, fn: Callable, args: tuple, kwargs: dict):
+        with self._lock:
+            self._waiting += 1
+            self._queue_depth.set(self._waiting)
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                self._waiting -= 1
+                self._running += 1
+                self._queue_depth.set(self._waiting)
+                self._in_flight.set(self._running)
+            self._wait_time.observe(started - submitted)
+            self._deadline.value = submitted + self.timeout if self.timeout is not None else None
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._deadline.value = None
+                elapsed = time.perf_counter() - started
+                self._run_time.observe(elapsed)
+                with self._lock:
+                    self._running -= 1
+                    self._in_flight.set(self._running)
+                    self._avg_run_time = 0.8 * self._avg_run_time + 0.2 * elapsed
+
+        future = self._executor.submit(job)
+
+        def on_cancelled(f):
+            # Cancelled while still queued, so job() never ran to release its slot
+            if f.cancelled():
+                with self._lock:
+                    self._waiting -= 1
+                    self._queue_depth.set(self._waiting)
+
+        future.add_done_callback(on_cancelled)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts.inc()
+            logger.warning(f"Synthesis job timed out after {self.timeout}s")
+            raise
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
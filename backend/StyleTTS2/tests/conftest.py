@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Same layout as the tools: the project root for `core.*`, and core/ for its flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
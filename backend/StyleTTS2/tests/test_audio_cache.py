@@ -0,0 +1,138 @@
+import pytest
+
+botocore = pytest.importorskip("botocore")
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+import core.audio_cache
+from core.audio_cache import AudioCache, cache_key
+from core.metrics import MetricsRegistry
+
+PARAMS = {
+    "text": "Hello there.",
+    "voice": "andreas",
+    "voice_sha256": "ab" * 32,
+    "alpha": 0.3,
+    "beta": 0.7,
+    "diffusion_steps": 5,
+    "seed": 42,
+    "model": "v1",
+    "sample_rate": 24000,
+}
+
+
+def test_key_does_not_depend_on_order_or_number_spelling():
+    reordered = dict(reversed(list(PARAMS.items())))
+    respelled = {**PARAMS, "diffusion_steps": 5.0, "sample_rate": 24000.0, "beta": 0.70}
+    assert cache_key(reordered) == cache_key(PARAMS)
+    assert cache_key(respelled) == cache_key(PARAMS)
+
+
+def test_key_is_stable():
+    # sha256 of {"seed":1.0,"text":"Hi"}; a change here invalidates every cached result
+    assert cache_key({"text": "Hi", "seed": 1}) == "3223fc6042a9a8518cecd10e40a5e8506bcaac9d83d2ab156ef2e7ce23709ab1"
+
+
+@pytest.mark.parametrize("field", sorted(PARAMS))
+def test_key_changes_with_every_field(field):
+    value = PARAMS[field]
+    changed = value + 1 if isinstance(value, (int, float)) else value + "x"
+    assert cache_key({**PARAMS, field: changed}) != cache_key(PARAMS)
+    assert cache_key({k: v for k, v in PARAMS.items() if k != field}) != cache_key(PARAMS)
+
+
+def test_booleans_and_none_are_not_numbers():
+    assert cache_key({"flag": True}) != cache_key({"flag": 1})
+    assert cache_key({"seed": None}) != cache_key({"seed": 0})
+
+
+class FakeS3:
+    """Just `head_object`, over a set of existing keys."""
+
+    def __init__(self, keys=(), error=None):
+        self.keys = set(keys)
+        self.error = error
+        self.heads = []
+
+    def head_object(self, Bucket, Key):
+        self.heads.append(Key)
+        if self.error is not None:
+            raise self.error
+        if Key not in self.keys:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(core.audio_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_cache(s3, registry=None, **kwargs):
+    return AudioCache(s3, "bucket", "cache", registry=registry or MetricsRegistry(), **kwargs)
+
+
+def test_lookup_falls_back_to_head_object(clock):
+    registry = MetricsRegistry()
+    s3 = FakeS3({"cache/abc.wav"})
+    cache = make_cache(s3, registry)
+
+    assert cache.lookup("abc") == "cache/abc.wav"
+    assert cache.lookup("abc") == "cache/abc.wav"
+    assert cache.lookup("def") is None
+    assert cache.lookup("abc", "mp3") is None
+    assert s3.heads == ["cache/abc.wav", "cache/def.wav", "cache/abc.mp3"]
+
+    lookups = registry.counter("audio_cache_lookups_total", "")
+    assert lookups.value(result="s3_hit") == 1
+    assert lookups.value(result="local_hit") == 1
+    assert lookups.value(result="miss") == 2
+
+
+def test_added_keys_do_not_need_head_object(clock):
+    s3 = FakeS3()
+    cache = make_cache(s3)
+    cache.add(cache.s3_key("abc"))
+    assert cache.lookup("abc") == "cache/abc.wav"
+    assert s3.heads == []
+
+
+def test_known_keys_are_checked_again_after_the_ttl(clock):
+    s3 = FakeS3({"cache/abc.wav"})
+    cache = make_cache(s3, ttl_seconds=60)
+    cache.lookup("abc")
+
+    clock[0] += 59
+    assert cache.lookup("abc") == "cache/abc.wav"
+    assert len(s3.heads) == 1
+
+    # Deleted from the bucket, e.g. by a lifecycle rule
+    s3.keys.clear()
+    clock[0] += 2
+    assert cache.lookup("abc") is None
+    assert len(s3.heads) == 2
+    assert cache.lookup("abc") is None
+    assert len(s3.heads) == 3
+
+
+def test_known_keys_are_bounded(clock):
+    s3 = FakeS3({"cache/a.wav", "cache/b.wav", "cache/c.wav"})
+    cache = make_cache(s3, max_entries=2)
+    for key in ("a", "b", "a", "c"):
+        cache.lookup(key)
+    # "b" was the least recently used when "c" was added
+    cache.lookup("a")
+    cache.lookup("b")
+    assert s3.heads == ["cache/a.wav", "cache/b.wav", "cache/c.wav", "cache/b.wav"]
+
+
+@pytest.mark.parametrize("error", [
+    ClientError({"Error": {"Code": "403", "Message": "Forbidden"}}, "HeadObject"),
+    EndpointConnectionError(endpoint_url="https://s3.example.com"),
+], ids=["denied", "unreachable"])
+def test_s3_errors_are_misses(clock, error):
+    registry = MetricsRegistry()
+    cache = make_cache(FakeS3(error=error), registry)
+    assert cache.lookup("abc") is None
+    assert registry.counter("audio_cache_lookups_total", "").value(result="miss") == 1
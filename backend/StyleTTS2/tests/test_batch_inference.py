@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+yaml = pytest.importorskip("yaml")
+
+from export import random_inference_checkpoint
+from libri_inference import StyleTTS2Inference
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Relative to the peak of the serial waveform; padding only changes float rounding
+TOLERANCE = 1e-3
+SEED = 1234
+
+TEXTS = [
+    "Hi.",
+    "The quick brown fox jumps over the lazy dog.",
+    "Please remember to turn off the lights and lock the front door before you leave tonight, "
+    "the forecast says it will rain.",
+]
+
+
+class PassthroughPhonemizer:
+    """Stands in for espeak-ng, so the test does not depend on it being installed."""
+
+    def phonemize(self, texts):
+        return [text.lower() for text in texts]
+
+
+@pytest.fixture(scope="module")
+def synthesizer(tmp_path_factory):
+    config_path = os.path.join(project_root, "Configs", "config_libritts.yml")
+    with open(config_path) as f:
+        model_params = yaml.safe_load(f)["model_params"]
+    with open(os.path.join(project_root, "core", "Utils", "PLBERT", "config.yml")) as f:
+        plbert_params = yaml.safe_load(f)["model_params"]
+
+    path = tmp_path_factory.mktemp("checkpoint") / "random.pth"
+    torch.save(random_inference_checkpoint(model_params, plbert_params, seed=0), path)
+    synthesizer = StyleTTS2Inference(config_path=config_path, model_path=str(path))
+    synthesizer.phonemizer = PassthroughPhonemizer()
+    return synthesizer
+
+
+@pytest.fixture
+def durations(synthesizer, monkeypatch):
+    """Records the predicted durations of every decoded item, in order."""
+    recorded = []
+    decode = synthesizer._decode
+
+    def recording_decode(d, t_en, pred_dur, *args, **kwargs):
+        recorded.append(pred_dur.long().tolist())
+        return decode(d, t_en, pred_dur, *args, **kwargs)
+
+    monkeypatch.setattr(synthesizer, "_decode", recording_decode)
+    return recorded
+
+
+@pytest.fixture
+def ref_s(synthesizer):
+    generator = torch.Generator().manual_seed(SEED)
+    return torch.randn(1, 256, generator=generator).to(synthesizer.device)
+
+
+def relative_error(actual, expected):
+    return abs(actual - expected).max() / abs(expected).max()
+
+
+def assert_matches_serial(synthesizer, durations, ref_s, texts, seeds, batched):
+    batched_durations = list(durations)
+    durations.clear()
+    serial = [synthesizer.inference(text, ref_s, seed=seed) for text, seed in zip(texts, seeds)]
+
+    assert batched_durations == durations
+    for actual, expected in zip(batched, serial):
+        assert actual.shape == expected.shape
+        assert relative_error(actual, expected) <= TOLERANCE
+
+
+def test_inference_batch_matches_serial(synthesizer, durations, ref_s):
+    batched = synthesizer.inference_batch(TEXTS, ref_s, seed=SEED)
+    seeds = [SEED + i for i in range(len(TEXTS))]
+    assert_matches_serial(synthesizer, durations, ref_s, TEXTS, seeds, batched)
+
+
+def test_inference_tokens_matches_serial(synthesizer, durations, ref_s):
+    # The longest item in the middle, so items on both sides of it are padded
+    texts = [TEXTS[1], TEXTS[2], TEXTS[0]]
+    seeds = [7, 8, 9]
+    batched = synthesizer.inference_tokens(synthesizer.tokenize_batch(texts), ref_s, seeds=seeds)
+    assert_matches_serial(synthesizer, durations, ref_s, texts, seeds, batched)
@@ -0,0 +1,55 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from core.batch_scheduler import BatchScheduler
+from core.metrics import MetricsRegistry
+
+
+class FakeSynthesizer:
+    """One token per character; the "audio" of a chunk is its tokens as floats."""
+
+    def __init__(self):
+        self.batches = []
+
+    def tokenize_batch(self, texts):
+        return [[ord(c) for c in text] for text in texts]
+
+    def inference_tokens(self, token_batch, ref_s, seeds=None, styles=None, **params):
+        self.batches.append(token_batch)
+        return [torch.tensor(tokens, dtype=torch.float32) for tokens in token_batch]
+
+
+def test_cancelled_chunks_are_not_synthesized():
+    synthesizer = FakeSynthesizer()
+    scheduler = BatchScheduler(synthesizer, max_wait_ms=0, registry=MetricsRegistry())
+    ref_s = torch.zeros(1, 256)
+    kept, dropped = scheduler.submit_many(["ab", "cd"], ref_s)
+    cancelled = scheduler.submit_many(["ef"], ref_s)
+    for future in [dropped] + cancelled:
+        assert future.cancel()
+
+    scheduler.start()
+    assert kept.result(timeout=5).tolist() == [ord("a"), ord("b")]
+    scheduler.stop()
+    assert synthesizer.batches == [[[ord("a"), ord("b")]]]
+
+
+def test_finished_chunks_cannot_be_cancelled():
+    synthesizer = FakeSynthesizer()
+    scheduler = BatchScheduler(synthesizer, max_wait_ms=0, registry=MetricsRegistry())
+    scheduler.start()
+    future = scheduler.submit("ab", torch.zeros(1, 256))
+    assert future.result(timeout=5).tolist() == [ord("a"), ord("b")]
+    assert not future.cancel()
+    scheduler.stop()
+
+
+def test_stop_fails_pending_chunks():
+    scheduler = BatchScheduler(FakeSynthesizer(), registry=MetricsRegistry())
+    pending, cancelled = scheduler.submit_many(["ab", "cd"], torch.zeros(1, 256))
+    cancelled.cancel()
+    scheduler.stop()
+    with pytest.raises(RuntimeError):
+        pending.result(timeout=5)
+    assert cancelled.cancelled()
@@ -0,0 +1,134 @@
+import io
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.chunk_cache import ChunkCache
+from core.metrics import MetricsRegistry
+
+SAMPLES = 1000
+# Sizes of a chunk of SAMPLES int16 samples in memory and in its .npy file
+CHUNK_BYTES = SAMPLES * 2
+
+
+def npy_size():
+    buffer = io.BytesIO()
+    np.save(buffer, np.zeros(SAMPLES, dtype=np.int16), allow_pickle=False)
+    return len(buffer.getvalue())
+
+
+FILE_BYTES = npy_size()
+
+
+def audio(seed):
+    return np.random.default_rng(seed).uniform(-1, 1, SAMPLES).astype(np.float32)
+
+
+def make_cache(registry=None, **kwargs):
+    return ChunkCache(registry=registry or MetricsRegistry(), **kwargs)
+
+
+def test_memory_tier_evicts_least_recently_used_by_bytes():
+    cache = make_cache(max_memory_bytes=2 * CHUNK_BYTES)
+    cache.put("a", audio(0))
+    cache.put("b", audio(1))
+    assert cache.get("a") is not None
+    cache.put("c", audio(2))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_chunks_over_the_memory_budget_are_not_kept_in_memory():
+    cache = make_cache(max_memory_bytes=CHUNK_BYTES - 1)
+    cache.put("a", audio(0))
+    assert cache.get("a") is None
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    registry = MetricsRegistry()
+    cache = make_cache(registry, max_memory_bytes=CHUNK_BYTES, disk_dir=str(tmp_path))
+    cache.put("a", audio(0))
+    cache.put("b", audio(1))
+
+    cache.get("a")
+    cache.get("a")
+    lookups = registry.counter("chunk_cache_lookups_total", "")
+    assert lookups.value(result="disk_hit") == 1
+    assert lookups.value(result="memory_hit") == 1
+    # "a" took the only memory slot, so "b" is read from disk again
+    cache.get("b")
+    assert lookups.value(result="disk_hit") == 2
+
+
+def test_disk_tier_evicts_least_recently_used_by_bytes(tmp_path):
+    registry = MetricsRegistry()
+    cache = make_cache(registry, max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=2 * FILE_BYTES)
+    cache.put("a", audio(0))
+    cache.put("b", audio(1))
+    assert cache.get("a") is not None
+    cache.put("c", audio(2))
+
+    assert sorted(os.listdir(tmp_path)) == ["a.npy", "c.npy"]
+    assert cache.get("b") is None
+    assert registry.gauge("chunk_cache_bytes", "").value(tier="disk") == 2 * FILE_BYTES
+
+
+def test_disk_index_is_reloaded_after_a_restart(tmp_path):
+    cache = make_cache(max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=2 * FILE_BYTES)
+    cache.put("a", audio(0))
+    cache.put("b", audio(1))
+    # Recency survives the restart through the file mtimes: "a" was used last
+    os.utime(tmp_path / "b.npy", (1000, 1000))
+    os.utime(tmp_path / "a.npy", (2000, 2000))
+
+    registry = MetricsRegistry()
+    restarted = make_cache(registry, max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=2 * FILE_BYTES)
+    assert registry.gauge("chunk_cache_bytes", "").value(tier="disk") == 2 * FILE_BYTES
+    np.testing.assert_array_equal(restarted.get("a"), cache.get("a"))
+
+    restarted.put("c", audio(2))
+    assert sorted(os.listdir(tmp_path)) == ["a.npy", "c.npy"]
+
+
+def test_unreadable_disk_entries_are_dropped(tmp_path):
+    (tmp_path / "broken.npy").write_bytes(b"not a numpy file")
+    cache = make_cache(disk_dir=str(tmp_path))
+    assert cache.get("broken") is None
+    assert not (tmp_path / "broken.npy").exists()
+
+
+@pytest.mark.parametrize("disk", [False, True], ids=["memory", "disk"])
+def test_int16_round_trip(tmp_path, disk):
+    cache = make_cache(max_memory_bytes=0 if disk else 1 << 20, disk_dir=str(tmp_path) if disk else None)
+    original = audio(0)
+    original[:2] = [1.5, -1.5]
+    cache.put("a", original)
+
+    restored = cache.get("a")
+    assert restored.dtype == np.float32
+    # Out of range samples are clipped, the rest is within one quantization step
+    np.testing.assert_array_equal(restored[:2], [1.0, -1.0])
+    assert np.abs(restored[2:] - original[2:]).max() < 1.001 / 32767
+
+
+@pytest.mark.parametrize("disk", [False, True], ids=["memory", "disk"])
+def test_float32_round_trip_is_exact(tmp_path, disk):
+    cache = make_cache(max_memory_bytes=0 if disk else 1 << 20, disk_dir=str(tmp_path) if disk else None,
+                       dtype="float32")
+    original = audio(0)
+    cache.put("a", original)
+
+    restored = cache.get("a")
+    np.testing.assert_array_equal(restored, original)
+    # Callers may modify what they get back without changing the cache
+    restored[:] = 0
+    np.testing.assert_array_equal(cache.get("a"), original)
+
+
+def test_unknown_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        make_cache(dtype="float16")
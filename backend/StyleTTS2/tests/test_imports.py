@@ -0,0 +1,58 @@
+import ast
+import importlib
+import os
+
+import pytest
+
+CORE = os.path.join(os.path.dirname(__file__), '..', 'core')
+
+# Modules the API, benchmark and export tools import at startup
+ENTRY_MODULES = ["libri_inference", "text_chunker", "text_normalizer", "text_utils", "profiling"]
+# Those needing the model dependencies, skipped where they are not installed
+TORCH_MODULES = {"libri_inference"}
+
+
+def module_level_uses_before_import(path: str):
+    """
+    Names that module-level code of `path` reads before the statement importing them.
+    Only explicitly imported names are checked, so star imports do not hide a use that
+    comes before the import providing it.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    imported_at = {}
+    for index, node in enumerate(tree.body):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                name = (alias.asname or alias.name).split(".")[0]
+                imported_at.setdefault(name, index)
+
+    early = []
+    for index, node in enumerate(tree.body):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # Bodies run later; decorators, defaults and bases run now
+            scanned = node.decorator_list + getattr(node, "bases", []) + \
+                (node.args.defaults + node.args.kw_defaults if hasattr(node, "args") else [])
+        else:
+            scanned = [node]
+        for part in scanned:
+            if part is None:
+                continue
+            for name in ast.walk(part):
+                if isinstance(name, ast.Name) and isinstance(name.ctx, ast.Load) and \
+                        imported_at.get(name.id, -1) > index:
+                    early.append((name.id, name.lineno))
+    return early
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_no_name_used_before_its_import(module):
+    assert module_level_uses_before_import(os.path.join(CORE, f"{module}.py")) == []
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_import(module):
+    if module in TORCH_MODULES:
+        pytest.importorskip("torch")
+        pytest.importorskip("torchaudio")
+    importlib.import_module(module)
@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+
+from libri_inference import StyleTTS2Inference
+
+
+def dense_expand(x, durations):
+    """`x @ dense_alignment(...)` per item, zero-padded to the longest item like a batch."""
+    owner = SimpleNamespace(device=torch.device("cpu"))
+    items = [x[b:b + 1] @ StyleTTS2Inference.dense_alignment(owner, durations[b]) for b in range(x.shape[0])]
+    frames = max(item.shape[-1] for item in items)
+    return torch.cat([torch.nn.functional.pad(item, (0, frames - item.shape[-1])) for item in items])
+
+
+def test_length_regulate_matches_dense_alignment():
+    generator = torch.Generator().manual_seed(0)
+    x = torch.randn(3, 5, 7, generator=generator)
+    durations = torch.tensor([
+        [3, 1, 4, 1, 5, 9, 2],
+        [2, 6, 5, 3, 0, 0, 0],  # padded tokens have no frames
+        [1, 1, 1, 1, 1, 1, 1],
+    ])
+
+    actual = StyleTTS2Inference.length_regulate(x, durations)
+    expected = dense_expand(x, durations)
+
+    assert actual.shape == (3, 5, 25)
+    assert torch.equal(actual, expected)
+    # The zero-filled tail past the end of the shorter items
+    assert not actual[1, :, 16:].any()
+    assert not actual[2, :, 7:].any()
@@ -0,0 +1,42 @@
+import argparse
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+
+from libri_inference import StyleTTS2Inference
+
+
+def weights():
+    return {"net": {"decoder": {"weight": torch.arange(6.0).reshape(2, 3)}}}
+
+
+def assert_weights(checkpoint):
+    assert torch.equal(checkpoint["net"]["decoder"]["weight"], weights()["net"]["decoder"]["weight"])
+
+
+def test_zipfile_checkpoint(tmp_path):
+    path = tmp_path / "model.pth"
+    torch.save(weights(), path)
+    assert_weights(StyleTTS2Inference.read_checkpoint(str(path)))
+
+
+def test_legacy_checkpoint(tmp_path):
+    path = tmp_path / "model.pth"
+    torch.save(weights(), path, _use_new_zipfile_serialization=False)
+    assert_weights(StyleTTS2Inference.read_checkpoint(str(path)))
+
+
+@pytest.mark.parametrize("zipfile", [True, False], ids=["zipfile", "legacy"])
+def test_checkpoint_with_pickled_objects(tmp_path, zipfile):
+    path = tmp_path / "model.pth"
+    torch.save({**weights(), "args": argparse.Namespace(lr=1e-4)}, path, _use_new_zipfile_serialization=zipfile)
+    checkpoint = StyleTTS2Inference.read_checkpoint(str(path))
+    assert_weights(checkpoint)
+    assert checkpoint["args"].lr == 1e-4
+
+
+def test_missing_checkpoint_is_not_retried(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        StyleTTS2Inference.read_checkpoint(str(tmp_path / "missing.pth"))
@@ -0,0 +1,65 @@
+import math
+
+import pytest
+
+torch = pytest.importorskip("torch")
+F = torch.nn.functional
+
+from Modules import hifigan, istftnet
+from Modules.utils import rand_like, randn_like
+
+SAMPLE_RATE = 24000
+UPSAMPLE_SCALE = 300
+HARMONIC_NUM = 8
+VOICED_THRESHOLD = 10
+TOLERANCE = 1e-4
+
+
+def reference_source(source, f0, generator):
+    """The harmonic source as it was computed before vectorization: F0 upsampled to the
+    sample rate first, one rand_ini draw and one noise draw, in that order."""
+    sine_gen = source.l_sin_gen
+    f0 = torch.nn.Upsample(scale_factor=UPSAMPLE_SCALE)(f0[:, None]).transpose(1, 2)
+    fn = torch.multiply(f0, torch.FloatTensor([[range(1, sine_gen.harmonic_num + 2)]]))
+    rad_values = (fn / sine_gen.sampling_rate) % 1
+    rand_ini = rand_like(fn[:, 0, :], generator)
+    rand_ini[:, 0] = 0
+    rad_values[:, 0, :] = rad_values[:, 0, :] + rand_ini
+    rad_values = F.interpolate(rad_values.transpose(1, 2), scale_factor=1 / UPSAMPLE_SCALE,
+                               mode="linear").transpose(1, 2)
+    phase = torch.cumsum(rad_values, dim=1) * 2 * math.pi
+    phase = F.interpolate(phase.transpose(1, 2) * UPSAMPLE_SCALE, scale_factor=UPSAMPLE_SCALE,
+                          mode="linear").transpose(1, 2)
+    sine_waves = torch.sin(phase) * sine_gen.sine_amp
+    uv = (f0 > sine_gen.voiced_threshold).type(torch.float32)
+    noise_amp = uv * sine_gen.noise_std + (1 - uv) * sine_gen.sine_amp / 3
+    sine_waves = sine_waves * uv + noise_amp * randn_like(sine_waves, generator)
+    sine_merge = source.l_tanh(source.l_linear(sine_waves))
+    noise = randn_like(uv, generator) * source.sine_amp / 3
+    return sine_merge, noise, uv
+
+
+def random_f0(batch_size, frames, seed):
+    """Smooth F0 contours between 80 and 300 Hz with unvoiced stretches."""
+    generator = torch.Generator().manual_seed(seed)
+    anchors = torch.rand(batch_size, 1, frames // 20 + 2, generator=generator) * 220 + 80
+    f0 = F.interpolate(anchors, size=frames, mode="linear").squeeze(1)
+    voiced = F.interpolate((torch.rand(batch_size, 1, frames // 10 + 1, generator=generator) > 0.3)
+                           .float(), size=frames, mode="nearest").squeeze(1)
+    return f0 * voiced
+
+
+@pytest.mark.parametrize("module", [istftnet, hifigan], ids=["istftnet", "hifigan"])
+@pytest.mark.parametrize("batch_size, frames", [(1, 40), (3, 157)])
+def test_source_matches_reference(module, batch_size, frames):
+    torch.manual_seed(0)
+    source = module.SourceModuleHnNSF(SAMPLE_RATE, UPSAMPLE_SCALE, HARMONIC_NUM,
+                                      voiced_threshod=VOICED_THRESHOLD)
+    f0 = random_f0(batch_size, frames, seed=frames)
+    with torch.no_grad():
+        expected = reference_source(source, f0, torch.Generator().manual_seed(1))
+        actual = source(f0, torch.Generator().manual_seed(1))
+
+    for name, a, e in zip(("sine_merge", "noise", "uv"), actual, expected):
+        assert a.shape == e.shape, name
+        assert (a - e).abs().max().item() <= TOLERANCE, name
@@ -0,0 +1,60 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from Modules.istftnet import TorchSTFT
+
+# Relative to the peak of the reference
+TOLERANCE = 1e-5
+
+
+def relative_error(actual, expected):
+    return ((actual - expected).abs().max() / expected.abs().max()).item()
+
+
+@pytest.fixture(params=[(20, 5), (16, 4)], ids=["n_fft20-hop5", "n_fft16-hop4"])
+def stft(request):
+    n_fft, hop = request.param
+    return TorchSTFT(filter_length=n_fft, hop_length=hop, win_length=n_fft)
+
+
+@pytest.fixture
+def signal():
+    generator = torch.Generator().manual_seed(0)
+    # A multiple of both hops, so the inverse returns every sample
+    return torch.randn(2, 4800, generator=generator) * 0.1
+
+
+def both(stft, fn):
+    """`fn(stft)` with the torch.stft/istft path, then with the convolution path."""
+    with torch.no_grad():
+        stft.use_conv = False
+        expected = fn(stft)
+        stft.use_conv = True
+        actual = fn(stft)
+    return actual, expected
+
+
+def test_conv_spectrum_matches_torch_stft(stft, signal):
+    actual, expected = both(stft, lambda s: torch.polar(*s.transform(signal)))
+    assert relative_error(actual, expected) <= TOLERANCE
+
+
+def test_conv_inverse_matches_torch_istft(stft, signal):
+    generator = torch.Generator().manual_seed(1)
+    frames = signal.shape[-1] // stft.hop_length + 1
+    bins = stft.filter_length // 2 + 1
+    # Generator-like spectra: exp() magnitudes, sin() phases
+    magnitude = torch.exp(torch.randn(2, bins, frames, generator=generator))
+    phase = torch.sin(torch.randn(2, bins, frames, generator=generator) * 3)
+    actual, expected = both(stft, lambda s: s.inverse(magnitude, phase))
+    assert actual.shape == expected.shape
+    assert relative_error(actual, expected) <= TOLERANCE
+
+
+@pytest.mark.parametrize("use_conv", [False, True])
+def test_round_trip(stft, signal, use_conv):
+    stft.use_conv = use_conv
+    with torch.no_grad():
+        audio = stft.inverse(*stft.transform(signal)).squeeze(1)
+    assert relative_error(audio, signal) <= TOLERANCE
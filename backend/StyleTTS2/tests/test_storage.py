@@ -0,0 +1,109 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+from botocore.exceptions import ClientError
+
+import core.storage
+from core.metrics import MetricsRegistry
+from core.storage import S3Storage
+
+BUCKET = "audio"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff delays, recorded instead of slept."""
+    delays = []
+    # Only for this module: boto3's transfer threads sleep too
+    monkeypatch.setattr(core.storage, "time", SimpleNamespace(perf_counter=time.perf_counter, sleep=delays.append))
+    return delays
+
+
+class FlakyClient:
+    """Fails the first `failures` uploads with a throttling error, then uploads with `client`."""
+
+    def __init__(self, client, failures):
+        self.client = client
+        self.failures = failures
+        self.attempts = 0
+
+    def upload_fileobj(self, *args, **kwargs):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ClientError({"Error": {"Code": "SlowDown", "Message": "Reduce your request rate"}}, "PutObject")
+        return self.client.upload_fileobj(*args, **kwargs)
+
+
+def count(registry, result):
+    return registry.counter("s3_uploads_total", "").value(result=result)
+
+
+def timed_uploads(registry, result):
+    return f's3_upload_seconds_count{{result="{result}"}} 1' in registry.render()
+
+
+def test_upload(s3_client, sleeps):
+    registry = MetricsRegistry()
+    storage = S3Storage(BUCKET, client=s3_client, registry=registry)
+    storage.upload_bytes(b"RIFF audio", "outputs/a.wav", "audio/wav")
+
+    obj = s3_client.get_object(Bucket=BUCKET, Key="outputs/a.wav")
+    assert obj["Body"].read() == b"RIFF audio"
+    assert obj["ContentType"] == "audio/wav"
+    assert count(registry, "success") == 1
+    assert registry.counter("s3_upload_bytes_total", "").value() == len(b"RIFF audio")
+    assert timed_uploads(registry, "success")
+    assert sleeps == []
+
+
+def test_multipart_upload(s3_client, sleeps):
+    storage = S3Storage(BUCKET, client=s3_client, multipart_threshold=5 << 20, multipart_chunksize=5 << 20,
+                        registry=MetricsRegistry())
+    data = bytes(range(256)) * (48 << 10)  # 12 MiB, three parts
+    storage.upload_bytes(data, "outputs/long.wav")
+    assert s3_client.get_object(Bucket=BUCKET, Key="outputs/long.wav")["Body"].read() == data
+
+
+def test_upload_is_retried_until_it_succeeds(s3_client, sleeps):
+    registry = MetricsRegistry()
+    client = FlakyClient(s3_client, failures=2)
+    storage = S3Storage(BUCKET, client=client, upload_attempts=3, registry=registry)
+    storage.upload_bytes(b"RIFF audio", "outputs/a.wav")
+
+    assert client.attempts == 3
+    assert s3_client.get_object(Bucket=BUCKET, Key="outputs/a.wav")["Body"].read() == b"RIFF audio"
+    # Exponential backoff with up to 100% jitter
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0
+    assert count(registry, "success") == 1
+    assert count(registry, "failure") == 0
+
+
+def test_upload_gives_up_after_the_last_attempt(s3_client, sleeps):
+    registry = MetricsRegistry()
+    client = FlakyClient(s3_client, failures=3)
+    storage = S3Storage(BUCKET, client=client, upload_attempts=3, registry=registry)
+    with pytest.raises(ClientError):
+        storage.upload_bytes(b"RIFF audio", "outputs/a.wav")
+
+    assert client.attempts == 3
+    assert len(sleeps) == 2
+    assert count(registry, "success") == 0
+    assert count(registry, "failure") == 1
+    assert timed_uploads(registry, "failure")
+    assert registry.counter("s3_upload_bytes_total", "").value() == 0
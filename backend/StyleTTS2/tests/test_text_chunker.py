@@ -0,0 +1,44 @@
+import pytest
+
+from text_chunker import chunk_text, estimate_tokens, split_sentences
+
+
+def sentences(text):
+    return [sentence for sentence, _ in split_sentences(text)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("He said no. Then he left.", ["He said no.", "Then he left."]),
+    ("We ate a fig. It was sweet.", ["We ate a fig.", "It was sweet."]),
+    ("The sun rose. Birds sang.", ["The sun rose.", "Birds sang."]),
+    ("One more sec. Ready?", ["One more sec.", "Ready?"]),
+    ("What could I do I. Then I left.", ["What could I do I.", "Then I left."]),
+    ("We went with Plan B. Next we ate.", ["We went with Plan B.", "Next we ate."]),
+    ("Take vitamin C. The rest is rest.", ["Take vitamin C.", "The rest is rest."]),
+])
+def test_words_that_are_also_abbreviations_end_sentences(text, expected):
+    assert sentences(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "See No. 5 and Fig. 3 for the data.",
+    "Dr. Smith met Gen. Lee at 7 a.m. today.",
+    "J. R. R. Tolkien wrote it, e.g. in 1937.",
+    "John F. Kennedy and George W. Bush were presidents.",
+    "The price rose to 3.5 dollars.",
+    "Acme Co. Ltd was founded on Sun. 5 May.",
+])
+def test_abbreviations_initials_and_decimals_do_not_split(text):
+    assert sentences(text) == [text]
+
+
+def test_quotes_and_paragraphs():
+    assert list(split_sentences('"Are you sure?" she asked. Yes.\n\nNext one.')) == [
+        ('"Are you sure?" she asked.', False), ("Yes.", True), ("Next one.", True)]
+
+
+def test_chunks_stay_within_the_budget():
+    text = " ".join(["This sentence has a few words, and then a few more words."] * 40)
+    chunks = chunk_text(text, max_tokens=100)
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks) == text
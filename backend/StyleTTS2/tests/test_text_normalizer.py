@@ -0,0 +1,56 @@
+import pytest
+
+from text_normalizer import TextNormalizer
+
+
+@pytest.fixture(scope="module")
+def normalize():
+    return TextNormalizer(language='en-us')
+
+
+@pytest.mark.parametrize("text", ["mp3", "3D", "COVID19", "4K", "1.5M", "B-52", "version 2.0.1"])
+def test_leaves_alphanumeric_tokens_to_espeak(normalize, text):
+    assert normalize(text) == text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("10kg", "ten kilograms"),
+    ("1 kg", "one kilogram"),
+    ("25°C", "twenty-five degrees Celsius"),
+    ("5pm", "five P M"),
+    ("at 5 p.m. today", "at five P M today"),
+    ("See you at 5 p.m.", "See you at five P M."),
+    ("-5 degrees", "minus five degrees"),
+    ("+2.5%", "plus two point five percent"),
+    ("a 10-year-old", "a ten-year-old"),
+])
+def test_units_periods_and_signs(normalize, text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1-800-555-1234", "one, eight zero zero, five five five, one two three four"),
+    ("2024-13-40", "two zero two four, one three, four zero"),
+    ("2024-03-01", "March first, twenty twenty-four"),
+])
+def test_hyphenated_digit_groups(normalize, text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Dr. Smith paid $3.5 for 2 apples.", "Doctor Smith paid three dollars fifty cents for two apples."),
+    ("It grew 12.5% in 1984.", "It grew twelve point five percent in nineteen eighty-four."),
+    ("1,234 people at 7:05 a.m.", "one thousand two hundred thirty-four people at seven oh five A M."),
+])
+def test_numbers_in_sentences(normalize, text, expected):
+    assert normalize(text) == expected
+
+
+def test_cache_hits_repeated_sentences():
+    normalize = TextNormalizer(language='en-us')
+    normalize("It costs $5. It costs $5.")
+    assert (normalize.hits, normalize.misses) == (1, 1)
+
+
+def test_languages_without_rules_pass_through():
+    assert TextNormalizer(language='fr-fr')("Il a 3 ans.") == "Il a 3 ans."
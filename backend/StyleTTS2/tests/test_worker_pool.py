@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from core.metrics import MetricsRegistry
+from core.worker_pool import QueueFullError, SynthesisPool
+
+
+def test_reservation_holds_one_slot_across_jobs():
+    pool = SynthesisPool(max_workers=1, max_queue=0, registry=MetricsRegistry())
+    reservation = pool.reserve()
+    with pytest.raises(QueueFullError):
+        pool.check_capacity()
+
+    async def stream():
+        return [await reservation.run(lambda i=i: i * 2) for i in range(3)]
+
+    assert asyncio.run(stream()) == [0, 2, 4]
+    # Still held between and after the jobs, until released
+    assert pool.pending == 1
+    reservation.release()
+    reservation.release()
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_released_reservation_cannot_run():
+    pool = SynthesisPool(max_workers=1, max_queue=0, registry=MetricsRegistry())
+    reservation = pool.reserve()
+    reservation.release()
+    with pytest.raises(RuntimeError):
+        asyncio.run(reservation.run(lambda: None))
+    pool.shutdown()
+
+
+def test_jobs_see_the_time_left_to_their_caller():
+    pool = SynthesisPool(max_workers=1, max_queue=0, timeout=60, registry=MetricsRegistry())
+    assert pool.time_left() is None
+    assert 59 < asyncio.run(pool.run(pool.time_left)) <= 60
+    pool.shutdown()
+
+    pool = SynthesisPool(max_workers=1, max_queue=0, timeout=None, registry=MetricsRegistry())
+    assert asyncio.run(pool.run(pool.time_left)) is None
+    pool.shutdown()
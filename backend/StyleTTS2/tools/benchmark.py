@@ -0,0 +1,268 @@
+import sys
+import os
+
+# Add the project root and core/ to the Python path; the inference code uses flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
+
+import json
+import logging
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+
+import click
+import numpy as np
+import torch
+import yaml
+
+from libri_inference import StyleTTS2Inference
+from export import random_inference_checkpoint
+from profiling import StageTimer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000
+RESULTS_VERSION = 1
+
+# Fixed so results of different commits are comparable
+CORPUS = {
+    "short": [
+        "Hello there.",
+        "Thanks, that works.",
+        "See you tomorrow.",
+        "Where is the station?",
+    ],
+    "medium": [
+        "The quick brown fox jumps over the lazy dog while the farmer watches from the porch.",
+        "Please remember to turn off the lights and lock the front door before you leave tonight.",
+        "Our next train to the city centre departs from platform four in about twelve minutes.",
+        "She opened the letter slowly, unsure whether it held good news or bad news.",
+    ],
+    "long": [
+        "StyleTTS two models speech style as a latent random variable through diffusion models, "
+        "so it can generate the most suitable style for the text without reference speech, and it "
+        "uses large pre-trained speech language models as discriminators with differentiable duration "
+        "modeling for end-to-end training, which improves the naturalness of the synthesized speech.",
+        "In the morning the harbour was quiet, with only a few fishing boats heading out past the "
+        "breakwater, but by noon the market along the quay was crowded with traders, tourists and "
+        "children chasing the gulls that circled above the stalls selling fresh bread and smoked fish.",
+        "When you benchmark a speech synthesis system, measure the latency of every stage separately, "
+        "because the text frontend, the style diffusion, the duration predictor and the waveform decoder "
+        "scale very differently with the length of the input and with the number of sentences per batch.",
+        "The committee reviewed the proposal in detail over several meetings, asked for additional data "
+        "on costs and expected benefits, and finally approved a reduced version of the plan that can be "
+        "extended next year if the first results turn out to be as promising as the authors expect.",
+    ],
+}
+
+# Order of the inference stages in reports; `StyleTTS2Inference` times them when a StageTimer is attached
+STAGES = ["normalize", "phonemize", "tokenize", "text_encoder", "bert", "diffusion", "predictor", "alignment", "decoder",
+          "postprocess"]
+
+
+class PassthroughPhonemizer:
+    """Stands in for espeak-ng where it is not installed: the text cleaner gets the graphemes."""
+
+    def phonemize(self, texts):
+        return [text.lower() for text in texts]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentiles(values) -> dict:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(np.mean(values))}
+
+
+def load_synthesizer(config_path: str, model_path: str, random_config: str, seed: int):
+    """The synthesizer of `model_path`, or of random weights when the checkpoint does not exist."""
+    if os.path.exists(config_path) and os.path.exists(model_path):
+        return StyleTTS2Inference(config_path=config_path, model_path=model_path), False
+
+    logger.warning(f"{model_path} not found, benchmarking randomly initialized weights from {random_config}")
+    with open(random_config) as f:
+        model_params = yaml.safe_load(f)["model_params"]
+    with open(os.path.join(project_root, "core", "Utils", "PLBERT", "config.yml")) as f:
+        plbert_params = yaml.safe_load(f)["model_params"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "random.pth")
+        torch.save(random_inference_checkpoint(model_params, plbert_params, seed=seed), path)
+        # Weights are read at construction, the file is not needed afterwards
+        synthesizer = StyleTTS2Inference(config_path=random_config, model_path=path)
+    return synthesizer, True
+
+
+def set_phonemizer(synthesizer, mode: str) -> str:
+    if mode == "auto":
+        try:
+            synthesizer.phonemizer.phonemize(["hello world"])
+            return "espeak"
+        except Exception as e:
+            logger.warning(f"espeak-ng is unavailable ({e}), phonemizing by passthrough")
+            mode = "passthrough"
+    if mode == "passthrough":
+        synthesizer.phonemizer = PassthroughPhonemizer()
+    return mode
+
+
+def load_voice(synthesizer, voice: str) -> torch.Tensor:
+    """Style of a reference wav, or a seeded random style for `random:<seed>`."""
+    if voice.startswith("random:"):
+        generator = torch.Generator().manual_seed(int(voice.split(":", 1)[1]))
+        return torch.randn(1, 256, generator=generator).to(synthesizer.device)
+    return synthesizer.compute_style(voice)
+
+
+def run_case(synthesizer, timer, texts, ref_s, steps, batch_size, repeats, seed):
+    """Times `repeats` calls of tokenization plus synthesis of `batch_size` texts."""
+    batch = [texts[i % len(texts)] for i in range(batch_size)]
+    seeds = [seed + i for i in range(batch_size)]
+
+    # Warm up once so lazy initialization and allocator growth are not timed
+    synthesizer.inference_tokens(synthesizer.tokenize_batch(batch), ref_s, diffusion_steps=steps, seeds=seeds)
+    timer.reset()
+
+    latencies, audio_seconds = [], 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        outputs = synthesizer.inference_tokens(synthesizer.tokenize_batch(batch), ref_s, diffusion_steps=steps,
+                                               seeds=seeds)
+        latencies.append(time.perf_counter() - start)
+        audio_seconds += sum(len(audio) for audio in outputs) / SAMPLE_RATE
+
+    compute_seconds = sum(latencies)
+    stages = timer.snapshot()
+    return {
+        "latency_ms": {name: value * 1000 for name, value in percentiles(latencies).items()},
+        "stages_ms": {name: stages[name] * 1000 / repeats for name in STAGES if name in stages},
+        "rtf": compute_seconds / audio_seconds,
+        "audio_seconds": audio_seconds / repeats,
+        "throughput": {
+            "items_per_second": batch_size * repeats / compute_seconds,
+            "audio_seconds_per_second": audio_seconds / compute_seconds,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def case_key(case: dict) -> tuple:
+    return case["voice"], case["length"], case["diffusion_steps"], case["batch_size"]
+
+
+def compare(results: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {case_key(case): case for case in json.load(f)["cases"]}
+    click.echo(f"\nAgainst {baseline_path}:")
+    click.echo(f"{'voice':<16} {'length':<7} {'steps':>5} {'batch':>5} {'p50 ms':>16} {'RTF':>16}")
+    for case in results["cases"]:
+        old = baseline.get(case_key(case))
+        if old is None:
+            continue
+        p50, old_p50 = case["latency_ms"]["p50"], old["latency_ms"]["p50"]
+        click.echo(f"{case['voice']:<16} {case['length']:<7} {case['diffusion_steps']:>5} {case['batch_size']:>5} "
+                   f"{old_p50:>7.1f} -> {p50:>6.1f} {old['rtf']:>7.3f} -> {case['rtf']:>6.3f}")
+
+
+@click.command()
+@click.option('-c', '--config_path', default='Models/LibriTTS/config.yml', type=str)
+@click.option('-m', '--model_path', default='Models/LibriTTS/epochs_2nd_00020.pth', type=str)
+@click.option('--random_config', default=os.path.join(project_root, 'Configs', 'config_libritts.yml'), type=str,
+              help='Model config of the random weights used when the checkpoint is missing.')
+@click.option('-v', '--voice', 'voices', multiple=True,
+              help='Reference wav or random:<seed>, repeatable. Defaults to reference_audio/3.wav if present.')
+@click.option('--lengths', default='short,medium,long', type=str, help='Comma separated corpus lengths.')
+@click.option('--steps', default='5', type=str, help='Comma separated diffusion step counts.')
+@click.option('--batch_sizes', default='1,4', type=str, help='Comma separated batch sizes.')
+@click.option('--repeats', default=10, type=int, help='Timed calls per case.')
+@click.option('--phonemizer', default='auto', type=click.Choice(['auto', 'espeak', 'passthrough']))
+@click.option('--seed', default=0, type=int)
+@click.option('-o', '--output', default=None, type=str, help='Write the results as JSON.')
+@click.option('--compare', 'baseline', default=None, type=str, help='Results JSON of another commit to compare with.')
+def main(config_path, model_path, random_config, voices, lengths, steps, batch_sizes, repeats, phonemizer, seed,
+         output, baseline):
+    """
+    Benchmarks `StyleTTS2Inference` on a fixed corpus for every combination of voice, text
+    length, diffusion steps and batch size: latency percentiles per call, mean seconds per
+    call of every inference stage, real-time factor (compute seconds per audio second),
+    throughput and peak RSS.
+
+    Without the checkpoint it runs on randomly initialized weights, which exercise the same
+    shapes and cost, so it also works where no model is available. Repeated texts hit the
+    phoneme cache, so `phonemize` is the cached cost after the warm-up call.
+    """
+    lengths = [length.strip() for length in lengths.split(',') if length.strip()]
+    unknown = [length for length in lengths if length not in CORPUS]
+    if unknown:
+        raise click.BadParameter(f"Unknown lengths {unknown}, choose from {list(CORPUS)}")
+
+    synthesizer, random_weights = load_synthesizer(config_path, model_path, random_config, seed)
+    phonemizer = set_phonemizer(synthesizer, phonemizer)
+    timer = StageTimer(torch.cuda.synchronize if synthesizer.device.type == "cuda" else None)
+    synthesizer.stage_timer = timer
+
+    if not voices:
+        voices = ["reference_audio/3.wav"] if os.path.exists("reference_audio/3.wav") else ["random:0"]
+    styles = {voice: load_voice(synthesizer, voice) for voice in voices}
+
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "device": str(synthesizer.device),
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "random_weights": random_weights,
+        "phonemizer": phonemizer,
+        "model_id": synthesizer.model_id,
+        "cases": [],
+    }
+
+    click.echo(f"{'voice':<16} {'length':<7} {'steps':>5} {'batch':>5} {'p50 ms':>8} {'p95 ms':>8} "
+               f"{'p99 ms':>8} {'RTF':>7} {'items/s':>8}")
+    for voice, ref_s in styles.items():
+        for length in lengths:
+            for diffusion_steps in [int(s) for s in steps.split(',')]:
+                for batch_size in [int(b) for b in batch_sizes.split(',')]:
+                    case = run_case(synthesizer, timer, CORPUS[length], ref_s, diffusion_steps, batch_size,
+                                    repeats, seed)
+                    case = {"voice": voice, "length": length, "diffusion_steps": diffusion_steps,
+                            "batch_size": batch_size, **case}
+                    results["cases"].append(case)
+
+                    latency = case["latency_ms"]
+                    click.echo(f"{voice:<16} {length:<7} {diffusion_steps:>5} {batch_size:>5} "
+                               f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} "
+                               f"{case['rtf']:>7.3f} {case['throughput']['items_per_second']:>8.2f}")
+                    click.echo("    " + ", ".join(f"{name}={ms:.1f}ms" for name, ms in case["stages_ms"].items()))
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    click.echo(f"peak RSS {results['peak_rss_mb']:.0f} MB")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Wrote {output}")
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import sys
+import os
+
+# Add the project root and core/ to the Python path; the inference code uses flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
+
+import logging
+import random
+import re
+import time
+
+import click
+import numpy as np
+
+from text_chunker import MAX_CHUNK_TOKENS, chunk_text, estimate_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sentences with the cases the chunkers disagree on: abbreviations, decimals, quotes, newlines
+SENTENCES = [
+    "Dr. Smith measured 3.5 litres of water at 7 a.m. on Monday.",
+    "\"Are you sure?\" she asked, looking at the map again.",
+    "The U.S. economy grew by 2.4% last year, according to Mr. Jones.",
+    "It was late, the rain had stopped, and the streets were quiet except for a single taxi waiting at the corner.",
+    "See Fig. 4 for details.",
+    "Prices start at $19.99 per month, e.g. for the basic plan.",
+    "He whispered: 'We leave at dawn.'",
+    "A very long sentence keeps going, adding one clause after another; it describes the hills, the river, "
+    "the old mill by the bridge, the children playing in the meadow and the clouds drifting slowly to the east.",
+]
+
+
+def legacy_chunker(text, max_chunk_size=125):
+    """The character-window chunker `text_chunker.chunk_text` replaced in api.py."""
+    if len(text) <= max_chunk_size:
+        return [text]
+    chunks = []
+    current_pos = 0
+    text_len = len(text)
+    while current_pos < text_len:
+        if current_pos + max_chunk_size >= text_len:
+            chunks.append(text[current_pos:])
+            break
+        chunk_end = current_pos + max_chunk_size
+        search_text = text[current_pos:chunk_end]
+        sentence_ends = [m.end() for m in re.finditer(r'[.!?]+', search_text)]
+        if sentence_ends:
+            last_sentence_end = sentence_ends[-1]
+            chunks.append(text[current_pos:current_pos + last_sentence_end])
+            current_pos += last_sentence_end
+        else:
+            last_space = search_text.rfind(' ')
+            if last_space > 0:
+                chunks.append(text[current_pos:current_pos + last_space])
+                current_pos += last_space + 1
+            else:
+                chunks.append(text[current_pos:chunk_end])
+                current_pos = chunk_end
+        while current_pos < text_len and text[current_pos].isspace():
+            current_pos += 1
+    return chunks
+
+
+def build_corpus(megabytes: float, seed: int) -> str:
+    """Paragraphs of shuffled `SENTENCES` until the text reaches `megabytes`."""
+    rng = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < megabytes * (1 << 20):
+        paragraph = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 8)))
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def padding_ratio(tokens, batch_size: int) -> float:
+    """Fraction of padded positions when consecutive chunks are batched, as the API does."""
+    batches = [tokens[i:i + batch_size] for i in range(0, len(tokens), batch_size)]
+    padded = sum(len(batch) * max(batch) for batch in batches)
+    return 1 - sum(tokens) / padded
+
+
+def bad_cuts(chunks) -> int:
+    """Chunks ending inside an abbreviation or a decimal number."""
+    pattern = re.compile(r'(\b(?:Dr|Mr|Fig|e\.g|a\.m|U\.S)\.|\d\.)$')
+    return sum(bool(pattern.search(chunk.rstrip())) for chunk in chunks)
+
+
+@click.command()
+@click.option('--megabytes', default=4.0, type=float, help='Size of the generated text.')
+@click.option('--max_tokens', default=MAX_CHUNK_TOKENS, type=int, help='Token budget of the new chunker.')
+@click.option('--max_chars', default=125, type=int, help='Character limit of the legacy chunker.')
+@click.option('--batch_size', default=8, type=int, help='MAX_BATCH_SIZE used for the padding estimate.')
+@click.option('--seed', default=0, type=int)
+def main(megabytes, max_tokens, max_chars, batch_size, seed):
+    """
+    Compares the token-budget chunker with the legacy character-window chunker on a
+    multi-megabyte text: throughput, chunk count, estimated tokens per chunk, padding when
+    batching consecutive chunks, and cuts inside abbreviations or decimals.
+    """
+    text = build_corpus(megabytes, seed)
+    click.echo(f"{len(text) / (1 << 20):.1f} MB of text")
+    click.echo(f"{'chunker':<8} {'MB/s':>8} {'chunks':>8} {'mean tok':>9} {'p99 tok':>8} {'max tok':>8} "
+               f"{'padding':>8} {'bad cuts':>9}")
+    for name, chunker in (("legacy", lambda t: legacy_chunker(t, max_chars)),
+                          ("tokens", lambda t: chunk_text(t, max_tokens))):
+        start = time.perf_counter()
+        chunks = chunker(text)
+        seconds = time.perf_counter() - start
+        tokens = [estimate_tokens(chunk) for chunk in chunks]
+        click.echo(f"{name:<8} {len(text) / (1 << 20) / seconds:>8.2f} {len(chunks):>8} {np.mean(tokens):>9.1f} "
+                   f"{np.percentile(tokens, 99):>8.0f} {max(tokens):>8} {padding_ratio(tokens, batch_size):>8.1%} "
+                   f"{bad_cuts(chunks):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import sys
+import os
+
+# Add the project root and core/ to the Python path; the inference code uses flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
+
+import logging
+import time
+
+import click
+import torch
+import torch.nn.functional as F
+
+from libri_inference import STYLE_SAMPLER_MODES, StyleTTS2Inference
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEXTS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "StyleTTS two samples a style vector for every sentence it speaks.",
+    "Would you like to hear that again, a little more slowly this time?",
+]
+
+
+def network_evaluations(mode: str, steps: int, embedding_scale: float) -> int:
+    """Denoiser passes per style sample, see `STYLE_SAMPLERS`."""
+    evaluations = {"adpm2": 2 * (steps - 1), "euler": steps - 1, "dpmpp_2m": steps - 1,
+                   "single_step": 1, "reference": 0}[mode]
+    return evaluations * (2 if embedding_scale != 1 else 1)
+
+
+def sample_styles(synthesizer, token_batch, ref_s, mode, steps, embedding_scale, seeds):
+    """Styles of every text for every seed, [len(seeds), B, 256], and the mean seconds per batch."""
+    batch_size = len(token_batch)
+    lengths = [len(tokens) for tokens in token_batch]
+    tokens = torch.zeros(batch_size, max(lengths), dtype=torch.long)
+    for i, item in enumerate(token_batch):
+        tokens[i, :len(item)] = torch.LongTensor(item)
+    tokens = tokens.to(synthesizer.device)
+    ref_s = ref_s.expand(batch_size, -1)
+
+    styles, elapsed = [], 0.0
+    with torch.no_grad():
+        text_mask = synthesizer.length_to_mask(torch.LongTensor(lengths)).to(synthesizer.device)
+        bert_dur = synthesizer.model.bert(tokens, attention_mask=(~text_mask).int())
+        for seed in seeds:
+            generators = synthesizer.make_generators([seed + i for i in range(batch_size)], batch_size)
+            start = time.perf_counter()
+            styles.append(synthesizer.sample_style(bert_dur, ref_s, text_mask, diffusion_steps=steps,
+                                                   embedding_scale=embedding_scale, generators=generators,
+                                                   sampler=mode))
+            if synthesizer.device.type == "cuda":
+                torch.cuda.synchronize()
+            elapsed += time.perf_counter() - start
+    return torch.stack(styles), elapsed / len(seeds)
+
+
+@click.command()
+@click.option('-c', '--config_path', default='Models/LibriTTS/config.yml', type=str)
+@click.option('-m', '--model_path', default='Models/LibriTTS/epochs_2nd_00020.pth', type=str)
+@click.option('-v', '--voice', default='reference_audio/3.wav', type=str, help='Reference audio of the voice.')
+@click.option('-t', '--text', 'texts', multiple=True, help='Texts to sample styles for, repeatable.')
+@click.option('--steps', default=5, type=int, help='diffusion_steps of the benchmarked modes.')
+@click.option('--reference_steps', default=32, type=int, help='ADPM2 steps of the quality reference.')
+@click.option('--embedding_scale', default=1.0, type=float)
+@click.option('--seeds', 'num_seeds', default=8, type=int, help='Seeds sampled per text.')
+@click.option('--modes', default=','.join(STYLE_SAMPLER_MODES), type=str, help='Comma separated sampler modes.')
+@click.option('--end_to_end', is_flag=True, help='Also time full synthesis of the texts per mode.')
+def main(config_path, model_path, voice, texts, steps, reference_steps, embedding_scale, num_seeds, modes, end_to_end):
+    """
+    Compares the style sampler modes: latency of the style sampling stage and the
+    distance of the sampled styles to a many-step ADPM2 reference.
+
+    `paired` is the mean L2 distance to the reference sample of the same text and seed,
+    `mean` the L2 distance between the per-text mean styles over all seeds, which is the
+    fair comparison for the deterministic modes. `cosine` is the mean paired cosine distance.
+    """
+    modes = [mode.strip() for mode in modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in STYLE_SAMPLER_MODES]
+    if unknown:
+        raise click.BadParameter(f"Unknown modes {unknown}, choose from {STYLE_SAMPLER_MODES}")
+
+    synthesizer = StyleTTS2Inference(config_path=config_path, model_path=model_path)
+    ref_s = synthesizer.compute_style(voice)
+    token_batch = synthesizer.tokenize_batch(list(texts) or DEFAULT_TEXTS)
+    seeds = list(range(0, num_seeds * 1000, 1000))
+
+    reference, _ = sample_styles(synthesizer, token_batch, ref_s, "adpm2", reference_steps, embedding_scale, seeds)
+
+    click.echo(f"{'mode':<12} {'evals':>5} {'style ms':>9} {'paired':>8} {'mean':>8} {'cosine':>8}"
+               + (f" {'synth ms':>9}" if end_to_end else ""))
+    for mode in modes:
+        # Warm up once so lazy initialization is not timed
+        sample_styles(synthesizer, token_batch, ref_s, mode, steps, embedding_scale, seeds[:1])
+        styles, seconds = sample_styles(synthesizer, token_batch, ref_s, mode, steps, embedding_scale, seeds)
+
+        paired = (styles - reference).norm(dim=-1).mean().item()
+        mean = (styles.mean(0) - reference.mean(0)).norm(dim=-1).mean().item()
+        cosine = (1 - F.cosine_similarity(styles, reference, dim=-1)).mean().item()
+        line = (f"{mode:<12} {network_evaluations(mode, steps, embedding_scale):>5} {seconds * 1000:>9.1f} "
+                f"{paired:>8.4f} {mean:>8.4f} {cosine:>8.4f}")
+
+        if end_to_end:
+            start = time.perf_counter()
+            synthesizer.inference_tokens(token_batch, ref_s, diffusion_steps=steps, embedding_scale=embedding_scale,
+                                         seeds=list(range(len(token_batch))), sampler=mode)
+            line += f" {(time.perf_counter() - start) * 1000:>9.1f}"
+        click.echo(line)
+
+
+if __name__ == "__main__":
+    main()
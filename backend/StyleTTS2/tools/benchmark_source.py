@@ -0,0 +1,116 @@
+import sys
+import os
+
+# Add the project root and core/ to the Python path; the inference code uses flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
+
+import logging
+import time
+
+import click
+import numpy as np
+import torch
+
+from Modules.istftnet import SourceModuleHnNSF
+from Modules.utils import rand_like, randn_like
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000
+# Settings of the iSTFTNet generator: 300 samples per F0 frame, 8 overtones
+UPSAMPLE_SCALE = 300
+HARMONIC_NUM = 8
+VOICED_THRESHOLD = 10
+
+
+def reference_source(source: SourceModuleHnNSF, f0: torch.Tensor, generator=None):
+    """
+    The harmonic source as computed before it was vectorized: F0 is upsampled to the
+    sample rate, the phase increments interpolated back down and up again, and the
+    harmonic multipliers rebuilt on every call.
+    """
+    sine_gen = source.l_sin_gen
+    with torch.no_grad():
+        f0 = torch.nn.Upsample(scale_factor=UPSAMPLE_SCALE)(f0[:, None]).transpose(1, 2)
+        fn = torch.multiply(f0, torch.FloatTensor([[range(1, sine_gen.harmonic_num + 2)]]).to(f0.device))
+
+        rad_values = (fn / sine_gen.sampling_rate) % 1
+        rand_ini = rand_like(fn[:, 0, :], generator)
+        rand_ini[:, 0] = 0
+        rad_values[:, 0, :] = rad_values[:, 0, :] + rand_ini
+        rad_values = torch.nn.functional.interpolate(rad_values.transpose(1, 2), scale_factor=1 / UPSAMPLE_SCALE,
+                                                     mode="linear").transpose(1, 2)
+        phase = torch.cumsum(rad_values, dim=1) * 2 * np.pi
+        phase = torch.nn.functional.interpolate(phase.transpose(1, 2) * UPSAMPLE_SCALE, scale_factor=UPSAMPLE_SCALE,
+                                                mode="linear").transpose(1, 2)
+        sine_waves = torch.sin(phase) * sine_gen.sine_amp
+
+        uv = (f0 > sine_gen.voiced_threshold).type(torch.float32)
+        noise_amp = uv * sine_gen.noise_std + (1 - uv) * sine_gen.sine_amp / 3
+        sine_waves = sine_waves * uv + noise_amp * randn_like(sine_waves, generator)
+    sine_merge = source.l_tanh(source.l_linear(sine_waves))
+    noise = randn_like(uv, generator) * source.sine_amp / 3
+    return sine_merge, noise, uv
+
+
+def random_f0(batch_size: int, frames: int, seed: int) -> torch.Tensor:
+    """Smooth F0 contours between 80 and 300 Hz with unvoiced stretches."""
+    generator = torch.Generator().manual_seed(seed)
+    anchors = torch.rand(batch_size, 1, frames // 20 + 2, generator=generator) * 220 + 80
+    f0 = torch.nn.functional.interpolate(anchors, size=frames, mode="linear").squeeze(1)
+    voiced = torch.nn.functional.interpolate((torch.rand(batch_size, 1, frames // 10 + 1, generator=generator) > 0.3)
+                                             .float(), size=frames, mode="nearest").squeeze(1)
+    return f0 * voiced
+
+
+def timed(fn, repeats: int, synchronize) -> float:
+    """Mean seconds per call, after one warm-up call."""
+    fn()
+    synchronize()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    synchronize()
+    return (time.perf_counter() - start) / repeats
+
+
+@click.command()
+@click.option('--seconds', default='1,5,20', type=str, help='Comma separated audio lengths to benchmark.')
+@click.option('--batch_size', default=1, type=int)
+@click.option('--repeats', default=20, type=int)
+@click.option('--seed', default=0, type=int)
+@click.option('--device', default='cuda' if torch.cuda.is_available() else 'cpu', type=str)
+def main(seconds, batch_size, repeats, seed, device):
+    """
+    Compares the vectorized harmonic source of the iSTFTNet/HiFi-GAN generators with the
+    previous implementation: mean time per call and, with the same seeds, the largest
+    absolute difference of the merged source, the noise branch and the voicing flags.
+    """
+    device = torch.device(device)
+    synchronize = torch.cuda.synchronize if device.type == "cuda" else (lambda: None)
+    source = SourceModuleHnNSF(sampling_rate=SAMPLE_RATE, upsample_scale=UPSAMPLE_SCALE, harmonic_num=HARMONIC_NUM,
+                               voiced_threshod=VOICED_THRESHOLD).to(device).eval()
+
+    click.echo(f"{'seconds':>7} {'before ms':>10} {'after ms':>9} {'speedup':>8} {'source':>9} {'noise':>9} {'uv':>4}")
+    for length in [float(s) for s in seconds.split(',')]:
+        # F0 frames are 2 per decoder frame of 600 samples
+        f0 = random_f0(batch_size, int(length * SAMPLE_RATE / UPSAMPLE_SCALE), seed).to(device)
+
+        with torch.no_grad():
+            expected = reference_source(source, f0, torch.Generator().manual_seed(seed))
+            actual = source(f0, torch.Generator().manual_seed(seed))
+            before = timed(lambda: reference_source(source, f0), repeats, synchronize)
+            after = timed(lambda: source(f0), repeats, synchronize)
+
+        source_error = (expected[0] - actual[0]).abs().max().item()
+        noise_error = (expected[1] - actual[1]).abs().max().item()
+        same_uv = torch.equal(expected[2], actual[2])
+        click.echo(f"{length:>7.1f} {before * 1000:>10.2f} {after * 1000:>9.2f} {before / after:>7.2f}x "
+                   f"{source_error:>9.2e} {noise_error:>9.2e} {'ok' if same_uv else 'DIFF':>4}")
+
+
+if __name__ == "__main__":
+    main()
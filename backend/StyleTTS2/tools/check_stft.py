@@ -0,0 +1,116 @@
+import sys
+import os
+
+# Add the project root and core/ to the Python path; the inference code uses flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
+
+import logging
+import tempfile
+import time
+
+import click
+import numpy as np
+import torch
+
+from Modules.istftnet import TorchSTFT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class InverseStage(torch.nn.Module):
+    def __init__(self, stft: TorchSTFT):
+        super().__init__()
+        self.stft = stft
+
+    def forward(self, magnitude, phase):
+        return self.stft.inverse(magnitude, phase)
+
+
+def timed(fn, repeats: int) -> float:
+    """Mean seconds per call, after one warm-up call."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def relative_error(actual: torch.Tensor, expected: torch.Tensor) -> float:
+    """Largest absolute difference, relative to the largest magnitude of `expected`."""
+    return ((actual - expected).abs().max() / expected.abs().max()).item()
+
+
+def check_onnx(stft: TorchSTFT, magnitude: torch.Tensor, phase: torch.Tensor) -> float:
+    """Largest difference between the ONNX Runtime and eager convolution iSTFT, on other lengths than traced."""
+    import onnxruntime
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "istft.onnx")
+        torch.onnx.export(InverseStage(stft), (magnitude[..., :50], phase[..., :50]), path,
+                          input_names=["magnitude", "phase"], output_names=["audio"], opset_version=17,
+                          dynamic_axes={"magnitude": {0: "batch", 2: "frames"}, "phase": {0: "batch", 2: "frames"},
+                                        "audio": {0: "batch", 2: "samples"}})
+        session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        audio, = session.run(None, {"magnitude": magnitude.numpy(), "phase": phase.numpy()})
+    return float(np.abs(audio - stft.inverse(magnitude, phase).numpy()).max())
+
+
+@click.command()
+@click.option('--n_fft', default=20, type=int, help='gen_istft_n_fft of the model.')
+@click.option('--hop', default=5, type=int, help='gen_istft_hop_size of the model.')
+@click.option('--seconds', default=10.0, type=float, help='Audio length of the timed signals.')
+@click.option('--batch_size', default=1, type=int)
+@click.option('--repeats', default=20, type=int)
+@click.option('--tolerance', default=1e-5, type=float, help='Largest acceptable relative difference.')
+@click.option('--onnx', is_flag=True, help='Also export the convolution iSTFT and run it in ONNX Runtime.')
+def main(n_fft, hop, seconds, batch_size, repeats, tolerance, onnx):
+    """
+    Checks the convolution STFT/iSTFT of `TorchSTFT` (STFT_BACKEND=conv) against torch.stft
+    and torch.istft on CPU: largest differences, relative to the peak, of the spectra, of
+    the inverse of generator-like spectra and of a round trip, and the time per call of both.
+    """
+    torch.manual_seed(0)
+    stft = TorchSTFT(filter_length=n_fft, hop_length=hop, win_length=n_fft)
+    signal = torch.randn(batch_size, int(seconds * 24000)) * 0.1
+    # The generator predicts log-magnitudes and phases through exp() and sin()
+    frames = signal.shape[-1] // hop + 1
+    magnitude = torch.exp(torch.randn(batch_size, n_fft // 2 + 1, frames))
+    phase = torch.sin(torch.randn(batch_size, n_fft // 2 + 1, frames) * 3)
+
+    results, failed = {}, False
+    with torch.no_grad():
+        stft.use_conv = False
+        reference_spec = torch.polar(*stft.transform(signal))
+        reference_audio = stft.inverse(magnitude, phase)
+        torch_transform = timed(lambda: stft.transform(signal), repeats)
+        torch_inverse = timed(lambda: stft.inverse(magnitude, phase), repeats)
+
+        stft.use_conv = True
+        spec = torch.polar(*stft.transform(signal))
+        audio = stft.inverse(magnitude, phase)
+        conv_transform = timed(lambda: stft.transform(signal), repeats)
+        conv_inverse = timed(lambda: stft.inverse(magnitude, phase), repeats)
+
+        results["stft"] = relative_error(spec, reference_spec)
+        results["istft"] = relative_error(audio, reference_audio)
+        results["round_trip"] = relative_error(stft.inverse(*stft.transform(signal)).squeeze(1), signal)
+        if onnx:
+            results["istft_onnx"] = check_onnx(stft, magnitude, phase) / reference_audio.abs().max().item()
+
+    for name, error in results.items():
+        ok = error <= tolerance
+        failed |= not ok
+        click.echo(f"{name:<12} {error:.2e} {'ok' if ok else 'MISMATCH'}")
+    click.echo(f"stft         torch {torch_transform * 1000:.2f}ms conv {conv_transform * 1000:.2f}ms "
+               f"({torch_transform / conv_transform:.2f}x)")
+    click.echo(f"istft        torch {torch_inverse * 1000:.2f}ms conv {conv_inverse * 1000:.2f}ms "
+               f"({torch_inverse / conv_inverse:.2f}x)")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import sys
+import os
+
+# Add the project root and core/ to the Python path; the inference code uses flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
+
+import logging
+import time
+
+import click
+
+from libri_inference import StyleTTS2Inference
+from graph_export import GRAPH_BACKENDS, GraphRuntime, check_parity, export_graphs
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Longer and shorter than the tracing text, so baked-in shapes show up as parity failures
+PARITY_TEXTS = [
+    "Hi.",
+    "The quick brown fox jumps over the lazy dog.",
+    "StyleTTS two combines style diffusion with adversarial training, and this sentence is "
+    "deliberately long so that the graphs see many more tokens and frames than when they were traced.",
+]
+
+
+@click.command()
+@click.option('-c', '--config_path', default='Models/LibriTTS/config.yml', type=str)
+@click.option('-m', '--model_path', default='Models/LibriTTS/epochs_2nd_00020.pth', type=str)
+@click.option('-o', '--output_dir', default='Models/graphs', type=str)
+@click.option('-v', '--voice', default='reference_audio/3.wav', type=str, help='Reference audio used for tracing.')
+@click.option('--backend', default='onnx', type=click.Choice(list(GRAPH_BACKENDS)))
+@click.option('--providers', default='CPUExecutionProvider', type=str, help='Comma separated ONNX Runtime providers.')
+@click.option('--tolerance', default=1e-3, type=float, help='Largest acceptable absolute difference per stage output.')
+@click.option('--decoder_tolerance', default=0.05, type=float,
+              help='Largest acceptable relative L2 error of the decoded waveform.')
+@click.option('--decoder_max_abs', default=1e-4, type=float,
+              help='Largest acceptable absolute waveform difference of a TorchScript decoder.')
+def main(config_path, model_path, output_dir, voice, backend, providers, tolerance, decoder_tolerance,
+         decoder_max_abs):
+    """
+    Exports the per-item inference stages to TorchScript or ONNX, then checks their outputs
+    against the eager modules on texts of other lengths than the one they were traced on.
+    Serve the result with GRAPH_BACKEND=exported GRAPH_DIR=<output_dir>.
+    """
+    synthesizer = StyleTTS2Inference(config_path=config_path, model_path=model_path)
+    ref_s = synthesizer.compute_style(voice)
+    manifest = export_graphs(synthesizer, output_dir, ref_s, backend=backend)
+
+    start = time.perf_counter()
+    runtime = GraphRuntime.load(output_dir, synthesizer.device, providers=providers.split(','),
+                                model_id=synthesizer.weights_id)
+    logger.info(f"Graphs load in {time.perf_counter() - start:.2f}s")
+
+    # TorchScript replays the eager source noise under the same seed, so its waveform must match
+    # closely; ONNX Runtime draws its own noise and only the relative error is bounded
+    decoder_traced = manifest["stages"]["decoder"]["backend"] == "torchscript"
+    limits = {"decoder_rel_l2": decoder_tolerance, "decoder.audio": decoder_max_abs if decoder_traced else None}
+
+    errors = check_parity(synthesizer, runtime, ref_s, PARITY_TEXTS)
+    failed = False
+    for name, error in errors.items():
+        limit = limits.get(name, tolerance)
+        ok = limit is None or error <= limit
+        failed |= not ok
+        status = "not checked" if limit is None else "ok" if ok else "MISMATCH"
+        click.echo(f"{name:<24} {error:.2e} {status}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
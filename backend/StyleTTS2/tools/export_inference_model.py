@@ -0,0 +1,45 @@
+import sys
+import os
+
+# Add the project root and core/ to the Python path; the inference code uses flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
+
+import logging
+import time
+
+import click
+
+from libri_inference import StyleTTS2Inference
+from export import EXPORT_DTYPES, export_inference_checkpoint
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option('-c', '--config_path', default='Models/LibriTTS/config.yml', type=str)
+@click.option('-m', '--model_path', default='Models/LibriTTS/epochs_2nd_00020.pth', type=str)
+@click.option('-o', '--output_path', default='Models/LibriTTS/inference_fp16.pth', type=str)
+@click.option('--dtype', default='fp16', type=click.Choice(list(EXPORT_DTYPES)))
+def main(config_path, model_path, output_path, dtype):
+    """
+    Exports a slim, weight-norm-folded inference checkpoint from a training checkpoint.
+    Use a `.safetensors` output path for a checkpoint that loads memory-mapped.
+    """
+    synthesizer = StyleTTS2Inference(config_path=config_path, model_path=model_path)
+    export_inference_checkpoint(synthesizer, output_path, dtype=dtype)
+
+    before = os.path.getsize(model_path) / 2 ** 20
+    after = os.path.getsize(output_path) / 2 ** 20
+    logger.info(f"Wrote {output_path}: {after:.1f} MiB (was {before:.1f} MiB)")
+
+    # Reload to check the checkpoint is self-contained and time the cold start
+    start = time.perf_counter()
+    reloaded = StyleTTS2Inference(config_path=config_path, model_path=output_path)
+    logger.info(f"Slim checkpoint loads in {time.perf_counter() - start:.1f}s ({reloaded.startup_profile.summary()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import sys
+import os
+
+# Add the project root and core/ to the Python path; the inference code uses flat imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'core'))
+
+import logging
+import time
+
+import click
+import numpy as np
+import torch
+
+from libri_inference import StyleTTS2Inference
+from quantization import (convert_static_decoder, prepare_static_decoder, quantize_dynamic_modules, quantize_model,
+                          save_static_decoder)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000
+
+
+def read_corpus(path: str, max_texts: int):
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    if not texts:
+        raise click.BadParameter(f"{path} holds no text")
+    return texts[:max_texts]
+
+
+def load_fp32(config_path: str, model_path: str) -> StyleTTS2Inference:
+    synthesizer = StyleTTS2Inference(config_path=config_path, model_path=model_path)
+    if synthesizer.quantization != "none" or synthesizer.graphs is not None:
+        raise click.UsageError("Run with QUANTIZE and GRAPH_BACKEND unset, the tool quantizes the eager model itself")
+    return synthesizer
+
+
+def synthesize(synthesizer, texts, ref_s, seed):
+    """Waveforms of `texts` and the seconds spent, after one untimed warm-up run."""
+    synthesizer.inference(texts[0], ref_s, seed=seed)
+    start = time.perf_counter()
+    outputs = [synthesizer.inference(text, ref_s, seed=seed + i) for i, text in enumerate(texts)]
+    return outputs, time.perf_counter() - start
+
+
+def log_mel(synthesizer, audio: np.ndarray) -> torch.Tensor:
+    return torch.log(1e-5 + synthesizer.to_mel(torch.from_numpy(audio).float()))
+
+
+@click.group()
+def cli():
+    """Int8 quantization of the inference model for CPU serving."""
+
+
+@cli.command()
+@click.option('-c', '--config_path', default='Models/LibriTTS/config.yml', type=str)
+@click.option('-m', '--model_path', default='Models/LibriTTS/epochs_2nd_00020.pth', type=str)
+@click.option('-v', '--voice', default='reference_audio/3.wav', type=str)
+@click.option('--corpus', required=True, type=str, help='Calibration texts, one per line.')
+@click.option('--max_texts', default=64, type=int)
+@click.option('-o', '--output_path', default='Models/LibriTTS/decoder_int8.pth', type=str)
+@click.option('--seed', default=0, type=int)
+def calibrate(config_path, model_path, voice, corpus, max_texts, output_path, seed):
+    """
+    Collects decoder activation ranges over a text corpus and writes the int8 decoder for
+    QUANTIZE=static QUANTIZE_DECODER_PATH=<output_path>. The LSTM/Linear layers are
+    quantized first, as when serving, so the decoder sees the inputs it will get.
+    """
+    synthesizer = load_fp32(config_path, model_path)
+    ref_s = synthesizer.compute_style(voice)
+    texts = read_corpus(corpus, max_texts)
+
+    quantize_dynamic_modules(synthesizer.model)
+    count = prepare_static_decoder(synthesizer.model.decoder)
+    logger.info(f"Calibrating {count} decoder convolutions on {len(texts)} texts")
+    for i, text in enumerate(texts):
+        synthesizer.inference(text, ref_s, seed=seed + i)
+    convert_static_decoder(synthesizer.model.decoder)
+
+    save_static_decoder(synthesizer.model.decoder, output_path)
+    logger.info(f"Wrote {output_path}")
+
+
+@cli.command()
+@click.option('-c', '--config_path', default='Models/LibriTTS/config.yml', type=str)
+@click.option('-m', '--model_path', default='Models/LibriTTS/epochs_2nd_00020.pth', type=str)
+@click.option('-v', '--voice', default='reference_audio/3.wav', type=str)
+@click.option('--corpus', required=True, type=str, help='Evaluation texts, one per line.')
+@click.option('--max_texts', default=32, type=int)
+@click.option('--mode', default='dynamic', type=click.Choice(['dynamic', 'static']))
+@click.option('--decoder_path', default=None, type=str, help='Calibrated decoder, for --mode static.')
+@click.option('--seed', default=1234, type=int)
+def report(config_path, model_path, voice, corpus, max_texts, mode, decoder_path, seed):
+    """
+    Compares a quantization mode against fp32 on the same texts and seeds: real-time factor,
+    log-mel L1 distance and, where the predicted durations agree, waveform relative L2.
+    """
+    synthesizer = load_fp32(config_path, model_path)
+    ref_s = synthesizer.compute_style(voice)
+    texts = read_corpus(corpus, max_texts)
+
+    reference, fp32_seconds = synthesize(synthesizer, texts, ref_s, seed)
+    quantize_model(synthesizer.model, mode, decoder_path)
+    quantized, int8_seconds = synthesize(synthesizer, texts, ref_s, seed)
+
+    mel_l1, wave_rel, same_length = [], [], 0
+    for a, b in zip(reference, quantized):
+        n = min(len(a), len(b))
+        mel_a, mel_b = log_mel(synthesizer, a[:n]), log_mel(synthesizer, b[:n])
+        mel_l1.append((mel_a - mel_b).abs().mean().item())
+        if len(a) == len(b):
+            same_length += 1
+            wave_rel.append(float(np.linalg.norm(a - b) / max(np.linalg.norm(a), 1e-8)))
+
+    audio_seconds = sum(len(a) for a in reference) / SAMPLE_RATE
+    click.echo(f"texts                 {len(texts)} ({audio_seconds:.1f}s of audio)")
+    click.echo(f"RTF fp32              {fp32_seconds / audio_seconds:.3f}")
+    click.echo(f"RTF int8 ({mode:<7})    {int8_seconds / audio_seconds:.3f} ({fp32_seconds / int8_seconds:.2f}x)")
+    click.echo(f"log-mel L1            {np.mean(mel_l1):.4f} (max {np.max(mel_l1):.4f})")
+    click.echo(f"same durations        {same_length}/{len(texts)}")
+    if wave_rel:
+        click.echo(f"waveform rel. L2      {np.mean(wave_rel):.4f}")
+
+
+if __name__ == "__main__":
+    cli()